@@ -0,0 +1,93 @@
+"""
+Benchmark of the replay of alerts over years of synthetic 5 minute bars of many symbols, stored in a temporary history
+store. Reports the bars replayed per second for a batchable and a stateful alert.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_backtest --symbols 100 500 --sessions 500
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.backtest import Replay
+from stock_alert.history_store import HistoryStore
+
+ALERT_CONFIGS = [
+    {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03},
+    {"type": "AlertMovingAverageCrossover", "fast_period": 5, "slow_period": 20},
+]
+BARS_PER_SESSION = 78
+
+
+def write_store(store: HistoryStore, num_symbols: int, num_sessions: int) -> None:
+    rng = np.random.default_rng(0)
+    sessions = pd.bdate_range("2020-01-02", periods=num_sessions)
+    bar_offsets = pd.timedelta_range("9h30min", periods=BARS_PER_SESSION, freq="5min")
+    index = pd.DatetimeIndex((sessions.values[:, None] + bar_offsets.values[None, :]).ravel()).tz_localize(
+        "America/New_York"
+    )
+    for idx in range(num_symbols):
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, len(index))))
+        store.append(
+            f"S{idx:05d}",
+            "5m",
+            pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1.0}, index=index),
+        )
+
+
+def run_scenario(num_symbols: int, num_sessions: int, remind_interval_h: float) -> list[dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = HistoryStore(Path(tmp_dir))
+        write_store(store, num_symbols, num_sessions)
+        start = time.perf_counter()
+        replay = Replay(store)
+        load_s = time.perf_counter() - start
+        reports = [replay.run(alert_config, remind_interval_h) for alert_config in ALERT_CONFIGS]
+
+    return [
+        {
+            "symbols": num_symbols,
+            "sessions": num_sessions,
+            "alert": report.alert_config["type"],
+            "bars": report.bars,
+            "load_s": load_s,
+            "replay_s": report.duration_s,
+            "bars_per_s": report.bars / (load_s + report.duration_s),
+            "sent": len(report.alerts),
+        }
+        for report in reports
+    ]
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--sessions", type=int, default=500, help="Trading sessions of 78 bars, about 250 per year")
+    parser.add_argument("--remind-interval-h", type=float, default=24)
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parsed = parser.parse_args(args)
+
+    results = []
+    for num_symbols in parsed.symbols:
+        for result in run_scenario(num_symbols, parsed.sessions, parsed.remind_interval_h):
+            results.append(result)
+            print(
+                f"symbols={result['symbols']} | alert={result['alert']} | bars={result['bars']} | "
+                f"load_s={result['load_s']:.2f} | replay_s={result['replay_s']:.2f} | "
+                f"bars_per_s={result['bars_per_s']:.0f} | sent={result['sent']}"
+            )
+    if parsed.json:
+        parsed.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+Benchmark of the memory a StockAlert keeps per watched symbol, i.e. the state that lives as long as the process: the
+alerts, reminders, exchanges, price levels and tickers. The StockAlert is restored from a state file holding a reminder
+and an exchange for every symbol, like after a restart, and every ticker is looked up once, like the first cycle does.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_memory --symbols 1000 10000 50000
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from stock_alert.alerts import AbsolutHigherThan, AlertRelativeDailyChange
+from stock_alert.class_stock_alert import StockAlert
+from stock_alert.state import EXCHANGES, REMINDERS, StateStore
+from stock_alert.symbols import SymbolCache
+
+# every price_level_every-th symbol also gets a price level alert
+PRICE_LEVEL_EVERY = 10
+EXCHANGE_CODES = ("NMS", "NYQ", "GER", "LSE")
+
+
+def write_files(stock_list_path: Path, names: list[str]) -> None:
+    stock_list_path.write_text("\n".join(names))
+    symbol_cache = SymbolCache(stock_list_path.with_name(StockAlert.stock_symbol_cache_filename))
+    for name in names:
+        symbol_cache.set(name, name)
+    symbol_cache.save()
+
+    state = StateStore(stock_list_path.with_name(stock_list_path.stem + StockAlert.state_file_suffix))
+    now = time.time()
+    for idx, name in enumerate(names):
+        state.entries.setdefault(REMINDERS, {})[name] = now - idx
+        state.entries.setdefault(EXCHANGES, {})[name] = EXCHANGE_CODES[idx % len(EXCHANGE_CODES)]
+    state.checkpoint()
+    state.close()
+
+
+def measure(num_symbols: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stock_list_path = Path(tmp_dir) / "stocks.txt"
+        names = [f"S{idx:05d}" for idx in range(num_symbols)]
+        write_files(stock_list_path, names)
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            gc.collect()
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            stock_alert = StockAlert(stock_list_path)
+            stock_alert.configure_same_alert_for_all(AlertRelativeDailyChange(0.03))
+            for symbol in list(stock_alert.stock_tickers)[::PRICE_LEVEL_EVERY]:
+                stock_alert.add_price_level_alert(symbol, AbsolutHigherThan(100))
+            for symbol in stock_alert.stock_tickers:
+                stock_alert.stock_tickers[symbol]
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        tickers_alive = len(stock_alert.data_plane.tickers)
+        stock_alert.engine.shutdown()
+        if stock_alert.state is not None:
+            stock_alert.state.close()
+
+    return {
+        "symbols": num_symbols,
+        "bytes_per_symbol": (current - baseline) / num_symbols,
+        "peak_bytes_per_symbol": (peak - baseline) / num_symbols,
+        "tickers_alive": tickers_alive,
+    }
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parsed = parser.parse_args(args)
+    # yfinance is imported on the first ticker, its modules are not state of the symbols
+    import yfinance  # pylint: disable=import-outside-toplevel,unused-import
+
+    results = [measure(num_symbols) for num_symbols in parsed.symbols]
+    for result in results:
+        print(
+            f"symbols={result['symbols']} | bytes_per_symbol={result['bytes_per_symbol']:.0f} | "
+            f"peak_bytes_per_symbol={result['peak_bytes_per_symbol']:.0f} | tickers_alive={result['tickers_alive']}"
+        )
+    if parsed.json:
+        parsed.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+"""
+Benchmark of the throughput of the ShardedRunner against a local fake yahoo finance server, for different numbers of
+worker processes. The workers are forked, so that they inherit the routing of yfinance to the fake server.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_sharded --symbols 10000 --workers 1 2 4 --cycles 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.fake_yahoo import FakeYahooClient, FakeYahooServer
+from stock_alert.gateway import GATEWAY
+from stock_alert.sharding import ShardedRunner
+
+
+def run_scenario(num_symbols: int, num_workers: int, cycles: int, latency_s: float, threads: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeYahooServer(latency_s) as server:
+        stock_list_path = Path(tmp_dir) / "stocks.txt"
+        stock_list_path.write_text("\n".join(f"S{idx:05d}" for idx in range(num_symbols)))
+        client = FakeYahooClient(server.base_url, threads=threads)
+
+        with client.patch_yfinance(), contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            runner = ShardedRunner(
+                stock_list_path,
+                {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03},
+                num_workers,
+                remind_interval_h=0,
+                mp_context="fork",
+            )
+            requests_before = server.requests
+            start = time.perf_counter()
+            # the workers poll back to back, every cycle goes to the server
+            runner.run(interval=0, cycles=cycles, timeout_s=600)
+            duration_s = time.perf_counter() - start
+
+    return {
+        "symbols": num_symbols,
+        "workers": num_workers,
+        "duration_s": duration_s,
+        "symbols_per_s": num_symbols * cycles / duration_s,
+        "requests": server.requests - requests_before,
+    }
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.005, help="Latency of every response in seconds")
+    parser.add_argument("--threads", type=int, default=16, help="Threads of the emulated yfinance.download")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parsed = parser.parse_args(args)
+    GATEWAY.set_rate(1e6, burst=1e6)
+
+    results = []
+    for num_workers in parsed.workers:
+        result = run_scenario(parsed.symbols, num_workers, parsed.cycles, parsed.latency, parsed.threads)
+        results.append(result)
+        speedup = result["symbols_per_s"] / results[0]["symbols_per_s"]
+        print(
+            f"workers={num_workers} | duration_s={result['duration_s']:.2f} | "
+            f"symbols_per_s={result['symbols_per_s']:.0f} | speedup={speedup:.2f} | requests={result['requests']}"
+        )
+    if parsed.json:
+        parsed.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
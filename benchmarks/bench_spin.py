@@ -0,0 +1,118 @@
+"""
+Benchmark of the symbol resolution and the alert cycle of StockAlert against a local fake yahoo finance server.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_spin --symbols 10 100 1000 10000 --cycles 5 --latency 0.005 --error-rate 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from benchmarks.fake_yahoo import FakeYahooClient, FakeYahooServer
+from stock_alert.alerts import AlertRelativeDailyChange
+from stock_alert.class_stock_alert import StockAlert
+from stock_alert.gateway import GATEWAY
+
+
+def run_scenario(num_symbols: int, cycles: int, latency_s: float, error_rate: float, threads: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeYahooServer(latency_s) as server:
+        stock_list_path = Path(tmp_dir) / "stocks.txt"
+        stock_list_path.write_text("\n".join(f"S{idx:05d}" for idx in range(num_symbols)))
+        client = FakeYahooClient(server.base_url, threads=threads)
+
+        # silence the progress bars and alert messages
+        with client.patch_yfinance(), contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            start = time.perf_counter()
+            stock_alert = StockAlert(stock_list_path, remind_interval_h=0)
+            resolve_s = time.perf_counter() - start
+            resolve_requests = server.requests
+            # errors are injected into the cycles only, a failed symbol search aborts the start-up
+            server.error_rate = error_rate
+
+            stock_alert.configure_same_alert_for_all(AlertRelativeDailyChange(0.03))
+            # every cycle has to go to the server, as if a full spin interval had passed
+            stock_alert.market_data.history_ttl_s = 0
+
+            latencies = []
+            requests = []
+            for _ in range(cycles):
+                requests_before = server.requests
+                start = time.perf_counter()
+                stock_alert.run_cycle()
+                latencies.append(time.perf_counter() - start)
+                requests.append(server.requests - requests_before)
+
+            # tracing the allocations slows down the code a lot, so the memory is measured in an extra cycle
+            tracemalloc.start()
+            stock_alert.run_cycle()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            stock_alert.engine.shutdown()
+
+    latencies_ms = 1000 * np.array(latencies)
+    return {
+        "symbols": num_symbols,
+        "resolve_s": resolve_s,
+        "resolve_requests": resolve_requests,
+        "cycle_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "cycle_p90_ms": float(np.percentile(latencies_ms, 90)),
+        "cycle_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "first_cycle_ms": float(latencies_ms[0]),
+        "requests_per_cycle": float(np.mean(requests)),
+        "errors": server.errors,
+        "cycle_peak_memory_mb": peak_bytes / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+    }
+
+
+def print_report(results: list[dict[str, Any]]) -> None:
+    columns = list(results[0])
+    print(" | ".join(f"{column:>18}" for column in columns))
+    for result in results:
+        print(
+            " | ".join(
+                f"{result[column]:>18.2f}" if isinstance(result[column], float) else f"{result[column]:>18}"
+                for column in columns
+            )
+        )
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.005, help="Latency of every response in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of responses failing with a 500")
+    parser.add_argument("--threads", type=int, default=16, help="Threads of the emulated yfinance.download")
+    parser.add_argument(
+        "--max-requests-per-s", type=float, default=1e6, help="Rate limit of the request gateway, unlimited by default"
+    )
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parsed = parser.parse_args(args)
+    GATEWAY.set_rate(parsed.max_requests_per_s, burst=parsed.max_requests_per_s)
+
+    results = [
+        run_scenario(num_symbols, parsed.cycles, parsed.latency, parsed.error_rate, parsed.threads)
+        for num_symbols in parsed.symbols
+    ]
+    print_report(results)
+    if parsed.json:
+        parsed.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
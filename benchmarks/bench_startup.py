@@ -0,0 +1,107 @@
+"""
+Benchmark of the start-up of the CLI: the import of stock_alert.main in a fresh interpreter and the construction of a
+StockAlert whose stock symbols are all cached, so that no request is sent.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_startup --symbols 100 10000 --repeats 5 --max-import-s 1.0
+
+With --max-import-s the benchmark fails if the median import takes longer, to catch heavy imports sneaking back in.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# modules that must not be imported before they are needed
+LAZY_MODULES = ("yfinance", "googleapiclient", "google_auth_oauthlib")
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import stock_alert.main
+print(json.dumps({{
+    "import_s": time.perf_counter() - start,
+    "loaded": [module for module in {LAZY_MODULES!r} if module in sys.modules],
+}}))
+"""
+
+
+def measure_import(repeats: int) -> dict[str, Any]:
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, check=True, text=True
+        ).stdout
+        runs.append({**json.loads(output), "process_s": time.perf_counter() - start})
+    return {
+        "import_median_s": float(np.median([run["import_s"] for run in runs])),
+        "process_median_s": float(np.median([run["process_s"] for run in runs])),
+        "eagerly_loaded": ",".join(runs[0]["loaded"]) or "-",
+    }
+
+
+def measure_construction(num_symbols: int) -> dict[str, Any]:
+    from stock_alert.class_stock_alert import StockAlert  # pylint: disable=import-outside-toplevel
+    from stock_alert.symbols import SymbolCache  # pylint: disable=import-outside-toplevel
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stock_list_path = Path(tmp_dir) / "stocks.txt"
+        names = [f"S{idx:05d}" for idx in range(num_symbols)]
+        stock_list_path.write_text("\n".join(names))
+        symbol_cache = SymbolCache(stock_list_path.with_name(StockAlert.stock_symbol_cache_filename))
+        for name in names:
+            symbol_cache.set(name, name)
+        symbol_cache.save()
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            stock_alert = StockAlert(stock_list_path)
+            construction_s = time.perf_counter() - start
+        tickers = len(stock_alert.data_plane.tickers)
+        stock_alert.engine.shutdown()
+
+    return {"symbols": num_symbols, "construction_ms": 1000 * construction_s, "tickers_created": tickers}
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters to measure the import in")
+    parser.add_argument("--max-import-s", type=float, help="Fail if the median import takes longer")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parsed = parser.parse_args(args)
+
+    result = measure_import(parsed.repeats)
+    print(
+        " | ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items()
+        )
+    )
+    constructions = [measure_construction(num_symbols) for num_symbols in parsed.symbols]
+    for construction in constructions:
+        print(
+            f"symbols={construction['symbols']} | construction_ms={construction['construction_ms']:.1f} | "
+            f"tickers_created={construction['tickers_created']}"
+        )
+    if parsed.json:
+        parsed.json.write_text(json.dumps({**result, "constructions": constructions}, indent=2))
+
+    if parsed.max_import_s is not None and result["import_median_s"] > parsed.max_import_s:
+        sys.exit(f"The import took {result['import_median_s']:.3f} s, more than {parsed.max_import_s} s")
+    if result["eagerly_loaded"] != "-":
+        sys.exit(f"Heavy modules are imported at start-up: {result['eagerly_loaded']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
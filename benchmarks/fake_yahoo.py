@@ -0,0 +1,255 @@
+"""
+A local stand-in for the yahoo finance endpoints used by stock_alert, serving synthetic search, chart and quote
+responses with a configurable latency and error rate.
+"""
+
+import concurrent.futures
+import contextlib
+import functools
+import json
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, Optional
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import yfinance
+
+BAR_SECONDS = 5 * 60
+BARS_PER_DAY = 78
+TIMEZONE = "America/New_York"
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_bars(symbol: str, session_start: int, bars: int = BARS_PER_DAY) -> dict[str, list[Any]]:
+    """
+    A reproducible random walk of 5 minute bars for the symbol.
+    """
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    closes = rng.uniform(10, 500) * np.cumprod(1 + rng.normal(0, 0.004, bars))
+    opens = np.concatenate([[closes[0] * (1 + rng.normal(0, 0.01))], closes[:-1]])
+    return {
+        "timestamp": [session_start + idx * BAR_SECONDS for idx in range(bars)],
+        "open": opens.round(4).tolist(),
+        "high": np.maximum(opens, closes).round(4).tolist(),
+        "low": np.minimum(opens, closes).round(4).tolist(),
+        "close": closes.round(4).tolist(),
+        "volume": rng.integers(100, 100_000, bars).tolist(),
+    }
+
+
+def respond(path: str, query: dict[str, list[str]], session_start: int) -> Optional[dict[str, Any]]:
+    """
+    Build the synthetic response of the requested endpoint, None for unknown endpoints.
+    """
+    if path == "/v1/finance/search":
+        name = query["q"][0]
+        return {"quotes": [{"symbol": name.upper().replace(" ", "")[:8]}]}
+    if path.startswith("/v8/finance/chart/"):
+        symbol = urllib.parse.unquote(path.rsplit("/", 1)[1])
+        bars = synthetic_bars(symbol, session_start)
+        start = int(query.get("period1", ["0"])[0])
+        first = next((idx for idx, ts in enumerate(bars["timestamp"]) if ts >= start), BARS_PER_DAY)
+        meta = {"symbol": symbol, "currency": "USD", "exchangeName": "NMS", "exchangeTimezoneName": TIMEZONE}
+        quote = {key: values[first:] for key, values in bars.items() if key != "timestamp"}
+        return {
+            "chart": {
+                "result": [{"meta": meta, "timestamp": bars["timestamp"][first:], "indicators": {"quote": [quote]}}],
+                "error": None,
+            }
+        }
+    if path == "/v7/finance/quote":
+        symbols = query["symbols"][0].split(",")
+        return {
+            "quoteResponse": {
+                "result": [
+                    {
+                        "symbol": symbol,
+                        "longName": f"{symbol} Inc.",
+                        "currency": "USD",
+                        "exchange": "NMS",
+                        "timezone": TIMEZONE,
+                    }
+                    for symbol in symbols
+                ]
+            }
+        }
+    return None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    latency_s: float
+    session_start: int
+    counters: Any
+    random: random.Random
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _Server
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        time.sleep(self.server.latency_s)
+        with self.server.counters.get_lock():
+            self.server.counters[0] += 1
+            failed = self.server.random.random() < self.server.counters[2]
+            self.server.counters[1] += failed
+        if failed:
+            self.send_error(500, "synthetic error")
+            return
+
+        url = urllib.parse.urlparse(self.path)
+        body = respond(url.path, urllib.parse.parse_qs(url.query), self.server.session_start)
+        if body is None:
+            self.send_error(404)
+            return
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def _serve(port_queue: Any, latency_s: float, session_start: int, counters: Any, seed: int) -> None:
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.latency_s = latency_s
+    server.session_start = session_start
+    server.counters = counters
+    server.random = random.Random(seed)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeYahooServer:
+    """
+    Serves /v1/finance/search, /v8/finance/chart/<symbol> and /v7/finance/quote on localhost. Every response is delayed
+    by latency_s seconds and fails with a 500 with probability error_rate.
+
+    The server runs in its own process, so that it does not compete with the benchmarked code for the GIL.
+    """
+
+    def __init__(self, latency_s: float = 0.0, error_rate: float = 0.0, seed: int = 0) -> None:
+        self.latency_s = latency_s
+        self.seed = seed
+        # requests, errors and the error rate, shared with the server process
+        self._counters = multiprocessing.Array("d", [0, 0, error_rate])
+        # the synthetic session started a full trading day ago, so the chart of "1d" has all bars
+        self.session_start = int(time.time()) - BARS_PER_DAY * BAR_SECONDS
+        self._process: Optional[multiprocessing.Process] = None
+        self.port = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def requests(self) -> int:
+        return int(self._counters[0])
+
+    @property
+    def errors(self) -> int:
+        return int(self._counters[1])
+
+    @property
+    def error_rate(self) -> float:
+        return float(self._counters[2])
+
+    @error_rate.setter
+    def error_rate(self, value: float) -> None:
+        self._counters[2] = value
+
+    def __enter__(self) -> "FakeYahooServer":
+        port_queue: Any = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve,
+            args=(port_queue, self.latency_s, self.session_start, self._counters, self.seed),
+            daemon=True,
+        )
+        self._process.start()
+        self.port = port_queue.get(timeout=30)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+class FakeYahooClient:
+    """
+    Replaces the yfinance calls of stock_alert with requests to a FakeYahooServer. yfinance.download is emulated with
+    one request per symbol on a thread pool, like yfinance does it for many tickers.
+    """
+
+    def __init__(self, base_url: str, threads: int = 8) -> None:
+        self.base_url = base_url
+        self.threads = threads
+
+    def get_json(self, url: str) -> dict[str, Any]:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return json.loads(response.read())
+
+    def history(self, symbol: str, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        query = "range=1d&interval=5m" if start is None else f"period1={int(start.timestamp())}&interval=5m"
+        data = self.get_json(f"{self.base_url}/v8/finance/chart/{urllib.parse.quote(symbol)}?{query}")
+        result = data["chart"]["result"][0]
+        quote = result["indicators"]["quote"][0]
+        index = pd.to_datetime(result["timestamp"], unit="s", utc=True).tz_convert(TIMEZONE)
+        return pd.DataFrame(
+            {
+                "Open": quote["open"],
+                "High": quote["high"],
+                "Low": quote["low"],
+                "Close": quote["close"],
+                "Volume": quote["volume"],
+            },
+            index=index,
+        )
+
+    def download(self, tickers: list[str], start: Optional[pd.Timestamp] = None, **kwargs: Any) -> pd.DataFrame:
+        frames = {}
+        with concurrent.futures.ThreadPoolExecutor(self.threads) as executor:
+            futures = {executor.submit(self.history, symbol, start): symbol for symbol in tickers}
+            for future in concurrent.futures.as_completed(futures):
+                # like yfinance, failed symbols are left out of the result
+                if future.exception() is None:
+                    frames[futures[future]] = future.result()
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def quote(self, symbol: str) -> dict[str, Any]:
+        data = self.get_json(f"{self.base_url}/v7/finance/quote?symbols={urllib.parse.quote(symbol)}")
+        return dict(data["quoteResponse"]["result"][0])
+
+    @contextlib.contextmanager
+    def patch_yfinance(self) -> Iterator[None]:
+        """
+        Route the yfinance calls and the symbol search of stock_alert to the fake server.
+        """
+        client = self
+
+        def ticker_history(ticker: yfinance.Ticker, *args: Any, start: Any = None, **kwargs: Any) -> pd.DataFrame:
+            return client.history(ticker.ticker, start)
+
+        with patch("stock_alert.util.YAHOO_BASE_URL", self.base_url), patch(
+            "yfinance.download", self.download
+        ), patch.object(yfinance.Ticker, "history", ticker_history), patch.object(
+            yfinance.Ticker, "info", property(lambda ticker: client.quote(ticker.ticker))
+        ), patch.object(
+            yfinance.Ticker, "fast_info", property(lambda ticker: client.quote(ticker.ticker))
+        ):
+            yield
@@ -0,0 +1,109 @@
+import bisect
+from typing import Optional, Union
+
+from stock_alert.alerts import AbsolutHigherThan, AbsolutLowerThan
+
+PriceLevelAlert = Union[AbsolutHigherThan, AbsolutLowerThan]
+
+
+class PriceLevels:
+    """
+    The thresholds of the absolute alerts of one symbol, sorted by price.
+
+    An AbsolutHigherThan alert is active while the price is above its threshold, so the active ones always form a prefix
+    of the sorted higher levels. Likewise the active AbsolutLowerThan alerts form a suffix of the sorted lower levels.
+    """
+
+    __slots__ = ("higher_levels", "higher_alerts", "lower_levels", "lower_alerts", "last_price")
+
+    def __init__(self) -> None:
+        self.higher_levels: list[float] = []
+        self.higher_alerts: list[AbsolutHigherThan] = []
+        self.lower_levels: list[float] = []
+        self.lower_alerts: list[AbsolutLowerThan] = []
+        self.last_price: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.higher_levels) + len(self.lower_levels)
+
+    def active(self) -> list[PriceLevelAlert]:
+        if self.last_price is None:
+            return []
+        active: list[PriceLevelAlert] = []
+        active += self.higher_alerts[: bisect.bisect_left(self.higher_levels, self.last_price)]
+        active += self.lower_alerts[bisect.bisect_right(self.lower_levels, self.last_price) :]
+        return active
+
+    def update(self, price: float) -> list[PriceLevelAlert]:
+        """
+        Set the new price and return the alerts whose threshold was crossed into the alerting direction since the last
+        price. Only the range between both prices is looked at, so the cost depends on the number of crossings and not
+        on the number of levels.
+        """
+        previous, self.last_price = self.last_price, price
+        if previous is None:
+            return self.active()
+
+        crossed: list[PriceLevelAlert] = []
+        if price > previous:
+            start = bisect.bisect_left(self.higher_levels, previous)
+            end = bisect.bisect_left(self.higher_levels, price)
+            crossed += self.higher_alerts[start:end]
+        elif price < previous:
+            start = bisect.bisect_right(self.lower_levels, price)
+            end = bisect.bisect_right(self.lower_levels, previous)
+            crossed += self.lower_alerts[start:end]
+        return crossed
+
+
+class ThresholdIndex:
+    """
+    Index of the absolute price level alerts of all symbols, which only reports the alerts whose threshold was crossed
+    by a price update instead of evaluating every alert on every cycle.
+    """
+
+    def __init__(self) -> None:
+        self.levels: dict[str, PriceLevels] = {}
+
+    def __len__(self) -> int:
+        return sum(len(levels) for levels in self.levels.values())
+
+    def symbols(self) -> list[str]:
+        return list(self.levels)
+
+    def add(self, symbol: str, alert: PriceLevelAlert) -> None:
+        levels = self.levels.setdefault(symbol, PriceLevels())
+        if isinstance(alert, AbsolutHigherThan):
+            idx = bisect.bisect_right(levels.higher_levels, alert.threshold)
+            levels.higher_levels.insert(idx, alert.threshold)
+            levels.higher_alerts.insert(idx, alert)
+        elif isinstance(alert, AbsolutLowerThan):
+            idx = bisect.bisect_right(levels.lower_levels, alert.threshold)
+            levels.lower_levels.insert(idx, alert.threshold)
+            levels.lower_alerts.insert(idx, alert)
+        else:
+            raise TypeError(f"Only absolute price level alerts can be indexed, got {type(alert).__name__}")
+
+    def remove(self, symbol: str, alert: PriceLevelAlert) -> None:
+        levels = self.levels[symbol]
+        if isinstance(alert, AbsolutHigherThan):
+            idx = levels.higher_alerts.index(alert)
+            del levels.higher_levels[idx], levels.higher_alerts[idx]
+        else:
+            idx = levels.lower_alerts.index(alert)
+            del levels.lower_levels[idx], levels.lower_alerts[idx]
+        if not levels:
+            del self.levels[symbol]
+
+    def active(self, symbol: str) -> list[PriceLevelAlert]:
+        levels = self.levels.get(symbol)
+        return [] if levels is None else levels.active()
+
+    def update(self, symbol: str, price: float) -> list[PriceLevelAlert]:
+        """
+        Feed the latest price of the symbol and return its alerts that were triggered by it.
+        """
+        levels = self.levels.get(symbol)
+        if levels is None:
+            return []
+        return levels.update(price)
@@ -1,23 +1,180 @@
-import yfinance
+import inspect
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Mapping, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.indicators import ExponentialAverage, RelativeStrength, RollingWindow, grow
+from stock_alert.market_data import CachedTicker
+
+if TYPE_CHECKING:
+    import yfinance
+
+
+class AlertResult(NamedTuple):
+    """
+    A triggered alert of one symbol: the type of the alert, the values it was triggered with and the time it was
+    evaluated at. Results only hold plain values, so they can be passed between threads and processes, and their
+    message is only formatted once the alert is reported.
+    """
+
+    symbol: str
+    alert_type: type["BaseAlert"]
+    values: tuple[Any, ...]
+    timestamp: float
+
+    def message(self, ticker: Optional["yfinance.Ticker"] = None) -> str:
+        """
+        Format the message of the alert. Metadata only needed for the message, e.g. the currency, is read via the
+        ticker.
+        """
+        return self.alert_type.format_message(self.values, ticker)
 
 
 class BaseAlert:
+    """
+    An alert only holds its configuration and no result, so the same instance can be evaluated for many symbols at
+    once, in several threads. Alerts on indicators keep the indicators of every symbol, see IndicatorAlert.
+
+    info holds the message of the last need_alert call of the alert, for callers that check a single ticker. Custom
+    alerts may implement need_alert only and set info, their info is carried by the result. Such alerts are evaluated
+    for one symbol at a time, since the info is shared by all symbols of the instance.
+    """
+
+    # whether need_alert_batch is implemented, custom alerts are evaluated one ticker at a time via evaluate
+    batchable = False
+    # whether the alert keeps state per symbol, which update_batch feeds with the bars of many symbols at once
+    stateful = False
+    # whether need_alert takes the pre-fetched history, custom alerts written before it was added only take the ticker
+    need_alert_takes_history = True
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # the signature is only inspected once per class and not on every evaluation
+        parameters = inspect.signature(cls.need_alert).parameters.values()
+        cls.need_alert_takes_history = len(parameters) > 2 or any(
+            parameter.kind == inspect.Parameter.VAR_POSITIONAL for parameter in parameters
+        )
+        # a subclass that changes how the alert is evaluated does not match the batched implementation it inherits
+        own = vars(cls)
+        if "evaluate" in own or "need_alert" in own:
+            if "need_alert_batch" not in own and "batchable" not in own:
+                cls.batchable = False
+            if "update_batch" not in own and "stateful" not in own:
+                cls.stateful = False
+
     def __init__(self) -> None:
         self.info = ""
 
-    def need_alert(self, ticker: yfinance.Ticker) -> bool:
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        """
+        Return the result of the alert if it is triggered, otherwise None.
+        """
+        # custom alerts may only implement need_alert, they are reported with their info or a generic message. The
+        # info of one symbol must not be overwritten by another thread before it is read, so they run one at a time
+        with self.__dict__.setdefault("_info_lock", threading.Lock()):
+            if self.need_alert_takes_history:
+                triggered = self.need_alert(ticker, history)
+            else:
+                triggered = self.need_alert(ticker)
+            info = getattr(self, "info", "")
+        if not triggered:
+            return None
+        return self.result(ticker, (info,) if info else ())
+
+    def need_alert(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> bool:
+        if type(self).evaluate is BaseAlert.evaluate:
+            raise NotImplementedError
+        result = self.evaluate(ticker, history)
+        self.info = "" if result is None else result.message(ticker)
+        return result is not None
+
+    def result(self, ticker: "yfinance.Ticker", values: tuple[Any, ...]) -> AlertResult:
+        return AlertResult(str(ticker.ticker), type(self), values, time.time())
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        """
+        Format the message of a result of this alert type from its values.
+        """
+        if values:
+            return str(values[0])
+        return f"{cls.__name__} was triggered"
+
+    @classmethod
+    def need_alert_batch(
+        cls, alerts: Sequence["BaseAlert"], opening_prices: np.ndarray, latest_prices: np.ndarray
+    ) -> np.ndarray:
+        """
+        Evaluate alerts of this type for many symbols in one array operation. alerts[i] belongs to the symbol with
+        opening_prices[i] and latest_prices[i]. Returns the boolean mask of the symbols that need an alert.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def update_batch(
+        cls, alerts: Sequence["BaseAlert"], symbols: Sequence[str], histories: Mapping[str, pd.DataFrame]
+    ) -> np.ndarray:
+        """
+        Feed the bars of many symbols to stateful alerts of this type, alerts[i] belongs to symbols[i]. Returns the
+        boolean mask of the symbols that need an alert.
+        """
         raise NotImplementedError
 
+    @staticmethod
+    def get_history(ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Return the pre-fetched intraday history, or fetch it via the ticker if none was given.
+        """
+        if history is None:
+            return ticker.history(period="1d", interval="5m")
+        return history
+
 
 class NoAlert(BaseAlert):
-    def __init__(self) -> None:
-        super().__init__()
+    batchable = True
+
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        return None
 
-    def need_alert(self, ticker: yfinance.Ticker) -> bool:
-        return False
+    @classmethod
+    def need_alert_batch(
+        cls, alerts: Sequence[BaseAlert], opening_prices: np.ndarray, latest_prices: np.ndarray
+    ) -> np.ndarray:
+        return np.zeros(len(alerts), dtype=bool)
+
+
+# the alert of all symbols without one, it has no state and can be shared
+NO_ALERT = NoAlert()
+
+
+def alert_parameters(alerts: Sequence[BaseAlert], name: str) -> np.ndarray:
+    """
+    Gather a numeric parameter of many alerts of the same type into an array, e.g. their thresholds.
+    """
+    return np.fromiter((getattr(alert, name) for alert in alerts), dtype=np.float64, count=len(alerts))
+
+
+def get_currency(ticker: Optional["yfinance.Ticker"]) -> str:
+    """
+    Get the currency of the stock for a message, or an empty string if it is not known.
+    """
+    if ticker is None:
+        return ""
+    try:
+        if isinstance(ticker, CachedTicker):
+            return f" {ticker.field('fast_info', 'currency')}"
+        return f" {ticker.fast_info['currency']}"
+    except Exception as e:
+        print(f"Error while getting the currency of {ticker.ticker}: {e!r}")
+        return ""
 
 
 class AlertRelativeDailyChange(BaseAlert):
+    batchable = True
+
     def __init__(self, rel_change_in_percent: float) -> None:
         super().__init__()
         self.rel_change_in_percent = rel_change_in_percent
@@ -25,51 +182,325 @@ class AlertRelativeDailyChange(BaseAlert):
         self.lower_bound = 1 - self.rel_change_in_percent
         self.upper_bound = 1 + self.rel_change_in_percent
 
-        self.info = ""
-
-    def need_alert(self, ticker: yfinance.Ticker) -> bool:
-        df = ticker.history(period="1d", interval="5m")
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        df = self.get_history(ticker, history)
 
         if df.empty:
             print(f"Empty dataframe for {ticker.ticker}")
-            return False
+            return None
 
         opening_price = df.iloc[0]["Open"]
         closing_price = df.iloc[-1]["Close"]
 
         relative_change = closing_price / opening_price
 
-        if relative_change < self.lower_bound:
-            self.info = f"Stock price has decreased by {100 * (1 - relative_change):.2f} % falling from {opening_price:.2f} to {closing_price:.2f} {ticker.fast_info['currency']}."
-        elif relative_change > self.upper_bound:
-            self.info = f"Stock price has increased by {100 * (relative_change - 1):.2f} % rising from {opening_price:.2f} to {closing_price:.2f} {ticker.fast_info['currency']}."
-        else:
-            return False
+        if relative_change < self.lower_bound or relative_change > self.upper_bound:
+            return self.result(ticker, (float(opening_price), float(closing_price)))
+        return None
 
-        return True
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        opening_price, closing_price = values
+        relative_change = closing_price / opening_price
+        if relative_change < 1:
+            return f"Stock price has decreased by {100 * (1 - relative_change):.2f} % falling from {opening_price:.2f} to {closing_price:.2f}{get_currency(ticker)}."
+        return f"Stock price has increased by {100 * (relative_change - 1):.2f} % rising from {opening_price:.2f} to {closing_price:.2f}{get_currency(ticker)}."
+
+    @classmethod
+    def need_alert_batch(
+        cls, alerts: Sequence[BaseAlert], opening_prices: np.ndarray, latest_prices: np.ndarray
+    ) -> np.ndarray:
+        lower_bounds = alert_parameters(alerts, "lower_bound")
+        upper_bounds = alert_parameters(alerts, "upper_bound")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative_changes = latest_prices / opening_prices
+        return (relative_changes < lower_bounds) | (relative_changes > upper_bounds)
 
 
 class AbsolutHigherThan(BaseAlert):
+    batchable = True
+
     def __init__(self, threshold: float) -> None:
         super().__init__()
         self.threshold = threshold
-        self.info = ""
 
-    def need_alert(self, ticker: yfinance.Ticker) -> bool:
-        if ticker.history(period="1d", interval="5m").iloc[-1]["Close"] > self.threshold:
-            self.info = f"Stock price is higher than {self.threshold}"
-            return True
-        return False
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        price = self.get_history(ticker, history).iloc[-1]["Close"]
+        if price > self.threshold:
+            return self.result(ticker, (self.threshold, float(price)))
+        return None
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        return f"Stock price is higher than {values[0]}"
+
+    @classmethod
+    def need_alert_batch(
+        cls, alerts: Sequence[BaseAlert], opening_prices: np.ndarray, latest_prices: np.ndarray
+    ) -> np.ndarray:
+        thresholds = alert_parameters(alerts, "threshold")
+        return latest_prices > thresholds
 
 
 class AbsolutLowerThan(BaseAlert):
+    batchable = True
+
     def __init__(self, threshold: float) -> None:
         super().__init__()
         self.threshold = threshold
-        self.info = ""
 
-    def need_alert(self, ticker: yfinance.Ticker) -> bool:
-        if ticker.history(period="1d", interval="5m").iloc[-1]["Close"] < self.threshold:
-            self.info = f"Stock price is lower than {self.threshold}"
-            return True
-        return False
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        price = self.get_history(ticker, history).iloc[-1]["Close"]
+        if price < self.threshold:
+            return self.result(ticker, (self.threshold, float(price)))
+        return None
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        return f"Stock price is lower than {values[0]}"
+
+    @classmethod
+    def need_alert_batch(
+        cls, alerts: Sequence[BaseAlert], opening_prices: np.ndarray, latest_prices: np.ndarray
+    ) -> np.ndarray:
+        thresholds = alert_parameters(alerts, "threshold")
+        return latest_prices < thresholds
+
+
+class IndicatorAlert(BaseAlert):
+    """
+    Base of the alerts on technical indicators of the intraday bars. The indicators are kept per symbol, so one alert
+    can be configured for many symbols, and are updated with every new bar in O(1) instead of being recomputed from the
+    whole history. Only closed bars are used, the last bar is left out while it is still forming.
+    """
+
+    stateful = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows: dict[str, int] = {}
+        self.capacity = 0
+        self.last_timestamps: list[Optional[pd.Timestamp]] = []
+        self.fired = np.zeros(0, dtype=bool)
+        self._lock = threading.Lock()
+
+    def resize(self, rows: int) -> None:
+        """
+        Make room for the indicators of the given number of symbols.
+        """
+        raise NotImplementedError
+
+    def update(self, rows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        """
+        Push one new closing price per row into the indicators and return which of the rows fired.
+        """
+        raise NotImplementedError
+
+    def values(self, row: int) -> tuple[Any, ...]:
+        """
+        The values of the indicators of the row at its last update, for the result of the alert.
+        """
+        raise NotImplementedError
+
+    def row(self, symbol: str) -> int:
+        row = self.rows.get(symbol)
+        if row is None:
+            row = self.rows[symbol] = len(self.rows)
+            self.last_timestamps.append(None)
+            if row >= self.capacity:
+                self.capacity = max(2 * self.capacity, 8)
+                self.fired = np.concatenate([self.fired, np.zeros(self.capacity - len(self.fired), dtype=bool)])
+                self.resize(self.capacity)
+        return row
+
+    def feed(self, symbols: Sequence[str], histories: Sequence[Optional[pd.DataFrame]]) -> np.ndarray:
+        """
+        Push the closed bars of the symbols that were not seen yet into the indicators, bar by bar for all symbols at
+        once. Returns whether the alert fired on the last closed bar of each symbol.
+        """
+        with self._lock:
+            rows = np.fromiter((self.row(symbol) for symbol in symbols), dtype=np.intp, count=len(symbols))
+            new_closes = []
+            for row, history in zip(rows, histories):
+                if history is None or len(history) < 2:
+                    new_closes.append(np.empty(0))
+                    continue
+                closed = history.index[:-1]
+                last_timestamp = self.last_timestamps[row]
+                start = 0 if last_timestamp is None else int(closed.searchsorted(last_timestamp, side="right"))
+                new_closes.append(history["Close"].to_numpy(float)[start:-1])
+                self.last_timestamps[row] = closed[-1]
+
+            counts = np.fromiter((len(closes) for closes in new_closes), dtype=np.intp, count=len(new_closes))
+            for step in range(int(counts.max(initial=0))):
+                has_bar = counts > step
+                step_closes = np.fromiter(
+                    (closes[step] for closes in new_closes if len(closes) > step), dtype=float, count=has_bar.sum()
+                )
+                self.fired[rows[has_bar]] = self.update(rows[has_bar], step_closes)
+            return self.fired[rows]
+
+    def warm_up(self, symbols: Sequence[str], histories: Sequence[Optional[pd.DataFrame]]) -> None:
+        """
+        Feed past bars into the indicators without firing, e.g. the stored bars of the previous sessions, so that the
+        indicators are ready at the open instead of only after period live bars.
+        """
+        self.feed(symbols, histories)
+        with self._lock:
+            self.fired[[self.rows[symbol] for symbol in symbols]] = False
+
+    def evaluate(self, ticker: "yfinance.Ticker", history: Optional[pd.DataFrame] = None) -> Optional[AlertResult]:
+        symbol = str(ticker.ticker)
+        if not self.feed([symbol], [self.get_history(ticker, history)])[0]:
+            return None
+        return self.result(ticker, self.values(self.rows[symbol]))
+
+    @classmethod
+    def update_batch(
+        cls, alerts: Sequence[BaseAlert], symbols: Sequence[str], histories: Mapping[str, pd.DataFrame]
+    ) -> np.ndarray:
+        need_alert = np.zeros(len(alerts), dtype=bool)
+        # symbols sharing one alert instance are updated together
+        groups: dict[int, list[int]] = {}
+        for idx, alert in enumerate(alerts):
+            groups.setdefault(id(alert), []).append(idx)
+        for indices in groups.values():
+            alert = alerts[indices[0]]
+            assert isinstance(alert, IndicatorAlert)
+            group_symbols = [symbols[idx] for idx in indices]
+            need_alert[indices] = alert.feed(group_symbols, [histories.get(symbol) for symbol in group_symbols])
+        return need_alert
+
+
+class AlertMovingAverageCrossover(IndicatorAlert):
+    """
+    Alerts when the fast moving average crosses the slow one, either simple or exponential moving averages.
+    """
+
+    def __init__(self, fast_period: int, slow_period: int, exponential: bool = False) -> None:
+        super().__init__()
+        if fast_period >= slow_period:
+            raise ValueError(f"The fast period {fast_period} must be shorter than the slow period {slow_period}")
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.exponential = exponential
+        self.name = "EMA" if exponential else "SMA"
+        if exponential:
+            self.fast: Union[ExponentialAverage, RollingWindow] = ExponentialAverage.from_span(fast_period)
+            self.slow: Union[ExponentialAverage, RollingWindow] = ExponentialAverage.from_span(slow_period)
+        else:
+            self.fast = RollingWindow(fast_period)
+            self.slow = RollingWindow(slow_period)
+        self.signs = np.zeros(0)
+
+    def resize(self, rows: int) -> None:
+        self.fast.resize(rows)
+        self.slow.resize(rows)
+        self.signs = grow(self.signs, rows)
+
+    def update(self, rows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        self.fast.push(rows, closes)
+        self.slow.push(rows, closes)
+        ready = self.fast.ready(rows) & self.slow.ready(rows)
+        signs = np.where(ready, np.sign(self.fast.mean(rows) - self.slow.mean(rows)), 0.0)
+        previous = self.signs[rows]
+        # touching averages are no crossing yet, the previous side is kept
+        self.signs[rows] = np.where(signs != 0, signs, previous)
+        return (signs != 0) & (previous != 0) & (signs != previous)
+
+    def values(self, row: int) -> tuple[Any, ...]:
+        rows = np.array([row])
+        fast, slow = float(self.fast.mean(rows)[0]), float(self.slow.mean(rows)[0])
+        direction = "above" if self.signs[row] > 0 else "below"
+        return self.name, self.fast_period, self.slow_period, direction, fast, slow
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        name, fast_period, slow_period, direction, fast, slow = values
+        return f"{name} {fast_period} crossed {direction} {name} {slow_period}, {fast:.2f} vs. {slow:.2f}."
+
+
+class AlertRelativeStrengthIndex(IndicatorAlert):
+    """
+    Alerts when the RSI enters the oversold zone below lower or the overbought zone above upper.
+    """
+
+    def __init__(self, period: int = 14, lower: float = 30, upper: float = 70) -> None:
+        super().__init__()
+        self.period = period
+        self.lower = lower
+        self.upper = upper
+        self.rsi = RelativeStrength(period)
+        self.zones = np.zeros(0)
+
+    def resize(self, rows: int) -> None:
+        self.rsi.resize(rows)
+        self.zones = grow(self.zones, rows)
+
+    def update(self, rows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        self.rsi.push(rows, closes)
+        rsi = self.rsi.value(rows)
+        zones = np.where(self.rsi.ready(rows), (rsi > self.upper).astype(float) - (rsi < self.lower), 0.0)
+        previous = self.zones[rows]
+        self.zones[rows] = zones
+        return (zones != 0) & (zones != previous)
+
+    def values(self, row: int) -> tuple[Any, ...]:
+        rsi = float(self.rsi.value(np.array([row]))[0])
+        return self.period, self.lower, self.upper, float(self.zones[row]), rsi
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        period, lower, upper, zone, rsi = values
+        if zone > 0:
+            return f"RSI {period} rose above {upper} to {rsi:.1f}, the stock is overbought."
+        return f"RSI {period} fell below {lower} to {rsi:.1f}, the stock is oversold."
+
+
+class AlertBollingerBreakout(IndicatorAlert):
+    """
+    Alerts when a bar closes outside the Bollinger bands, num_std standard deviations around the simple moving
+    average of the previous period bars.
+    """
+
+    def __init__(self, period: int = 20, num_std: float = 2) -> None:
+        super().__init__()
+        self.period = period
+        self.num_std = num_std
+        self.window = RollingWindow(period)
+        self.positions = np.zeros(0)
+        self.closes = np.zeros(0)
+        self.bands = np.zeros(0)
+
+    def resize(self, rows: int) -> None:
+        self.window.resize(rows)
+        self.positions = grow(self.positions, rows)
+        self.closes = grow(self.closes, rows)
+        self.bands = grow(self.bands, rows)
+
+    def update(self, rows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        ready = self.window.ready(rows)
+        mean = self.window.mean(rows)
+        width = self.num_std * self.window.std(rows)
+        positions = np.where(ready, (closes > mean + width).astype(float) - (closes < mean - width), 0.0)
+        previous = self.positions[rows]
+        # a missing close is no bar, the row keeps its position and the values of its last breakout
+        valid = ~np.isnan(closes)
+        positions = np.where(valid, positions, previous)
+        self.positions[rows] = positions
+        self.closes[rows[valid]] = closes[valid]
+        self.bands[rows[valid]] = np.where(positions > 0, mean + width, mean - width)[valid]
+        self.window.push(rows, closes)
+        return (positions != 0) & (positions != previous)
+
+    def values(self, row: int) -> tuple[Any, ...]:
+        return self.period, self.num_std, float(self.positions[row]), float(self.closes[row]), float(self.bands[row])
+
+    @classmethod
+    def format_message(cls, values: tuple[Any, ...], ticker: Optional["yfinance.Ticker"] = None) -> str:
+        period, num_std, position, close, band = values
+        band_name, direction = ("upper", "above") if position > 0 else ("lower", "below")
+        return (
+            f"Stock price broke {direction} the {band_name} Bollinger band ({period}, {num_std}), "
+            f"closing at {close:.2f} vs. {band:.2f}."
+        )
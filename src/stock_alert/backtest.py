@@ -0,0 +1,264 @@
+"""
+Replay of the alerts over the intraday bars of a history store, to see which alerts would have been sent and how often,
+e.g. to tune a threshold:
+
+    python -m stock_alert.backtest --history-store bars --remind-interval-h 24 \\
+        --alert '{"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03}' \\
+        --alert '{"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.05}'
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.alerts import BaseAlert, IndicatorAlert
+from stock_alert.config import make_alert
+from stock_alert.history_store import BACKFILL_PERIODS, Bars, HistoryStore
+from stock_alert.market_data import INTRADAY_INTERVAL
+from stock_alert.util import hours_to_seconds
+
+NS_PER_DAY = 24 * 3600 * 10**9
+# the steps of a stateful alert are fed from a dense block of closes of all symbols at a time
+BLOCK_STEPS = 4096
+
+
+class ReplayReport(NamedTuple):
+    """
+    The outcome of replaying one alert config. alerts holds one row per alert that would have been sent, with its
+    timestamp, symbol and closing price. summary holds per symbol the number of bars, of bars on which the alert
+    fired and of alerts sent after applying the reminder interval.
+    """
+
+    alert_config: dict[str, Any]
+    alerts: pd.DataFrame
+    summary: pd.DataFrame
+    sessions: int
+    duration_s: float
+
+    @property
+    def bars(self) -> int:
+        return int(self.summary["bars"].sum())
+
+    def alerts_per_session(self) -> float:
+        """
+        The alerts sent per symbol and trading session on average.
+        """
+        if self.sessions == 0 or self.summary.empty:
+            return 0.0
+        return len(self.alerts) / (len(self.summary) * self.sessions)
+
+
+def session_days(timestamps: np.ndarray, tz: str) -> np.ndarray:
+    """
+    Number the trading sessions of the nanosecond UTC timestamps by their date in the time zone of the exchange.
+    """
+    # a view as datetimes is converted in one vectorized pass, the integers themselves would be parsed one by one
+    local = pd.DatetimeIndex(timestamps.view("datetime64[ns]")).tz_localize("UTC").tz_convert(tz)
+    return np.asarray(local.tz_localize(None).asi8 // NS_PER_DAY)
+
+
+def opening_prices(opens: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    The opening price of the session of every bar, i.e. the open of the first bar of its day.
+    """
+    if len(days) == 0:
+        return np.empty(0)
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    lengths = np.diff(np.r_[starts, len(days)])
+    return np.repeat(opens[starts], lengths)
+
+
+def apply_reminders(timestamps: np.ndarray, remind_interval_ns: int) -> np.ndarray:
+    """
+    Return the indices of the sorted timestamps on which an alert is sent, like the ReminderTable does: the first
+    one and then every first one more than the remind interval after the last sent alert. Only the sent alerts are
+    looped over, the alerts in between are skipped by binary search.
+    """
+    sent = []
+    idx = 0
+    while idx < len(timestamps):
+        sent.append(idx)
+        idx = int(np.searchsorted(timestamps, timestamps[idx] + remind_interval_ns, side="right"))
+    return np.array(sent, dtype=np.intp)
+
+
+class Replay:
+    """
+    Runs alerts over the stored intraday bars of many symbols at once, faster than real time.
+
+    Every bar is one cycle: the alert is evaluated on the bars of the session up to and including it. Batchable alerts
+    are evaluated for all bars of all symbols with a single need_alert_batch call, stateful alerts are fed step by step
+    with the closes of all symbols that have a bar at that time. The reminder interval is applied to the bars the alert
+    fired on, like in the live loop.
+    """
+
+    def __init__(
+        self,
+        store: HistoryStore,
+        symbols: Optional[list[str]] = None,
+        interval: str = INTRADAY_INTERVAL,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        tz: str = "America/New_York",
+    ) -> None:
+        """
+        By default all symbols of the interval in the store are replayed. The sessions are split at midnight in the
+        time zone tz, which should be the one of the exchange.
+        """
+        self.symbols = store.symbols(interval) if symbols is None else symbols
+        self.bars: dict[str, Bars] = {}
+        for symbol in self.symbols:
+            bars = store.read(symbol, interval).between(start, end)
+            if len(bars):
+                self.bars[symbol] = bars
+        self.offsets = np.cumsum([0] + [len(bars) for bars in self.bars.values()])
+        self.timestamps = self._concatenate("timestamp")
+        self.closes = self._concatenate("close")
+        self.days = session_days(self.timestamps, tz)
+        self.opening_prices = np.concatenate(
+            [
+                np.empty(0),
+                *(
+                    opening_prices(np.asarray(bars.open), self.days[first:last])
+                    for bars, first, last in zip(self.bars.values(), self.offsets[:-1], self.offsets[1:])
+                ),
+            ]
+        )
+
+    def _concatenate(self, column: str) -> np.ndarray:
+        arrays = [np.asarray(getattr(bars, column)) for bars in self.bars.values()]
+        return np.concatenate(arrays) if arrays else np.empty(0)
+
+    def run(self, alert_config: dict[str, Any], remind_interval_h: float = 24) -> ReplayReport:
+        """
+        Replay a fresh alert of the config, e.g. {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03}.
+        """
+        start = time.perf_counter()
+        alert = make_alert(alert_config)
+        if alert.stateful:
+            assert isinstance(alert, IndicatorAlert)
+            fired = self.fire_stateful(alert)
+        elif alert.batchable:
+            fired = self.fire_batchable(alert)
+        else:
+            raise ValueError(f"{type(alert).__name__} can not be replayed, it is neither batchable nor stateful")
+
+        remind_interval_ns = int(hours_to_seconds(remind_interval_h) * 10**9)
+        alerts = []
+        summary = []
+        for symbol, first, last in zip(self.bars, self.offsets[:-1], self.offsets[1:]):
+            fired_idx = first + np.flatnonzero(fired[first:last])
+            sent_idx = fired_idx[apply_reminders(self.timestamps[fired_idx], remind_interval_ns)]
+            alerts.append(
+                pd.DataFrame(
+                    {
+                        "timestamp": pd.DatetimeIndex(self.timestamps[sent_idx].view("datetime64[ns]"), tz="UTC"),
+                        "symbol": symbol,
+                        "close": self.closes[sent_idx],
+                    }
+                )
+            )
+            summary.append((symbol, last - first, len(fired_idx), len(sent_idx)))
+
+        sent_alerts = pd.DataFrame(columns=["timestamp", "symbol", "close"])
+        if alerts:
+            sent_alerts = pd.concat(alerts, ignore_index=True).sort_values("timestamp", kind="stable")
+        return ReplayReport(
+            alert_config,
+            sent_alerts.reset_index(drop=True),
+            pd.DataFrame(summary, columns=["symbol", "bars", "fired", "sent"]).set_index("symbol"),
+            len(np.unique(self.days)),
+            time.perf_counter() - start,
+        )
+
+    def fire_batchable(self, alert: BaseAlert) -> np.ndarray:
+        """
+        Evaluate the alert on every bar of every symbol in one array operation.
+        """
+        # the parameters of the single alert broadcast over all bars, instead of one list entry per bar
+        fired = np.asarray(type(alert).need_alert_batch([alert], self.opening_prices, self.closes))
+        if fired.shape != self.closes.shape:
+            fired = np.asarray(
+                type(alert).need_alert_batch([alert] * len(self.closes), self.opening_prices, self.closes)
+            )
+        return fired
+
+    def fire_stateful(self, alert: IndicatorAlert) -> np.ndarray:
+        """
+        Feed the closes into the indicators of the alert in time order, one step per distinct timestamp with the
+        symbols that have a bar at that time.
+        """
+        fired = np.zeros(len(self.timestamps), dtype=bool)
+        rows = np.fromiter((alert.row(symbol) for symbol in self.bars), dtype=np.intp, count=len(self.bars))
+        steps, positions = np.unique(self.timestamps, return_inverse=True)
+        symbol_of_bar = np.repeat(np.arange(len(self.bars)), np.diff(self.offsets))
+
+        # the bars sorted by step, so that the bars of a block of steps are a contiguous slice
+        order = np.argsort(positions, kind="stable")
+        bounds = np.searchsorted(positions[order], np.arange(0, len(steps) + BLOCK_STEPS, BLOCK_STEPS))
+        for block, (first, last) in enumerate(zip(bounds[:-1], bounds[1:])):
+            bars = order[first:last]
+            block_steps = positions[bars] - block * BLOCK_STEPS
+            closes = np.full((BLOCK_STEPS, len(self.bars)), np.nan)
+            closes[block_steps, symbol_of_bar[bars]] = self.closes[bars]
+            bar_idx = np.full((BLOCK_STEPS, len(self.bars)), -1, dtype=np.intp)
+            bar_idx[block_steps, symbol_of_bar[bars]] = bars
+            for step in range(int(block_steps.max(initial=-1)) + 1):
+                has_bar = np.flatnonzero(~np.isnan(closes[step]))
+                if len(has_bar):
+                    fired[bar_idx[step, has_bar]] = alert.update(rows[has_bar], closes[step, has_bar])
+        return fired
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history-store", type=Path, required=True, help="Directory of the local store of bars")
+    parser.add_argument(
+        "--alert", type=json.loads, action="append", required=True, help="Alert config as JSON, may be repeated"
+    )
+    parser.add_argument("--symbols", nargs="+", help="Symbols to replay, by default all stored ones")
+    parser.add_argument(
+        "--backfill", action="store_true", help="Download the bars of the symbols missing in the store before replaying"
+    )
+    parser.add_argument("--interval", default=INTRADAY_INTERVAL)
+    parser.add_argument("--start", type=pd.Timestamp, help="First day to replay")
+    parser.add_argument("--end", type=pd.Timestamp, help="Day after the last one to replay")
+    parser.add_argument("--remind-interval-h", type=float, default=24)
+    parser.add_argument("--tz", default="America/New_York", help="Time zone of the exchange")
+    parser.add_argument("--alerts-csv", type=Path, help="Write the alerts that would have been sent to this file")
+    parsed = parser.parse_args(args)
+    if parsed.backfill and not parsed.symbols:
+        parser.error("--backfill needs --symbols")
+
+    store = HistoryStore(parsed.history_store)
+    if parsed.backfill:
+        store.backfill(parsed.symbols, parsed.interval, BACKFILL_PERIODS.get(parsed.interval, "1y"))
+    replay = Replay(
+        store,
+        parsed.symbols,
+        parsed.interval,
+        None if parsed.start is None else parsed.start.tz_localize(parsed.tz),
+        None if parsed.end is None else parsed.end.tz_localize(parsed.tz),
+        parsed.tz,
+    )
+    reports = [replay.run(alert_config, parsed.remind_interval_h) for alert_config in parsed.alert]
+    for report in reports:
+        print(
+            f"{json.dumps(report.alert_config)} | bars={report.bars} | fired={int(report.summary['fired'].sum())} | "
+            f"sent={len(report.alerts)} | per_symbol_and_session={report.alerts_per_session():.3f} | "
+            f"duration_s={report.duration_s:.2f}"
+        )
+    if parsed.alerts_csv is not None:
+        pd.concat(
+            [report.alerts.assign(alert=json.dumps(report.alert_config)) for report in reports], ignore_index=True
+        ).to_csv(parsed.alerts_csv, index=False)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,20 +1,45 @@
+import re
+import sys
 import time
-from lib2to3.pytree import Base
-from os import P_NOWAIT
+from datetime import date
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional
 
+import numpy as np
+import pandas as pd
 import tqdm
-import yfinance
-from stock_alert.alerts import BaseAlert, NoAlert
 
-from stock_alert.quickstart import send_mail
-from stock_alert.util import get_stock_ticker, hours_to_seconds
+from stock_alert.alert_index import PriceLevelAlert, ThresholdIndex
+from stock_alert.alerts import NO_ALERT, AlertResult, BaseAlert, IndicatorAlert, NoAlert
+from stock_alert.data_plane import DataPlane, LazyTickers
+from stock_alert.history_store import BACKFILL_PERIODS, HistoryStore
+from stock_alert.http_session import get_session
+from stock_alert.market_data import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_TIMEOUT_S,
+    INTRADAY_INTERVAL,
+    CachedTicker,
+    MarketDataCache,
+    PriceMatrix,
+)
+from stock_alert.metrics import METRICS
+from stock_alert.notifications import NotificationQueue
+from stock_alert.schedule import MarketScheduler
+from stock_alert.state import EXCHANGES, PRICES, REMINDERS, TIMEZONES, StateStore
+from stock_alert.streaming import QuoteSource, Tick
+from stock_alert.symbols import UNKNOWN_SYMBOL, SymbolCache, resolve_stock_symbols
+from stock_alert.util import hours_to_seconds
+
+if TYPE_CHECKING:
+    import yfinance
 
 
 class ReminderHandler:
-    def __init__(self, remind_interval_h: float) -> None:
+    __slots__ = ("remind_interval_s", "last_reminder")
+
+    def __init__(self, remind_interval_h: float, last_reminder: Optional[float] = None) -> None:
         self.remind_interval_s = hours_to_seconds(remind_interval_h)
-        self.last_reminder = time.time() - self.remind_interval_s
+        self.last_reminder = time.time() - self.remind_interval_s if last_reminder is None else last_reminder
 
     def need_reminder(self) -> bool:
         if time.time() - self.last_reminder > self.remind_interval_s:
@@ -23,88 +48,527 @@ class ReminderHandler:
         return False
 
 
-class StockAlert:
-    stock_symbol_mapping_filename = "stock_symbol_mapping.csv"
+class ReminderTable:
+    """
+    The reminders of many symbols with the same interval. Instead of a ReminderHandler per symbol, the times of the
+    last reminders are kept in one array, indexed by the row of the symbol.
+    """
+
+    __slots__ = ("remind_interval_s", "rows", "last_reminders")
+
+    def __init__(
+        self, symbols: Iterable[str], remind_interval_h: float, last_reminders: Optional[Mapping[str, float]] = None
+    ) -> None:
+        """
+        Symbols without a last reminder, e.g. from the state of the previous run, get their first reminder right away.
+        """
+        self.remind_interval_s = hours_to_seconds(remind_interval_h)
+        self.rows = {symbol: row for row, symbol in enumerate(dict.fromkeys(symbols))}
+        self.last_reminders = np.full(len(self.rows), -np.inf)
+        for symbol, last_reminder in (last_reminders or {}).items():
+            row = self.rows.get(symbol)
+            if row is not None:
+                self.last_reminders[row] = last_reminder
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def last_reminder(self, symbol: str) -> Optional[float]:
+        last_reminder = float(self.last_reminders[self.rows[symbol]])
+        return None if last_reminder == -np.inf else last_reminder
+
+    def need_reminder(self, symbol: str, now: Optional[float] = None) -> bool:
+        row = self.rows[symbol]
+        now = time.time() if now is None else now
+        if now - self.last_reminders[row] > self.remind_interval_s:
+            self.last_reminders[row] = now
+            return True
+        return False
+
+
+class AlertLoop:
+    """
+    The polling loop shared by a StockAlert and an AlertService of many users, which implement the steps of a cycle.
+    """
+
+    market_data: MarketDataCache
+    notifications: NotificationQueue
+
+    def watched_symbols(self) -> list[str]:
+        raise NotImplementedError
+
+    def get_exchanges(self, symbols: list[str]) -> dict[str, str]:
+        raise NotImplementedError
+
+    def backfill_history(self) -> None:
+        raise NotImplementedError
+
+    def run_cycle(self, symbols: Optional[list[str]] = None) -> bool:
+        raise NotImplementedError
+
+    def spin(self, interval: float = 60, scheduler: Optional[MarketScheduler] = None) -> None:
+        """
+        This function checks cyclically for all given stocks whether their alert is raised. With a scheduler, only the
+        stocks whose exchange is open are checked, at the poll interval of their exchange. The queued mails are sent
+        before the loop is left, e.g. by a KeyboardInterrupt.
+        """
+        # cached histories expire right before the next cycle starts
+        self.market_data.history_ttl_s = interval
+        if scheduler is not None:
+            self.market_data.history_ttl_s = min([scheduler.default_interval_s, *scheduler.poll_intervals_s.values()])
+
+        try:
+            while True:
+                symbols = None
+                if scheduler is not None:
+                    exchanges = self.get_exchanges(self.watched_symbols())
+                    symbols = scheduler.due_symbols(exchanges, time.time())
+
+                self.backfill_history()
+                alert_triggered = self.run_cycle(symbols)
+
+                if scheduler is not None:
+                    interval = scheduler.seconds_until_next_poll(exchanges.values(), time.time())
+                if not alert_triggered:
+                    print(f"nothing to report, sleeping for {interval:.0f} seconds")
+                self.wait(interval)
+        finally:
+            self.notifications.close()
+
+    @staticmethod
+    def wait(interval: float) -> None:
+        pbar = tqdm.tqdm(range(200), colour="green", bar_format="{l_bar}{bar:50}|")
+        for _ in pbar:
+            pbar.set_description(f"Waiting for {interval:.0f} seconds")
+            time.sleep(interval / 200)
+
+
+class StockAlert(AlertLoop):
+    stock_symbol_cache_filename = "stock_symbol_cache.json"
+    # the state of stocks.txt is kept in stocks.state.json, or in stocks.<receiver>.state.json per receiver
+    state_file_suffix = ".state.json"
+    legacy_stock_symbol_mapping_filename = "stock_symbol_mapping.csv"
 
-    def __init__(self, path_to_csv: Path, receiver_mail: str = "", remind_interval_h: float = 24) -> None:
+    def __init__(
+        self,
+        path_to_csv: Path,
+        receiver_mail: str = "",
+        remind_interval_h: float = 24,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = 16,
+        request_timeout_s: float = DEFAULT_TIMEOUT_S,
+        max_concurrent_requests: int = 8,
+        vectorized: bool = True,
+        data_plane: Optional[DataPlane] = None,
+        history_store: Optional[HistoryStore] = None,
+        stock_list: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Several StockAlerts, e.g. of different users, can share a data plane, so that the symbols they have in common
+        are only fetched once. Without one, the StockAlert gets a data plane of its own. The daily bars of the watched
+        stocks are kept up to date in the history store, if one is given.
+
+        If a stock list is given, it is used instead of reading path_to_csv, which then only locates the symbol cache
+        and the state file.
+        """
         self.receiver_mail = receiver_mail
         self.remind_interval_h = remind_interval_h
+        self.chunk_size = chunk_size
+        self.vectorized = vectorized
+        if data_plane is None:
+            data_plane = DataPlane(max_workers, request_timeout_s, max_concurrent_requests)
+        self.data_plane = data_plane
+        self.history_store = history_store
+        self.last_backfill: Optional[date] = None
+        self.market_data = data_plane.market_data
+        self.engine = data_plane.engine
 
         # ------------ loading the stocks and gathering info from the web ------------ #
 
         # read the stock list from a file
-        stock_list = self.read_stock_list(path_to_csv)
+        if stock_list is None:
+            stock_list = self.read_stock_list(path_to_csv)
+
+        # resolve the stock symbols via yahoo finance, names resolved before are taken from the cache
+        symbol_cache = SymbolCache(path_to_csv.with_name(StockAlert.stock_symbol_cache_filename))
+        legacy_mapping_filepath = path_to_csv.with_name(StockAlert.legacy_stock_symbol_mapping_filename)
+        if legacy_mapping_filepath.exists():
+            symbol_cache.import_csv(legacy_mapping_filepath)
+            symbol_cache.save()
+            legacy_mapping_filepath.unlink()
+            print("Migrated stock symbol mapping file.")
+        stock_symbols = self.get_stock_symbols(stock_list, symbol_cache)
+        self.symbols_by_name = dict(zip(stock_list, stock_symbols))
 
-        # if the stock symbol mapping file exists, load it and check for missing stocks
-        stock_symbol_mapping_filepath = Path(
-            path_to_csv.as_posix().replace(path_to_csv.name, StockAlert.stock_symbol_mapping_filename)
+        # the yahoo finance tickers are created on first use
+        self.stock_tickers = LazyTickers((symbol for symbol in stock_symbols if symbol != UNKNOWN_SYMBOL), data_plane)
+
+        # setting up the alerts, the reminders and exchanges of the previous run are restored from the state file
+        self.state: Optional[StateStore] = StateStore(self.state_path(path_to_csv, receiver_mail))
+        # symbols without an alert of their own share a single NoAlert
+        self.alerts: dict[str, BaseAlert] = dict.fromkeys(stock_symbols, NO_ALERT)
+        self.reminders = ReminderTable(stock_symbols, self.remind_interval_h, self.state.items(REMINDERS))
+        self.exchanges = data_plane.exchanges
+        self.exchanges.update({symbol: sys.intern(code) for symbol, code in self.state.items(EXCHANGES).items()})
+        self.market_data.timezones.update(
+            {symbol: sys.intern(timezone) for symbol, timezone in self.state.items(TIMEZONES).items()}
         )
-        symbols = []
-        if stock_symbol_mapping_filepath.exists():
-            with open(stock_symbol_mapping_filepath, "r") as file:
-                symbols = []
-                for idx, line in enumerate(file.read().splitlines()):
-                    stock, symbol = line.split(",")
-                    if stock != stock_list[idx]:
-                        print("Order of stocks in csv file has changed. Recreating the symbol mapping file.")
-                        stock_symbol_mapping_filepath.unlink()
-                        break
-                    symbols.append(symbol)
-            if symbols:
-                print("Loaded stock symbol mapping file.")
-
-        # get the stock symbols via yahoo finance
-        stock_symbols = self.get_stock_symbols(stock_list) if not symbols else symbols
-
-        # store symbols in csv for faster loading
-        with open(str(path_to_csv).replace(path_to_csv.name, StockAlert.stock_symbol_mapping_filename), "w") as file:
-            for stock, symbol in zip(stock_list, stock_symbols):
-                file.write(f"{stock},{symbol}\n")
-
-        # storing the stock tickers from yahoo finance
-        self.stock_tickers = self.get_stock_tickers(stock_symbols)
-
-        # setting up the alerts
-        self.alerts: dict[str, BaseAlert] = {symbol: NoAlert() for symbol in stock_symbols}
-        self.remind_handlers: dict[str, ReminderHandler] = {
-            symbol: ReminderHandler(self.remind_interval_h) for symbol in stock_symbols
-        }
+        self.price_levels = ThresholdIndex()
+        self.notifications = data_plane.notifications
 
-    def spin(self, interval: float = 60) -> None:
-        """
-        This function checks cyclically for all given stocks whether their alert is raised.
-        """
-        while True:
-            alert_triggered = False
-            for idx, (symbol, ticker) in enumerate(self.stock_tickers.items()):
-                if self.alerts[symbol].need_alert(ticker) and self.remind_handlers[symbol].need_reminder():
-                    try:
-                        if "longName" not in ticker.info:
-                            stock_name = symbol
-                        else:
-                            stock_name = ticker.info["longName"]
-                    except Exception as e:
-                        print(f"Error while getting stock name for {symbol}: {e}")
-                        stock_name = symbol
-                    print(f"Alert for {stock_name:<40}: {self.alerts[symbol].info}")
-                    alert_triggered = True
-                    if self.receiver_mail:
-                        send_mail(
-                            receiver_email=self.receiver_mail,
-                            message_content=self.alerts[symbol].info,
-                            subject=stock_name,
-                        )
-            if not alert_triggered:
-                print(f"nothing to report, sleeping for {interval} seconds")
-
-            pbar = tqdm.tqdm(range(200), colour="green", bar_format="{l_bar}{bar:50}|")
-            for _ in pbar:
-                pbar.set_description(f"Waiting for {interval} seconds")
-                time.sleep(interval / 200)
+    @staticmethod
+    def state_path(path_to_csv: Path, receiver_mail: str = "") -> Path:
+        """
+        Get the path of the state file. Users sharing a stock list have reminders of their own, so the receiver is part
+        of the name.
+        """
+        if not receiver_mail:
+            return path_to_csv.with_name(path_to_csv.stem + StockAlert.state_file_suffix)
+        receiver = re.sub(r"[^\w.@+-]", "_", receiver_mail)
+        return path_to_csv.with_name(f"{path_to_csv.stem}.{receiver}{StockAlert.state_file_suffix}")
+
+    def watched_symbols(self) -> list[str]:
+        """
+        Get the symbols which have an alert or a price level configured.
+        """
+        return self.symbols_to_fetch(list(self.stock_tickers))
+
+    def get_exchanges(self, symbols: list[str]) -> dict[str, str]:
+        """
+        Get the yahoo finance exchange codes of the symbols, looked up once per symbol. Symbols without an exchange get
+        an empty code, which is treated as always open. Symbols whose lookup failed or timed out are treated as always
+        open as well, but only for this call, they are looked up again by the next one.
+        """
+
+        self.look_up_fast_info("exchange", symbols, self.exchanges, EXCHANGES)
+        return {symbol: self.exchanges.get(symbol, "") for symbol in symbols}
+
+    def get_timezones(self, symbols: list[str]) -> dict[str, str]:
+        """
+        Get the time zones of the exchanges of the symbols, looked up once per symbol like the exchanges. The intraday
+        bars of the symbols are converted to them, see MarketDataCache.timezones.
+        """
+        timezones = self.market_data.timezones
+        self.look_up_fast_info("timezone", symbols, timezones, TIMEZONES)
+        return {symbol: timezones.get(symbol, "") for symbol in symbols}
+
+    def look_up_fast_info(self, field: str, symbols: list[str], known: dict[str, str], kind: str) -> None:
+        """
+        Look up the fast_info field of the symbols missing in known concurrently and store it in known and in the
+        state under kind. Symbols without the field get an empty value. Symbols whose lookup failed or timed out are
+        left out, they are looked up again by the next call.
+        """
+
+        def look_up(symbol: str) -> str:
+            ticker = self.market_data.wrap(self.stock_tickers[symbol])
+            try:
+                value = ticker.field("fast_info", field)
+            except KeyError:
+                return ""
+            # there are only a few dozen exchanges and time zones, all symbols of one share the same string
+            return sys.intern(str(value))
+
+        missing = [symbol for symbol in symbols if symbol not in known]
+        if not missing:
+            return
+        # the lookups queue for the request slots, so each of them gets the timeout on its own
+        results, errors = self.engine.map(look_up, missing, timeout_per_key_s=self.engine.timeout_s)
+        for symbol, error in errors.items():
+            print(f"Error while getting the {field} of {symbol}: {error!r}")
+        known.update(results)
+        if self.state is not None:
+            for symbol, value in results.items():
+                self.state.record(kind, symbol, value)
+
+    def fetch_intraday(self, symbols: list[str]) -> dict[str, pd.DataFrame]:
+        """
+        Fetch today's intraday bars of the symbols in the time zone of their exchange.
+        """
+        self.get_timezones(symbols)
+        return self.market_data.fetch_intraday(symbols, chunk_size=self.chunk_size)
+
+    def backfill_history(self) -> None:
+        """
+        Append the daily and 5 minute bars missing in the history store for the watched stocks, at most once per day,
+        and warm up the indicators of their alerts with the stored 5 minute bars. The 5 minute bars can be replayed by
+        stock_alert.backtest as well.
+        """
+        today = date.today()
+        if self.history_store is None or self.last_backfill == today:
+            return
+        symbols = self.watched_symbols()
+        with METRICS.time("backfill"):
+            for interval, period in BACKFILL_PERIODS.items():
+                self.history_store.backfill(
+                    symbols,
+                    interval,
+                    period,
+                    chunk_size=self.chunk_size,
+                    timeout_s=self.market_data.request_timeout_s,
+                )
+        with METRICS.time("warm_up"):
+            self.warm_up_alerts(symbols)
+        self.last_backfill = today
+
+    def warm_up_alerts(self, symbols: list[str]) -> None:
+        """
+        Feed the 5 minute bars of the history store into the indicators of the alerts of the symbols, e.g. so that a
+        moving average over more bars than a session has so far is ready at the open. Bars the indicators already
+        have are skipped.
+        """
+        if self.history_store is None:
+            return
+        groups: dict[int, list[str]] = {}
+        for symbol in symbols:
+            if isinstance(self.alerts[symbol], IndicatorAlert):
+                groups.setdefault(id(self.alerts[symbol]), []).append(symbol)
+        for group in groups.values():
+            alert = self.alerts[group[0]]
+            assert isinstance(alert, IndicatorAlert)
+            alert.warm_up(group, [self.history_store.read(symbol, INTRADAY_INTERVAL).to_frame() for symbol in group])
+
+    def run_cycle(self, symbols: Optional[list[str]] = None) -> bool:
+        """
+        Update the intraday bars of all watched stocks, or the given ones, in batches and check their alerts
+        concurrently once. Returns whether any alert was triggered.
+        """
+        cycle_start = time.perf_counter()
+        if symbols is None:
+            symbols = list(self.stock_tickers)
+        with METRICS.time("fetch"):
+            histories = self.fetch_intraday(self.symbols_to_fetch(symbols))
+        alert_triggered = self.check_alerts(symbols, histories)
+
+        # all alerts of the cycle are sent in the background as a single mail
+        self.notifications.flush()
+        METRICS.observe("cycle", time.perf_counter() - cycle_start)
+        return alert_triggered
+
+    def symbols_to_fetch(self, symbols: list[str]) -> list[str]:
+        """
+        Get the symbols among the given ones which have an alert or a price level configured.
+        """
+        return [
+            symbol
+            for symbol in symbols
+            if not isinstance(self.alerts[symbol], NoAlert) or symbol in self.price_levels.levels
+        ]
+
+    def check_alerts(self, symbols: list[str], histories: dict[str, pd.DataFrame]) -> bool:
+        """
+        Check the alerts of the given stocks on the fetched intraday bars and queue the notifications. Returns whether
+        any alert was triggered.
+        """
+        alerts, crossings = self.evaluate_alerts(symbols, histories)
+        return self.notify(alerts, crossings)
+
+    def evaluate_alerts(
+        self, symbols: list[str], histories: dict[str, pd.DataFrame]
+    ) -> tuple[list[AlertResult], list[AlertResult]]:
+        """
+        Evaluate the alerts and price levels of the given stocks on the fetched intraday bars. Returns the results of
+        the triggered alerts and of the crossed price levels, without checking the reminders or formatting messages.
+        """
+        watched_symbols = [symbol for symbol in symbols if not isinstance(self.alerts[symbol], NoAlert)]
+        level_symbols = [symbol for symbol in symbols if symbol in self.price_levels.levels]
+        with METRICS.time("price_levels"):
+            crossings = self.check_price_levels(level_symbols, histories)
+        # only the symbols flagged by the vectorized pre-check are evaluated one by one, to get their results
+        with METRICS.time("vectorized"):
+            candidates = self.select_candidates(watched_symbols, histories) if self.vectorized else watched_symbols
+
+        def evaluate(symbol: str) -> Optional[AlertResult]:
+            ticker = self.market_data.wrap(self.stock_tickers[symbol])
+            # symbols missing from the batch fall back to a single, cached history() call inside the alert
+            return self.alerts[symbol].evaluate(ticker, histories.get(symbol))
+
+        with METRICS.time("evaluate"):
+            results, errors = self.engine.map(evaluate, candidates)
+        METRICS.increment("evaluation_errors", len(errors))
+
+        alerts = []
+        for symbol in candidates:
+            if symbol in errors:
+                print(f"Error while checking the alert for {symbol}: {errors[symbol]!r}")
+                continue
+            result = results[symbol]
+            if result is not None:
+                alerts.append(result)
+        METRICS.increment("alerts", len(alerts))
+        METRICS.increment("price_level_crossings", len(crossings))
+        return alerts, crossings
+
+    def notify(self, alerts: list[AlertResult], crossings: list[AlertResult]) -> bool:
+        """
+        Report the triggered alerts whose reminder is due and all crossed price levels. Returns whether anything was
+        reported.
+        """
+        alert_triggered = False
+        for result in alerts:
+            if self.need_reminder(result.symbol):
+                self.report(result)
+                alert_triggered = True
+
+        # crossing a price level is an event of its own, it is reported once without waiting for a reminder
+        for result in crossings:
+            self.report(result)
+            alert_triggered = True
+        return alert_triggered
+
+    def stream(self, source: QuoteSource) -> None:
+        """
+        Check the alerts on every tick of the source as it arrives instead of polling. The intraday bars of the watched
+        stocks are seeded once, so that the daily change is relative to the real opening price.
+        """
+        symbols = self.watched_symbols()
+        self.fetch_intraday(symbols)
+        try:
+            for tick in source.ticks():
+                self.on_tick(tick)
+        finally:
+            source.close()
+            self.notifications.close()
+            if self.state is not None:
+                self.state.checkpoint()
+
+    def on_tick(self, tick: Tick) -> bool:
+        """
+        Add the tick to the intraday bars of its stock and check the alerts of that stock only. Returns whether any
+        alert was triggered.
+        """
+        if tick.symbol not in self.stock_tickers:
+            return False
+        METRICS.increment("ticks")
+        history = self.market_data.add_tick(tick.symbol, tick.timestamp, tick.price, tick.volume)
+        crossings = self.check_price_levels([tick.symbol], {tick.symbol: history})
+
+        alert_triggered = False
+        alert = self.alerts[tick.symbol]
+        if not isinstance(alert, NoAlert):
+            result = alert.evaluate(self.market_data.wrap(self.stock_tickers[tick.symbol]), history)
+            if result is not None and self.need_reminder(tick.symbol):
+                self.report(result)
+                alert_triggered = True
+        for crossing in crossings:
+            self.report(crossing)
+            alert_triggered = True
+
+        self.notifications.flush()
+        return alert_triggered
+
+    def need_reminder(self, symbol: str) -> bool:
+        """
+        Check the reminder of the symbol and persist when it was sent, so that a restart does not repeat it.
+        """
+        if not self.reminders.need_reminder(symbol):
+            return False
+        if self.state is not None:
+            self.state.record(REMINDERS, symbol, self.reminders.last_reminder(symbol))
+        return True
+
+    def report(self, result: AlertResult) -> None:
+        """
+        Format the message of the result and queue its notification. The stock name and the metadata of the message
+        are only looked up here, for the alerts that are actually reported.
+        """
+        ticker = self.market_data.wrap(self.stock_tickers[result.symbol])
+        with METRICS.time("stock_name"):
+            stock_name = self.get_stock_name(result.symbol, ticker)
+        message = result.message(ticker)
+        print(f"Alert for {stock_name:<40}: {message}")
+        if self.receiver_mail:
+            self.notifications.add(self.receiver_mail, stock_name, message)
+
+    def check_price_levels(self, symbols: list[str], histories: dict[str, pd.DataFrame]) -> list[AlertResult]:
+        """
+        Feed the latest prices into the price level index and return the results of the price level alerts whose
+        threshold was crossed.
+        """
+        crossings = []
+        for symbol in symbols:
+            history = histories.get(symbol)
+            if history is None:
+                continue
+            price = float(history["Close"].iat[-1])
+            # a missing price is no crossing, the next price is compared with the last known one
+            if not np.isfinite(price):
+                continue
+            crossed = self.price_levels.update(symbol, price)
+            if self.state is not None:
+                self.state.record(PRICES, symbol, price)
+            if not crossed:
+                continue
+            ticker = self.market_data.wrap(self.stock_tickers[symbol])
+            for alert in crossed:
+                result = alert.evaluate(ticker, history)
+                if result is not None:
+                    crossings.append(result)
+        return crossings
+
+    def select_candidates(self, symbols: list[str], histories: dict[str, pd.DataFrame]) -> list[str]:
+        """
+        Evaluate the alerts of all symbols with one array operation per alert type and return the symbols that need an
+        alert. Stateful alerts are fed with the new bars of all their symbols at once. Symbols of custom alerts without
+        a batched implementation and symbols without prices are always returned, so that they are evaluated via
+        need_alert.
+        """
+        prices = PriceMatrix.from_histories(symbols, histories)
+
+        groups: dict[type[BaseAlert], list[int]] = {}
+        for idx, symbol in enumerate(symbols):
+            groups.setdefault(type(self.alerts[symbol]), []).append(idx)
+
+        is_candidate = np.ones(len(symbols), dtype=bool)
+        for alert_type, indices in groups.items():
+            group = np.array(indices)
+            if alert_type.stateful:
+                need_alert = alert_type.update_batch(
+                    [self.alerts[symbols[idx]] for idx in indices], [symbols[idx] for idx in indices], histories
+                )
+            elif alert_type.batchable:
+                need_alert = alert_type.need_alert_batch(
+                    [self.alerts[symbols[idx]] for idx in indices],
+                    prices.opening_prices[group],
+                    prices.latest_prices[group],
+                )
+            else:
+                continue
+            is_candidate[group] = need_alert | np.isnan(prices.latest_prices[group])
+        return [symbol for symbol, candidate in zip(symbols, is_candidate) if candidate]
+
+    @staticmethod
+    def get_stock_name(symbol: str, ticker: CachedTicker) -> str:
+        """
+        Get the long name of the stock, falling back to its symbol.
+        """
+        try:
+            return str(ticker.field("info", "longName"))
+        except KeyError:
+            return symbol
+        except Exception as e:
+            print(f"Error while getting stock name for {symbol}: {e}")
+            return symbol
 
     def configure_alert(self, symbol: str, alert: BaseAlert) -> None:
         self.alerts[symbol] = alert
 
+    def add_price_level_alert(self, symbol: str, alert: PriceLevelAlert) -> None:
+        """
+        Add an absolute price level alert to the symbol, next to its configured alert. Any number of price levels can be
+        added per symbol, each of them alerts once whenever the price crosses its threshold. Raises a ValueError if the
+        symbol is not in the stock list, its price would never be fetched.
+        """
+        if symbol not in self.stock_tickers:
+            raise ValueError(f"Can not add a price level to {symbol}, it is not in the stock list")
+        self.price_levels.add(symbol, alert)
+        # levels that were already crossed before a restart are not reported again
+        levels = self.price_levels.levels[symbol]
+        if levels.last_price is None and self.state is not None:
+            levels.last_price = self.state.get(PRICES, symbol)
+
     def configure_same_alert_for_all(self, alert: BaseAlert) -> None:
         for symbol in self.stock_tickers.keys():
             self.configure_alert(symbol, alert)
@@ -120,31 +584,29 @@ class StockAlert:
         return stock_list
 
     @staticmethod
-    def get_stock_symbols(stock_list: list[str]) -> list[str]:
+    def get_stock_symbols(stock_list: list[str], symbol_cache: Optional[SymbolCache] = None) -> list[str]:
         """
         Get the stock symbols via the yahoo finance.
         """
-
-        stock_symbols = []
-
-        pbar = tqdm.tqdm(stock_list, colour="green")
-
-        # showing a progress bar with the stock symbols with a fixed string size
-        for stock in pbar:
-            pbar.set_description(f"Getting stock symbol for {stock}".ljust(50))
-            symbol = get_stock_ticker(stock)
-            stock_symbols.append(get_stock_ticker(stock) if symbol else "N/A")
-        return stock_symbols
+        return resolve_stock_symbols(stock_list, symbol_cache)
 
     @staticmethod
-    def get_stock_tickers(stock_symbols: list[str]) -> dict[str, yfinance.Ticker]:
+    def get_stock_tickers(stock_symbols: list[str]) -> dict[str, "yfinance.Ticker"]:
         """
         Get the stock tickers via the yahoo finance.
         """
-        return {symbol: yfinance.Ticker(symbol) for symbol in stock_symbols if symbol != "N/A"}
+        import yfinance  # pylint: disable=import-outside-toplevel
+
+        session = get_session()
+        return {
+            symbol: yfinance.Ticker(symbol, session=session) for symbol in stock_symbols if symbol != UNKNOWN_SYMBOL
+        }
 
     def get_opening_prices(self) -> list[float]:
         """
         Get the opening prices of the stocks of today via yahoo finance.
         """
-        return [ticker.history(period="1d", interval="5m").iloc[0]["Open"] for ticker in self.stock_tickers]
+        histories = self.fetch_intraday(list(self.stock_tickers))
+        return [
+            histories[symbol].iloc[0]["Open"] if symbol in histories else float("nan") for symbol in self.stock_tickers
+        ]
@@ -0,0 +1,181 @@
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+from stock_alert import alerts
+from stock_alert.alert_index import PriceLevelAlert
+from stock_alert.alerts import AbsolutHigherThan, AbsolutLowerThan, BaseAlert, IndicatorAlert
+
+CONFIG_SUFFIXES = (".json", ".toml", ".yaml", ".yml")
+# the settings a watchlist inherits from the defaults of the config
+INHERITED_SETTINGS = ("receiver_mail", "remind_interval_h", "alert")
+WATCHLIST_KEYS = {"name", "stock_list", "stocks", *INHERITED_SETTINGS}
+STOCK_KEYS = {"name", "price_levels", *INHERITED_SETTINGS}
+# the bases of the alerts, which only fail once they are evaluated
+ABSTRACT_ALERTS = (BaseAlert, IndicatorAlert)
+
+
+def make_alert(config: dict[str, Any]) -> BaseAlert:
+    """
+    Create an alert from its class name and arguments, e.g. {"type": "AbsolutHigherThan", "threshold": 100}.
+    """
+    config = dict(config)
+    alert_type = getattr(alerts, config.pop("type"), None)
+    if not isinstance(alert_type, type) or not issubclass(alert_type, BaseAlert) or alert_type in ABSTRACT_ALERTS:
+        raise ValueError(f"Unknown alert type in {config}")
+    return alert_type(**config)
+
+
+def make_price_level(config: dict[str, Any]) -> PriceLevelAlert:
+    """
+    Create a price level alert from its config, which must be an AbsolutHigherThan or AbsolutLowerThan alert.
+    """
+    alert = make_alert(config)
+    if not isinstance(alert, (AbsolutHigherThan, AbsolutLowerThan)):
+        raise ValueError(f"Price levels must be AbsolutHigherThan or AbsolutLowerThan alerts, got {config}")
+    return alert
+
+
+def alert_key(config: dict[str, Any]) -> str:
+    """
+    Identify an alert by its type and arguments, alerts with the same key are evaluated as one.
+    """
+    return json.dumps(config, sort_keys=True)
+
+
+def load_config(path: Path) -> dict[str, Any]:
+    """
+    Read a .json, .toml or .yaml config. YAML needs PyYAML, which is an optional dependency.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        with open(path, "r") as file:
+            return dict(json.load(file))
+    if suffix == ".toml":
+        # pylint: disable=import-outside-toplevel
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib  # type: ignore[no-redef]
+
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError("Reading YAML configs needs PyYAML, install it with pip install stock_alert[yaml]") from e
+        with open(path, "r") as file:
+            return dict(yaml.safe_load(file) or {})
+    raise ValueError(f"Unsupported config file {path}, expected one of {', '.join(CONFIG_SUFFIXES)}")
+
+
+class WatchlistPlan:
+    """
+    The stocks of one receiver and reminder interval, with the keys of their alert and of their price levels.
+    """
+
+    def __init__(self, name: str, receiver_mail: str = "", remind_interval_h: float = 24) -> None:
+        self.name = name
+        self.receiver_mail = receiver_mail
+        self.remind_interval_h = remind_interval_h
+        self.stocks: list[str] = []
+        self.alerts: dict[str, str] = {}
+        self.price_levels: dict[str, list[dict[str, Any]]] = {}
+
+    def watched_stocks(self) -> list[str]:
+        """
+        Get the stocks with an alert or a price level, only their data is fetched.
+        """
+        return [stock for stock in self.stocks if stock in self.alerts or stock in self.price_levels]
+
+
+class EvaluationPlan:
+    """
+    A config compiled for evaluation. Alerts of the same type with the same arguments are created once and shared by
+    all stocks and watchlists using them, so every group of identical alerts is evaluated in one batch and stateful
+    alerts keep a single state for all of their stocks. Stocks without an alert or a price level are never fetched.
+    """
+
+    def __init__(self) -> None:
+        self.alerts: dict[str, BaseAlert] = {}
+        self.watchlists: list[WatchlistPlan] = []
+
+    def add_alert(self, config: dict[str, Any]) -> str:
+        key = alert_key(config)
+        if key not in self.alerts:
+            self.alerts[key] = make_alert(config)
+        return key
+
+
+def compile_plan(config: dict[str, Any], base_dir: Path = Path(".")) -> EvaluationPlan:
+    """
+    Compile a config like
+
+        defaults: {receiver_mail: me@example.com, remind_interval_h: 24}
+        watchlists:
+          - name: tech
+            stock_list: tech.txt
+            alert: {type: AlertRelativeDailyChange, rel_change_in_percent: 0.03}
+            stocks:
+              - Tesla
+              - name: Apple
+                alert: {type: AlertRelativeStrengthIndex, period: 14}
+                price_levels: [{type: AbsolutHigherThan, threshold: 200}]
+
+    into an evaluation plan. A watchlist inherits the receiver, the reminder interval and the alert of the defaults,
+    a stock those of its watchlist. Stocks with their own receiver or reminder interval are split into a watchlist
+    of their own, named after the watchlist, the receiver and the interval. Stock lists are relative to base_dir.
+    """
+    unknown = set(config) - {"defaults", "watchlists"}
+    if unknown:
+        raise ValueError(f"Unknown config sections {sorted(unknown)}")
+    defaults = config.get("defaults", {})
+    unknown = set(defaults) - set(INHERITED_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown defaults {sorted(unknown)}")
+    plan = EvaluationPlan()
+    names: set[str] = set()
+    for idx, settings in enumerate(config.get("watchlists", [])):
+        unknown = set(settings) - WATCHLIST_KEYS
+        if unknown:
+            raise ValueError(f"Unknown watchlist settings {sorted(unknown)} in {settings}")
+        settings = {**defaults, **settings}
+        name = str(settings.get("name", f"watchlist{idx}"))
+        watchlist = WatchlistPlan(name, settings.get("receiver_mail", ""), settings.get("remind_interval_h", 24))
+        parts = {(watchlist.receiver_mail, watchlist.remind_interval_h): watchlist}
+
+        stocks: list[Any] = []
+        if "stock_list" in settings:
+            with open(base_dir / settings["stock_list"], "r") as file:
+                stocks += [line.strip() for line in file.read().splitlines() if line.strip()]
+        stocks += settings.get("stocks", [])
+
+        for stock in stocks:
+            if isinstance(stock, str):
+                stock = {"name": stock}
+            unknown = set(stock) - STOCK_KEYS
+            if unknown:
+                raise ValueError(f"Unknown stock settings {sorted(unknown)} in {stock}")
+            receiver_mail = stock.get("receiver_mail", watchlist.receiver_mail)
+            remind_interval_h = stock.get("remind_interval_h", watchlist.remind_interval_h)
+            part = parts.get((receiver_mail, remind_interval_h))
+            if part is None:
+                part = WatchlistPlan(f"{name}.{receiver_mail}.{remind_interval_h:g}h", receiver_mail, remind_interval_h)
+                parts[(receiver_mail, remind_interval_h)] = part
+            stock_name = str(stock["name"])
+            if stock_name not in part.stocks:
+                part.stocks.append(stock_name)
+            alert_config: Optional[dict[str, Any]] = stock.get("alert", settings.get("alert"))
+            if alert_config is not None:
+                part.alerts[stock_name] = plan.add_alert(alert_config)
+            for level in stock.get("price_levels", []):
+                # price levels are validated here, the alerts are created per stock since every stock indexes its own
+                make_price_level(level)
+                part.price_levels.setdefault(stock_name, []).append(level)
+        for part in parts.values():
+            if part.name in names:
+                raise ValueError(f"Watchlist {part.name} is configured twice")
+            names.add(part.name)
+            plan.watchlists.append(part)
+    return plan
@@ -0,0 +1,71 @@
+import weakref
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping
+
+from stock_alert.engine import EvaluationEngine
+from stock_alert.http_session import get_session
+from stock_alert.market_data import DEFAULT_TIMEOUT_S, MarketDataCache
+from stock_alert.notifications import NotificationQueue
+
+if TYPE_CHECKING:
+    import yfinance
+
+
+class DataPlane:
+    """
+    Everything that only depends on the symbols and not on who watches them: the market data cache, the ticker objects,
+    the exchange codes, the evaluation workers and the notification worker.
+
+    StockAlerts sharing one data plane fetch every symbol at most once per cycle, no matter how many of them watch it.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        request_timeout_s: float = DEFAULT_TIMEOUT_S,
+        max_concurrent_requests: int = 8,
+    ) -> None:
+        self.market_data = MarketDataCache(
+            request_timeout_s=request_timeout_s, max_concurrent_requests=max_concurrent_requests
+        )
+        self.engine = EvaluationEngine(max_workers=max_workers, timeout_s=3 * request_timeout_s)
+        self.notifications = NotificationQueue()
+        # a ticker lives as long as it is in use, the data kept for longer is cached by the market data cache
+        self.tickers: "weakref.WeakValueDictionary[str, yfinance.Ticker]" = weakref.WeakValueDictionary()
+        self.exchanges: dict[str, str] = {}
+
+    def ticker(self, symbol: str) -> "yfinance.Ticker":
+        """
+        Return the ticker of the symbol, created on first use and shared by all watchlists while it is in use.
+        """
+        ticker = self.tickers.get(symbol)
+        if ticker is None:
+            # yfinance takes long to import, so it is only loaded once the first ticker is needed
+            import yfinance  # pylint: disable=import-outside-toplevel
+
+            ticker = self.tickers.setdefault(symbol, yfinance.Ticker(symbol, session=get_session()))
+        return ticker
+
+
+class LazyTickers(Mapping[str, "yfinance.Ticker"]):
+    """
+    The tickers of a watchlist by symbol, created by the data plane when they are first looked up. Iterating over the
+    watchlist or checking whether it contains a symbol does not create any ticker.
+    """
+
+    def __init__(self, symbols: Iterable[str], data_plane: DataPlane) -> None:
+        self.symbols = dict.fromkeys(symbols)
+        self.data_plane = data_plane
+
+    def __getitem__(self, symbol: str) -> "yfinance.Ticker":
+        if symbol not in self.symbols:
+            raise KeyError(symbol)
+        return self.data_plane.ticker(symbol)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self.symbols
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
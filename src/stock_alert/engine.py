@@ -0,0 +1,92 @@
+import concurrent.futures
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class EvaluationEngine:
+    """
+    Runs the per-symbol fetch and alert checks of a cycle concurrently on a thread pool.
+
+    Each call of map waits at most timeout_s seconds. Tasks that are not done by then are reported as timed out, so one
+    slow response can not stall the remaining symbols.
+    """
+
+    def __init__(self, max_workers: int = 16, timeout_s: float = 30) -> None:
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="stock_alert")
+
+    def map(
+        self, func: Callable[[str], T], keys: list[str], timeout_per_key_s: Optional[float] = None
+    ) -> tuple[dict[str, T], dict[str, BaseException]]:
+        """
+        Call func for every key concurrently. Returns the results and the errors, both keyed by the key.
+
+        With timeout_per_key_s, every call times out on its own that many seconds after it started, instead of all
+        calls sharing the deadline of the engine, e.g. for many calls that queue for a few request slots.
+        """
+        starts: dict[str, float] = {}
+
+        def call(key: str) -> T:
+            starts[key] = time.monotonic()
+            return func(key)
+
+        futures = {self._executor.submit(call, key): key for key in keys}
+        if timeout_per_key_s is None:
+            timeout_s = self.timeout_s
+            done, not_done = concurrent.futures.wait(futures, timeout=timeout_s)
+        else:
+            timeout_s = timeout_per_key_s
+            done, not_done = self._wait_per_key(futures, starts, timeout_s)
+
+        results: dict[str, T] = {}
+        errors: dict[str, BaseException] = {}
+        for future in done:
+            key = futures[future]
+            exception = future.exception()
+            if exception is None:
+                results[key] = future.result()
+            else:
+                errors[key] = exception
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = TimeoutError(f"no result within {timeout_s} seconds")
+        return results, errors
+
+    @staticmethod
+    def _wait_per_key(
+        futures: dict["concurrent.futures.Future[T]", str], starts: dict[str, float], timeout_s: float
+    ) -> tuple[set["concurrent.futures.Future[T]"], set["concurrent.futures.Future[T]"]]:
+        """
+        Wait for the futures until each is done or timeout_s seconds past its start. Calls still waiting for a worker
+        only time out if no call started or finished for timeout_s seconds, i.e. if all workers are stuck.
+        """
+        pending = set(futures)
+        done: set["concurrent.futures.Future[T]"] = set()
+        not_done: set["concurrent.futures.Future[T]"] = set()
+        progress = time.monotonic()
+        num_started = 0
+        while pending:
+            deadline = min([starts[futures[future]] for future in pending if futures[future] in starts] + [progress])
+            finished, pending = concurrent.futures.wait(
+                pending,
+                timeout=max(0.0, deadline + timeout_s - time.monotonic()),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            done |= finished
+            now = time.monotonic()
+            if finished or len(starts) > num_started:
+                progress = now
+                num_started = len(starts)
+            for future in list(pending):
+                if now - starts.get(futures[future], progress) >= timeout_s:
+                    pending.remove(future)
+                    not_done.add(future)
+        return done, not_done
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
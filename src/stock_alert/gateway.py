@@ -0,0 +1,278 @@
+import logging
+import random
+import threading
+import time
+import urllib.error
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+from stock_alert.metrics import METRICS
+
+T = TypeVar("T")
+
+# yfinance.download logs the errors of the single symbols instead of raising them
+RATE_LIMIT_MESSAGE = "Too Many Requests"
+
+
+class GatewayError(Exception):
+    """
+    A request that was not answered because of the gateway or the rate limits of yahoo finance.
+    """
+
+
+class RateLimitedError(GatewayError):
+    """
+    Raised for rate limited requests whose client does not raise an error of its own, e.g. yfinance.download.
+    """
+
+
+class CircuitOpenError(GatewayError):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """
+    Check whether the error is a HTTP 429 of urllib, requests or yfinance.
+    """
+    if isinstance(error, RateLimitedError) or type(error).__name__ == "YFRateLimitError":
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    return getattr(getattr(error, "response", None), "status_code", None) == 429
+
+
+def is_retriable(error: BaseException) -> bool:
+    """
+    Check whether the request may succeed when it is sent again: rate limits, server errors, timeouts and connection
+    errors. Other client errors like a 404 fail the same way every time.
+    """
+    if is_rate_limited(error):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is not None:
+        return int(status_code) >= 500
+    # timeouts and connection errors, also those of requests, are OSErrors
+    return isinstance(error, OSError)
+
+
+class TokenBucket:
+    """
+    Lets rate requests per second pass on average and up to burst requests at once. The rate can be changed at any time.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take the tokens, waiting until they are available. Returns the seconds waited.
+        """
+        # a request larger than the bucket would never fit, it takes the whole bucket instead
+        tokens = min(tokens, self.burst)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold failed requests in a row, so that no more requests are sent to a service that is
+    down or banning us. After reset_timeout_s seconds a single trial request is let through, it closes the breaker
+    again if it succeeds and reopens it otherwise.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout_s:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout_s:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                METRICS.increment("circuit_opened")
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class RequestGateway:
+    """
+    The single way out to yahoo finance. Every request passes a token bucket limiting the requests per second and a
+    circuit breaker, failed requests are retried with jittered exponential backoff, and identical requests in flight
+    at the same time are sent only once.
+
+    The rate adapts like TCP congestion control: a rate limited response halves it, down to min_rate, and every
+    successful request raises it by increase / rate, i.e. by about increase requests per second every second, back up
+    to max_rate.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = 50,
+        burst: float = 100,
+        min_rate: float = 1,
+        increase: float = 1,
+        max_retries: int = 3,
+        backoff_s: float = 1,
+        max_backoff_s: float = 30,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30,
+    ) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.bucket = TokenBucket(max_rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout_s)
+        self._in_flight: dict[Hashable, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def set_rate(self, max_rate: float, burst: Optional[float] = None) -> None:
+        self.max_rate = max_rate
+        self.bucket.rate = max_rate
+        if burst is not None:
+            self.bucket.burst = burst
+
+    def call(
+        self, fn: Callable[..., T], *args: Any, key: Optional[Hashable] = None, cost: float = 1, **kwargs: Any
+    ) -> T:
+        """
+        Send the request fn(*args, **kwargs), which costs cost tokens, e.g. the number of symbols of a batch. Requests
+        with the same key that are sent while it is in flight wait for its result instead of being sent again.
+        """
+        if key is None:
+            return self._call_with_retries(fn, args, kwargs, cost)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            METRICS.increment("deduplicated_requests")
+            return future.result()
+
+        try:
+            result = self._call_with_retries(fn, args, kwargs, cost)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _call_with_retries(self, fn: Callable[..., T], args: Any, kwargs: dict[str, Any], cost: float) -> T:
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                METRICS.increment("circuit_rejections")
+                raise CircuitOpenError("Too many failed requests to yahoo finance, pausing all requests for a while")
+            waited = self.bucket.acquire(cost)
+            if waited > 0:
+                METRICS.observe("throttled", waited)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retriable(e):
+                    # the service answered, it is up
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if is_rate_limited(e):
+                    self.slow_down()
+                if attempt == self.max_retries:
+                    raise
+                METRICS.increment("request_retries")
+                time.sleep(min(self.max_backoff_s, self.backoff_s * 2**attempt) * random.uniform(0.5, 1.5))
+            else:
+                self.breaker.record_success()
+                self.speed_up()
+                return result
+        raise AssertionError("unreachable")
+
+    def slow_down(self) -> None:
+        METRICS.increment("rate_limited")
+        with self._lock:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+
+    def speed_up(self) -> None:
+        with self._lock:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase / self.bucket.rate)
+
+
+class RateLimitLog(logging.Handler):
+    """
+    Notices the rate limit errors the current thread logs to the yfinance logger, while used as a context manager.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.thread = threading.get_ident()
+        self.rate_limited = False
+        self.logger = logging.getLogger("yfinance")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread == self.thread and RATE_LIMIT_MESSAGE in record.getMessage():
+            self.rate_limited = True
+
+    def __enter__(self) -> "RateLimitLog":
+        self.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.logger.removeHandler(self)
+
+
+# the gateway shared by all requests of the process
+GATEWAY = RequestGateway()
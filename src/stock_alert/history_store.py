@@ -0,0 +1,192 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.market_data import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_TIMEOUT_S,
+    INTRADAY_INTERVAL,
+    fetch_history_batch,
+    group_by_day,
+)
+from stock_alert.metrics import METRICS
+
+# the columns of the store, the timestamps are nanoseconds since the epoch in UTC
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+DTYPES = {"timestamp": np.dtype("<i8"), **{column: np.dtype("<f8") for column in COLUMNS[1:]}}
+FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+# the periods downloaded for symbols not stored yet, yahoo finance only has the 5 minute bars of the last 60 days
+BACKFILL_PERIODS = {"1d": "1y", INTRADAY_INTERVAL: "60d"}
+
+
+class Bars:
+    """
+    The bars of one symbol as read-only column arrays. Slicing returns views into the memory-mapped files, nothing is
+    copied until the arrays are written to or converted to a pandas frame.
+    """
+
+    __slots__ = COLUMNS
+
+    def __init__(
+        self,
+        timestamp: np.ndarray,
+        open: np.ndarray,  # pylint: disable=redefined-builtin
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+    ) -> None:
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, idx: slice) -> "Bars":
+        return Bars(*(getattr(self, column)[idx] for column in COLUMNS))
+
+    def between(self, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> "Bars":
+        """
+        Return the bars from start up to, but excluding, end by binary search on the sorted timestamps.
+        """
+        first = 0 if start is None else int(np.searchsorted(self.timestamp, start.value, side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.timestamp, end.value, side="left"))
+        return self[first:last]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {FRAME_COLUMNS[column]: np.asarray(getattr(self, column)) for column in COLUMNS[1:]},
+            index=pd.DatetimeIndex(pd.to_datetime(np.asarray(self.timestamp), utc=True)),
+        )
+
+
+EMPTY_BARS = Bars(*(np.empty(0, DTYPES[column]) for column in COLUMNS))
+
+
+class HistoryStore:
+    """
+    Local store of the daily and intraday bars of many symbols, which warm up the indicators of the alerts and are
+    replayed by the backtest.
+
+    Every column of a symbol and interval is a raw little endian array in its own file, root/<interval>/<symbol>/
+    <column>, which is only ever appended to. Reads map the files into memory, so the operating system pages in just
+    the slices an alert looks at and the bars of thousands of symbols do not need to fit into memory.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._maps: dict[tuple[str, str], tuple[int, Bars]] = {}
+
+    def directory(self, symbol: str, interval: str) -> Path:
+        return self.root / interval / symbol
+
+    def symbols(self, interval: str) -> list[str]:
+        directory = self.root / interval
+        return sorted(path.name for path in directory.iterdir()) if directory.exists() else []
+
+    def read(self, symbol: str, interval: str = "1d") -> Bars:
+        """
+        Return all stored bars of the symbol. The memory maps are reused until the next append to the symbol.
+        """
+        path = self.directory(symbol, interval) / "timestamp"
+        if not path.exists():
+            return EMPTY_BARS
+        size = path.stat().st_size
+        entry = self._maps.get((symbol, interval))
+        if entry is None or entry[0] != size:
+            length = size // DTYPES["timestamp"].itemsize
+            if length == 0:
+                return EMPTY_BARS
+            bars = Bars(
+                *(
+                    np.memmap(path.with_name(column), dtype=DTYPES[column], mode="r", shape=(length,))
+                    for column in COLUMNS
+                )
+            )
+            entry = self._maps[(symbol, interval)] = (size, bars)
+        return entry[1]
+
+    def last_timestamp(self, symbol: str, interval: str = "1d") -> Optional[pd.Timestamp]:
+        bars = self.read(symbol, interval)
+        return pd.Timestamp(int(bars.timestamp[-1]), tz="UTC") if len(bars) else None
+
+    def append(self, symbol: str, interval: str, history: pd.DataFrame) -> int:
+        """
+        Append the bars of a yfinance history that are newer than the stored ones. A bar with the same timestamp as
+        the last stored one replaces it, since it was still forming when it was stored. Returns the number of new bars.
+        """
+        if history.empty:
+            return 0
+        index = history.index if history.index.tz is not None else history.index.tz_localize("UTC")
+        columns = {"timestamp": index.tz_convert("UTC").as_unit("ns").asi8}
+        for column in COLUMNS[1:]:
+            name = FRAME_COLUMNS[column]
+            columns[column] = history[name].to_numpy(float) if name in history else np.full(len(history), np.nan)
+
+        directory = self.directory(symbol, interval)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._truncate(directory)
+        last = self.last_timestamp(symbol, interval)
+        if last is not None:
+            keep = columns["timestamp"] >= last.value
+            columns = {column: values[keep] for column, values in columns.items()}
+            if len(columns["timestamp"]) and columns["timestamp"][0] == last.value:
+                self._replace_last(symbol, interval, {column: values[0] for column, values in columns.items()})
+                columns = {column: values[1:] for column, values in columns.items()}
+
+        # the timestamps are written last, so an interrupted append only leaves the other columns too long
+        for column in (*COLUMNS[1:], "timestamp"):
+            with open(directory / column, "ab") as file:
+                file.write(np.ascontiguousarray(columns[column], dtype=DTYPES[column]).tobytes())
+        return len(columns["timestamp"])
+
+    @staticmethod
+    def _truncate(directory: Path) -> None:
+        """
+        Cut off the columns of an interrupted append beyond the last bar all of them hold completely, including a
+        partially written timestamp.
+        """
+        sizes = {
+            column: (directory / column).stat().st_size if (directory / column).exists() else 0 for column in COLUMNS
+        }
+        length = min(sizes[column] // DTYPES[column].itemsize for column in COLUMNS)
+        for column in COLUMNS:
+            if sizes[column] != length * DTYPES[column].itemsize:
+                os.truncate(directory / column, length * DTYPES[column].itemsize)
+
+    def _replace_last(self, symbol: str, interval: str, row: dict[str, float]) -> None:
+        directory = self.directory(symbol, interval)
+        for column in COLUMNS[1:]:
+            with open(directory / column, "r+b") as file:
+                file.seek(-DTYPES[column].itemsize, os.SEEK_END)
+                file.write(np.array(row[column], dtype=DTYPES[column]).tobytes())
+
+    def backfill(
+        self,
+        symbols: list[str],
+        interval: str = "1d",
+        period: str = "1y",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+    ) -> int:
+        """
+        Download the bars missing in the store. Symbols that are not stored yet get the whole period, the others only
+        the bars since their last one, in batched downloads of the symbols whose last bar is on the same day. Returns
+        the number of new bars.
+        """
+        groups = group_by_day({symbol: self.last_timestamp(symbol, interval) for symbol in symbols})
+
+        new_bars = 0
+        for start, group in groups.items():
+            histories = fetch_history_batch(group, period, interval, chunk_size, timeout_s, start=start)
+            for symbol, history in histories.items():
+                new_bars += self.append(symbol, interval, history)
+        METRICS.increment("backfilled_bars", new_bars)
+        return new_bars
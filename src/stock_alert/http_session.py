@@ -0,0 +1,45 @@
+import threading
+from typing import Any
+
+# connections kept open per host by the requests fallback, enough for the search workers and yfinance's threads
+POOL_SIZE = 32
+FALLBACK_HEADERS = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+
+_session: Any = None
+_session_lock = threading.Lock()
+
+
+def new_session(pool_size: int = POOL_SIZE) -> Any:
+    """
+    Create an HTTP session that keeps its connections alive and asks for compressed responses.
+
+    yfinance's curl_cffi is preferred, it impersonates a browser, which yahoo finance expects, and sends the same
+    Accept-Encoding as the browser. Without it, a requests session with a pool of pool_size connections per host is
+    used.
+    """
+    # pylint: disable=import-outside-toplevel
+    try:
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(FALLBACK_HEADERS)
+        return session
+    return curl_requests.Session(impersonate="chrome")
+
+
+def get_session() -> Any:
+    """
+    Return the session shared by the symbol search and yfinance, created on first use. Reusing it means that the TLS
+    handshake with yahoo finance is done once per connection and not once per request.
+    """
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+        return _session
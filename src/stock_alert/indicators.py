@@ -0,0 +1,138 @@
+import numpy as np
+
+
+def grow(array: np.ndarray, rows: int, fill: float = 0) -> np.ndarray:
+    """
+    Return the array extended to the given number of rows along the first axis, new rows are set to fill.
+    """
+    if rows <= len(array):
+        return array
+    grown = np.full((rows, *array.shape[1:]), fill, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def drop_nan(rows: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Leave out the rows whose value is NaN, e.g. a missing close, which would otherwise spoil the state of the row.
+    """
+    valid = ~np.isnan(values)
+    if valid.all():
+        return rows, values
+    return rows[valid], values[valid]
+
+
+class RollingWindow:
+    """
+    Ring buffers of the last size values of many series, one row per series. Running sums keep the mean and the
+    standard deviation of every window up to date in O(1) per value.
+
+    All methods take an array of distinct rows, so that one call updates many series at once. NaN values are skipped.
+    """
+
+    def __init__(self, size: int, rows: int = 0) -> None:
+        if size < 1:
+            raise ValueError(f"size must be at least 1, got {size}")
+        self.size = size
+        self.values = np.zeros((rows, size))
+        self.heads = np.zeros(rows, dtype=np.intp)
+        self.counts = np.zeros(rows, dtype=np.intp)
+        self.sums = np.zeros(rows)
+        self.squares = np.zeros(rows)
+
+    def resize(self, rows: int) -> None:
+        self.values = grow(self.values, rows)
+        self.heads = grow(self.heads, rows)
+        self.counts = grow(self.counts, rows)
+        self.sums = grow(self.sums, rows)
+        self.squares = grow(self.squares, rows)
+
+    def push(self, rows: np.ndarray, values: np.ndarray) -> None:
+        rows, values = drop_nan(rows, values)
+        heads = self.heads[rows]
+        # the oldest value drops out of a full window, it is overwritten by the new one
+        evicted = np.where(self.counts[rows] == self.size, self.values[rows, heads], 0.0)
+        self.values[rows, heads] = values
+        self.sums[rows] += values - evicted
+        self.squares[rows] += values * values - evicted * evicted
+        self.heads[rows] = (heads + 1) % self.size
+        self.counts[rows] = np.minimum(self.counts[rows] + 1, self.size)
+
+    def ready(self, rows: np.ndarray) -> np.ndarray:
+        return self.counts[rows] == self.size
+
+    def mean(self, rows: np.ndarray) -> np.ndarray:
+        return self.sums[rows] / self.size
+
+    def std(self, rows: np.ndarray) -> np.ndarray:
+        mean = self.mean(rows)
+        # rounding of the running sums can make the variance of a constant series slightly negative
+        return np.sqrt(np.maximum(self.squares[rows] / self.size - mean * mean, 0.0))
+
+
+class ExponentialAverage:
+    """
+    Exponentially weighted averages of many series with the smoothing factor alpha, seeded with the first value. An
+    average is ready once it has seen warmup values. NaN values are skipped.
+    """
+
+    def __init__(self, alpha: float, warmup: int, rows: int = 0) -> None:
+        self.alpha = alpha
+        self.warmup = warmup
+        self.values = np.zeros(rows)
+        self.counts = np.zeros(rows, dtype=np.intp)
+
+    @classmethod
+    def from_span(cls, span: int, rows: int = 0) -> "ExponentialAverage":
+        return cls(2 / (span + 1), span, rows)
+
+    def resize(self, rows: int) -> None:
+        self.values = grow(self.values, rows)
+        self.counts = grow(self.counts, rows)
+
+    def push(self, rows: np.ndarray, values: np.ndarray) -> None:
+        rows, values = drop_nan(rows, values)
+        previous = self.values[rows]
+        self.values[rows] = np.where(self.counts[rows] == 0, values, previous + self.alpha * (values - previous))
+        self.counts[rows] += 1
+
+    def ready(self, rows: np.ndarray) -> np.ndarray:
+        return self.counts[rows] >= self.warmup
+
+    def mean(self, rows: np.ndarray) -> np.ndarray:
+        return self.values[rows]
+
+
+class RelativeStrength:
+    """
+    The relative strength index of many series with Wilder's smoothing of the gains and losses over period values.
+    NaN values are skipped, the next change is taken from the last valid value.
+    """
+
+    def __init__(self, period: int, rows: int = 0) -> None:
+        self.previous = np.full(rows, np.nan)
+        self.gains = ExponentialAverage(1 / period, period, rows)
+        self.losses = ExponentialAverage(1 / period, period, rows)
+
+    def resize(self, rows: int) -> None:
+        self.previous = grow(self.previous, rows, np.nan)
+        self.gains.resize(rows)
+        self.losses.resize(rows)
+
+    def push(self, rows: np.ndarray, values: np.ndarray) -> None:
+        rows, values = drop_nan(rows, values)
+        previous = self.previous[rows]
+        has_previous = ~np.isnan(previous)
+        changes = values[has_previous] - previous[has_previous]
+        self.gains.push(rows[has_previous], np.maximum(changes, 0.0))
+        self.losses.push(rows[has_previous], np.maximum(-changes, 0.0))
+        self.previous[rows] = values
+
+    def ready(self, rows: np.ndarray) -> np.ndarray:
+        return self.gains.ready(rows)
+
+    def value(self, rows: np.ndarray) -> np.ndarray:
+        gains = self.gains.mean(rows)
+        losses = self.losses.mean(rows)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
@@ -2,8 +2,18 @@ import argparse
 import sys
 from pathlib import Path
 
-from stock_alert.alerts import AlertRelativeDailyChange
 from stock_alert.class_stock_alert import StockAlert
+from stock_alert.config import make_alert
+from stock_alert.gateway import GATEWAY
+from stock_alert.history_store import HistoryStore
+from stock_alert.metrics import METRICS
+from stock_alert.schedule import MarketScheduler
+from stock_alert.service import AlertService
+from stock_alert.sharding import ShardedRunner
+from stock_alert.streaming import FallbackSource, PollingSource, ReplaySource, YahooWebSocketSource
+
+DEFAULT_ALERT = {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03}
+DEFAULT_REMIND_INTERVAL_H = 1 / 70
 
 
 def parse_args(args: list[str]) -> argparse.Namespace:
@@ -12,7 +22,51 @@ def parse_args(args: list[str]) -> argparse.Namespace:
         "--path-stock-list",
         help="Path to the file containing a .txt file the stocks of to watch",
         type=str,
-        required=True,
+    )
+    parser.add_argument(
+        "--users",
+        help="Path to a .json file with the stock lists and alerts of several users, which share their data",
+        type=str,
+    )
+    parser.add_argument(
+        "--config",
+        help="Path to a .yaml, .toml or .json file with the alerts, receivers and reminder intervals per stock or list",
+        type=str,
+    )
+    parser.add_argument(
+        "--market-hours",
+        help="Only check stocks while their exchange is open, exchange holidays are not taken into account",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stream",
+        help="Check the alerts on every streamed quote instead of polling",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--replay",
+        help="Stream the quotes of this .csv or .jsonl file instead of live quotes",
+        type=str,
+    )
+    parser.add_argument(
+        "--history-store",
+        help="Directory of the local store of daily and 5 minute bars, which is backfilled once per day",
+        type=str,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Split the stock list by symbol across this many worker processes, for very large stock lists",
+        type=int,
+    )
+    parser.add_argument(
+        "--max-requests-per-s",
+        help="Upper limit of the requests per second sent to yahoo finance, lowered automatically when rate limited",
+        type=float,
+    )
+    parser.add_argument(
+        "--metrics-port",
+        help="Record metrics of the alert loop and serve them on this port on /metrics and /metrics.json",
+        type=int,
     )
 
     args, undesired = parser.parse_known_args(args)
@@ -20,8 +74,26 @@ def parse_args(args: list[str]) -> argparse.Namespace:
     if undesired is not None and len(undesired) > 0:
         raise argparse.ArgumentError(None, f"Undesired arguments: {undesired}")
 
-    if Path(args.path_stock_list).is_file() is False:
-        raise FileNotFoundError(f"File {args.path_stock_list} does not exist")
+    if args.path_stock_list is None and args.users is None and args.config is None:
+        parser.error("one of the arguments --path-stock-list --users --config is required")
+
+    if args.workers is not None:
+        # the sharded runner polls a single stock list on its own schedule, without a history store or streaming
+        incompatible = {
+            "--users": args.users is not None,
+            "--config": args.config is not None,
+            "--market-hours": args.market_hours,
+            "--stream": args.stream,
+            "--replay": args.replay is not None,
+            "--history-store": args.history_store is not None,
+        }
+        for option, given in incompatible.items():
+            if given:
+                parser.error(f"argument --workers: not allowed with argument {option}")
+
+    for path in (args.path_stock_list, args.users, args.config):
+        if path is not None and Path(path).is_file() is False:
+            raise FileNotFoundError(f"File {path} does not exist")
 
     return args
 
@@ -33,10 +105,47 @@ def main() -> None:
     args = parse_args(sys.argv[1:])
     print(args)
 
-    alert = StockAlert(Path(args.path_stock_list), receiver_mail="", remind_interval_h=1 / 70)
+    if args.metrics_port is not None:
+        METRICS.enabled = True
+        METRICS.serve(args.metrics_port)
+
+    if args.max_requests_per_s is not None:
+        GATEWAY.set_rate(args.max_requests_per_s)
+
+    scheduler = MarketScheduler(default_interval_s=30) if args.market_hours else None
+    if args.users is not None or args.config is not None:
+        service = AlertService()
+        if args.users is not None:
+            service.load_users(Path(args.users))
+        if args.config is not None:
+            service.load_config(Path(args.config))
+        service.spin(30, scheduler=scheduler)
+        return
+
+    if args.workers is not None:
+        runner = ShardedRunner(
+            Path(args.path_stock_list), DEFAULT_ALERT, args.workers, remind_interval_h=DEFAULT_REMIND_INTERVAL_H
+        )
+        runner.run(30)
+        return
+
+    history_store = HistoryStore(Path(args.history_store)) if args.history_store is not None else None
+    alert = StockAlert(
+        Path(args.path_stock_list),
+        receiver_mail="",
+        remind_interval_h=DEFAULT_REMIND_INTERVAL_H,
+        history_store=history_store,
+    )
     # alert = StockAlert(Path(args.path_stock_list), receiver_mail=os.environ["TEST_MAIL"], remind_interval_h=1 / 70)
-    alert.configure_same_alert_for_all(AlertRelativeDailyChange(0.03))
-    alert.spin(30)
+    alert.configure_same_alert_for_all(make_alert(DEFAULT_ALERT))
+    if args.replay is not None:
+        alert.stream(ReplaySource(Path(args.replay)))
+    elif args.stream:
+        symbols = alert.watched_symbols()
+        # once the streamer drops, the quotes are polled instead
+        alert.stream(FallbackSource(YahooWebSocketSource(symbols), PollingSource(symbols, alert.market_data, 30)))
+    else:
+        alert.spin(30, scheduler=scheduler)
 
 
 if __name__ == "__main__":
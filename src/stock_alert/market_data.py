@@ -0,0 +1,480 @@
+import threading
+import time
+from datetime import date
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.gateway import GATEWAY, GatewayError, RateLimitedError, RateLimitLog, RequestGateway
+from stock_alert.http_session import get_session
+from stock_alert.metrics import METRICS
+
+if TYPE_CHECKING:
+    import yfinance
+
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_TIMEOUT_S = 10
+INTRADAY_INTERVAL = "5m"
+# the same interval as a pandas frequency, used to aggregate streamed ticks into bars
+INTRADAY_BAR = "5min"
+# cached in place of a metadata field the ticker does not have
+MISSING_FIELD = object()
+
+
+def chunk_symbols(symbols: list[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> list[list[str]]:
+    """
+    Split the symbols into chunks of at most chunk_size symbols.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    return [symbols[idx : idx + chunk_size] for idx in range(0, len(symbols), chunk_size)]
+
+
+def slice_history(df: pd.DataFrame, symbols: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    Slice the wide frame returned by yfinance.download into one frame per symbol. Symbols without any data are left
+    out, so that the caller can fall back to fetching them one by one.
+    """
+    if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex):
+        return {}
+
+    available = set(df.columns.get_level_values(0))
+    histories = {}
+    for symbol in symbols:
+        if symbol not in available:
+            continue
+        # rows of other symbols' trading hours are all NaN for this symbol
+        history = df[symbol].dropna(how="all")
+        if not history.empty:
+            histories[symbol] = history
+    return histories
+
+
+def group_by_day(last_timestamps: Mapping[str, Optional[pd.Timestamp]]) -> dict[Optional[pd.Timestamp], list[str]]:
+    """
+    Group symbols for batched downloads of the bars since their last one. The symbols whose last bar is on the same
+    day share one download from the earliest of their last bars, so that a few symbols lagging by a bar do not split
+    it, the bars a symbol already has are dropped when they are merged. Symbols without any bar are keyed by None.
+    """
+    days: dict[Optional[date], list[str]] = {}
+    for symbol, timestamp in last_timestamps.items():
+        days.setdefault(None if timestamp is None else timestamp.tz_convert("UTC").date(), []).append(symbol)
+
+    groups: dict[Optional[pd.Timestamp], list[str]] = {}
+    for day, symbols in days.items():
+        starts = [last_timestamps[symbol] for symbol in symbols]
+        groups[None if day is None else min(start for start in starts if start is not None)] = symbols
+    return groups
+
+
+def download(symbols: list[str], interval: str, timeout_s: float, **time_range: Any) -> pd.DataFrame:
+    """
+    Download the bars of the symbols with yfinance.download, raising a RateLimitedError if any of them was rate
+    limited, which yfinance only logs.
+    """
+    # yfinance takes long to import, so it is only loaded once the first bars are needed
+    import yfinance  # pylint: disable=import-outside-toplevel
+
+    with RateLimitLog() as log, METRICS.time("fetch_batch"):
+        df = yfinance.download(
+            symbols,
+            **time_range,
+            interval=interval,
+            group_by="ticker",
+            progress=False,
+            threads=True,
+            timeout=timeout_s,
+            session=get_session(),
+        )
+    if log.rate_limited:
+        raise RateLimitedError(f"Rate limited while downloading {len(symbols)} symbols")
+    return df
+
+
+def fetch_history_batch(
+    symbols: list[str],
+    period: str = "1d",
+    interval: str = "5m",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout_s: float = DEFAULT_TIMEOUT_S,
+    start: Optional[pd.Timestamp] = None,
+    gateway: RequestGateway = GATEWAY,
+) -> dict[str, pd.DataFrame]:
+    """
+    Fetch the price history of many symbols with one yfinance.download call per chunk. If start is given, only the
+    bars from start on are fetched instead of the whole period. Chunks that fail in the gateway are left out.
+    """
+    time_range: dict[str, Any] = {"period": period} if start is None else {"start": start}
+    histories: dict[str, pd.DataFrame] = {}
+    # the chunks are downloaded one after another, yfinance.download is not safe to be called from several threads
+    for chunk in chunk_symbols(symbols, chunk_size):
+        try:
+            # yfinance requests every symbol on its own, so a chunk costs a token per symbol
+            df = gateway.call(
+                download,
+                chunk,
+                interval,
+                timeout_s,
+                key=("download", tuple(chunk), interval, start, period),
+                cost=len(chunk),
+                **time_range,
+            )
+        except GatewayError as e:
+            print(f"Error while downloading {len(chunk)} symbols: {e}")
+            df = None
+        sliced = slice_history(df, chunk)
+        # yfinance requests the chart of every symbol on its own
+        METRICS.increment("requests", len(chunk))
+        METRICS.increment("batch_misses", len(chunk) - len(sliced))
+        histories.update(sliced)
+    return histories
+
+
+class PriceMatrix:
+    """
+    The opening and latest prices of many symbols as NumPy arrays, both in the order of symbols. Symbols without any
+    history have NaN prices.
+    """
+
+    def __init__(self, symbols: list[str], opening_prices: np.ndarray, latest_prices: np.ndarray) -> None:
+        self.symbols = symbols
+        self.opening_prices = opening_prices
+        self.latest_prices = latest_prices
+
+    @classmethod
+    def from_histories(cls, symbols: list[str], histories: dict[str, pd.DataFrame]) -> "PriceMatrix":
+        opening_prices = np.full(len(symbols), np.nan)
+        latest_prices = np.full(len(symbols), np.nan)
+        for idx, symbol in enumerate(symbols):
+            history = histories.get(symbol)
+            if history is None or history.empty:
+                continue
+            opening_prices[idx] = history["Open"].iat[0]
+            latest_prices[idx] = history["Close"].iat[-1]
+        return cls(symbols, opening_prices, latest_prices)
+
+
+class IntradayBuffer:
+    """
+    The intraday bars of one symbol for its current trading session, extended bar by bar.
+    """
+
+    __slots__ = ("bars",)
+
+    def __init__(self) -> None:
+        self.bars = pd.DataFrame()
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        return None if self.bars.empty else self.bars.index[-1]
+
+    def extend(self, bars: pd.DataFrame) -> None:
+        """
+        Append the bars newer than the last buffered one. The last buffered bar is replaced, since it is still forming
+        while it is fetched. Bars of a new session replace the whole buffer.
+        """
+        if bars.empty:
+            return
+
+        # the index is in the time zone of the exchange, see MarketDataCache.timezones, so its date changes at the start
+        # of each session
+        session_date = bars.index[-1].date()
+        bars = bars[[timestamp.date() == session_date for timestamp in bars.index]]
+        if self.bars.empty or self.bars.index[-1].date() != session_date:
+            self.bars = bars
+            return
+
+        self.bars = pd.concat([self.bars[self.bars.index < bars.index[0]], bars])
+
+    def add_tick(self, timestamp: pd.Timestamp, price: float, volume: float = 0.0) -> None:
+        """
+        Aggregate a single trade into the bar it falls into. Ticks older than the last bar are dropped, a tick of a new
+        session replaces the whole buffer.
+        """
+        if not self.bars.empty:
+            timestamp = timestamp.tz_convert(self.bars.index.tz)
+        bar_start = timestamp.floor(INTRADAY_BAR)
+        last = self.last_timestamp
+        if last is not None and bar_start < last:
+            return
+
+        if last is None or last.date() != bar_start.date():
+            self.bars = pd.DataFrame(
+                {"Open": price, "High": price, "Low": price, "Close": price, "Volume": volume},
+                index=pd.DatetimeIndex([bar_start]),
+            )
+        elif bar_start == last:
+            bar = self.bars.iloc[-1]
+            self.bars.loc[last, ["High", "Low", "Close", "Volume"]] = [
+                np.fmax(bar.get("High", np.nan), price),
+                np.fmin(bar.get("Low", np.nan), price),
+                price,
+                np.nansum([bar.get("Volume", 0), volume]),
+            ]
+        else:
+            row = pd.DataFrame(
+                {"Open": price, "High": price, "Low": price, "Close": price, "Volume": volume},
+                index=pd.DatetimeIndex([bar_start]),
+            )
+            self.bars = pd.concat([self.bars, row])
+
+
+class MarketDataCache:
+    """
+    Cache for price histories and ticker metadata, shared by all alerts of a StockAlert.
+
+    Histories are keyed by (symbol, period, interval) and expire after history_ttl_s seconds, which should match the
+    spin interval so that every cycle fetches each history at most once. The heavy info metadata is kept for the whole
+    day, of fast_info and the metadata read via metadata_field only the single fields are kept.
+
+    All requests are sent with a timeout of request_timeout_s seconds through the gateway, and at most
+    max_concurrent_requests of them are in flight at the same time, no matter how many threads read through the cache.
+
+    A batched download converts the bars of all symbols of a chunk to the most common time zone among them, e.g. the
+    bars of a Tokyo stock in a chunk of US stocks to New York time, where its session crosses midnight. The intraday
+    bars of the symbols in timezones are converted back to the time zone of their exchange.
+    """
+
+    def __init__(
+        self,
+        history_ttl_s: float = 60,
+        request_timeout_s: float = DEFAULT_TIMEOUT_S,
+        max_concurrent_requests: int = 8,
+        gateway: RequestGateway = GATEWAY,
+    ) -> None:
+        self.history_ttl_s = history_ttl_s
+        self.request_timeout_s = request_timeout_s
+        self.request_slots = threading.BoundedSemaphore(max_concurrent_requests)
+        self.gateway = gateway
+        self._histories: dict[tuple[str, str, str], tuple[float, pd.DataFrame]] = {}
+        self._metadata: dict[tuple[str, str], tuple[date, Any]] = {}
+        self._fields: dict[tuple[str, str, str], tuple[date, Any]] = {}
+        self.intraday: dict[str, IntradayBuffer] = {}
+        self.timezones: dict[str, str] = {}
+
+    def store_history(self, symbol: str, period: str, interval: str, history: pd.DataFrame) -> None:
+        self._histories[(symbol, period, interval)] = (time.time(), history)
+
+    def cached_history(self, symbol: str, period: str, interval: str) -> Optional[pd.DataFrame]:
+        """
+        Return the cached history if it is still fresh, otherwise None.
+        """
+        entry = self._histories.get((symbol, period, interval))
+        if entry is None or time.time() - entry[0] >= self.history_ttl_s:
+            METRICS.increment("cache_misses")
+            return None
+        METRICS.increment("cache_hits")
+        return entry[1]
+
+    def history(self, ticker: "yfinance.Ticker", period: str = "1d", interval: str = "5m") -> pd.DataFrame:
+        history = self.cached_history(ticker.ticker, period, interval)
+        if history is None:
+            try:
+                history = self.gateway.call(
+                    self._request_history, ticker, period, interval, key=("history", ticker.ticker, period, interval)
+                )
+            except Exception:
+                METRICS.increment("request_errors")
+                raise
+            self.store_history(ticker.ticker, period, interval, history)
+        return history
+
+    def _request_history(self, ticker: "yfinance.Ticker", period: str, interval: str) -> pd.DataFrame:
+        METRICS.increment("requests")
+        with self.request_slots:
+            start = time.perf_counter()
+            history = ticker.history(period=period, interval=interval, timeout=self.request_timeout_s)
+            METRICS.observe_fetch(ticker.ticker, time.perf_counter() - start)
+        return history
+
+    def fetch_history_batch(
+        self, symbols: list[str], period: str = "1d", interval: str = "5m", chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Return the histories of all symbols, downloading only those that are not cached yet in batched chunks.
+        """
+        histories = {}
+        missing = []
+        for symbol in symbols:
+            history = self.cached_history(symbol, period, interval)
+            if history is None:
+                missing.append(symbol)
+            else:
+                histories[symbol] = history
+
+        if missing:
+            with self.request_slots:
+                fetched = fetch_history_batch(
+                    missing, period, interval, chunk_size, self.request_timeout_s, gateway=self.gateway
+                )
+            for symbol, history in fetched.items():
+                self.store_history(symbol, period, interval, history)
+                histories[symbol] = history
+        return histories
+
+    def fetch_intraday(self, symbols: list[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, pd.DataFrame]:
+        """
+        Return today's intraday bars of all symbols. The intraday buffer of a symbol is seeded with the whole day once,
+        afterwards only the bars since its last timestamp are downloaded. Symbols whose last bar is on the same day
+        share their batched downloads, see group_by_day.
+        """
+        histories = {}
+        last_timestamps: dict[str, Optional[pd.Timestamp]] = {}
+        for symbol in symbols:
+            history = self.cached_history(symbol, "1d", INTRADAY_INTERVAL)
+            if history is not None:
+                histories[symbol] = history
+                continue
+            last_timestamps[symbol] = self.intraday.setdefault(symbol, IntradayBuffer()).last_timestamp
+
+        for start, group in group_by_day(last_timestamps).items():
+            with self.request_slots:
+                fetched = fetch_history_batch(
+                    group,
+                    "1d",
+                    INTRADAY_INTERVAL,
+                    chunk_size,
+                    self.request_timeout_s,
+                    start=start,
+                    gateway=self.gateway,
+                )
+            for symbol in group:
+                self.intraday[symbol].extend(self.to_exchange_time(symbol, fetched.get(symbol, pd.DataFrame())))
+                history = self.intraday[symbol].bars
+                if not history.empty:
+                    self.store_history(symbol, "1d", INTRADAY_INTERVAL, history)
+                    histories[symbol] = history
+        return histories
+
+    def to_exchange_time(self, symbol: str, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert the bars to the time zone of the exchange of the symbol, if it is known.
+        """
+        timezone = self.timezones.get(symbol)
+        if not timezone or bars.empty or str(bars.index.tz) == timezone:
+            return bars
+        return bars.tz_convert(timezone)
+
+    def add_tick(self, symbol: str, timestamp: pd.Timestamp, price: float, volume: float = 0.0) -> pd.DataFrame:
+        """
+        Add a streamed trade to the intraday bars of the symbol and return them.
+        """
+        timezone = self.timezones.get(symbol)
+        if timezone:
+            timestamp = timestamp.tz_convert(timezone)
+        buffer = self.intraday.setdefault(symbol, IntradayBuffer())
+        buffer.add_tick(timestamp, price, volume)
+        return buffer.bars
+
+    def metadata(self, ticker: "yfinance.Ticker", attribute: str) -> Any:
+        """
+        Return ticker.info or ticker.fast_info, fetched at most once per day.
+        """
+        if attribute == "fast_info":
+            # fast_info fetches its fields only when they are read, so they are read one by one through the gateway
+            return MetadataFields(self, ticker, attribute)
+        today = date.fromtimestamp(time.time())
+        entry = self._metadata.get((ticker.ticker, attribute))
+        if entry is None or entry[0] != today:
+            METRICS.increment("metadata_requests")
+            with self.request_slots, METRICS.time(attribute):
+                value = self.gateway.call(getattr, ticker, attribute, key=("metadata", ticker.ticker, attribute))
+            entry = (today, value)
+            self._metadata[(ticker.ticker, attribute)] = entry
+        else:
+            METRICS.increment("metadata_cache_hits")
+        return entry[1]
+
+    def metadata_field(self, ticker: "yfinance.Ticker", attribute: str, field: str) -> Any:
+        """
+        Return a single field of ticker.info or ticker.fast_info, fetched at most once per day. Only the field is kept
+        and not the whole metadata, which holds hundreds of fields and, in case of fast_info, the ticker itself. Raises
+        a KeyError if the metadata has no such field.
+        """
+        today = date.fromtimestamp(time.time())
+        metadata = self._metadata.get((ticker.ticker, attribute))
+        if metadata is not None and metadata[0] == today:
+            METRICS.increment("metadata_cache_hits")
+            return metadata[1][field]
+
+        entry = self._fields.get((ticker.ticker, attribute, field))
+        if entry is None or entry[0] != today:
+            METRICS.increment("metadata_requests")
+            with self.request_slots, METRICS.time(attribute):
+                value = self.gateway.call(
+                    self._request_field, ticker, attribute, field, key=("metadata", ticker.ticker, attribute, field)
+                )
+            entry = (today, value)
+            self._fields[(ticker.ticker, attribute, field)] = entry
+        else:
+            METRICS.increment("metadata_cache_hits")
+        if entry[1] is MISSING_FIELD:
+            raise KeyError(field)
+        return entry[1]
+
+    @staticmethod
+    def _request_field(ticker: "yfinance.Ticker", attribute: str, field: str) -> Any:
+        # the request of fast_info is only sent when the field is read, so it has to be read inside the gateway
+        try:
+            return getattr(ticker, attribute)[field]
+        except KeyError:
+            return MISSING_FIELD
+
+    def wrap(self, ticker: "yfinance.Ticker") -> "CachedTicker":
+        return CachedTicker(ticker, self)
+
+
+class MetadataFields:
+    """
+    Read-only view of the metadata of a ticker whose fields are each fetched and cached through a MarketDataCache.
+    """
+
+    __slots__ = ("_cache", "_ticker", "_attribute")
+
+    def __init__(self, cache: MarketDataCache, ticker: "yfinance.Ticker", attribute: str) -> None:
+        self._cache = cache
+        self._ticker = ticker
+        self._attribute = attribute
+
+    def __getitem__(self, field: str) -> Any:
+        return self._cache.metadata_field(self._ticker, self._attribute, field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+
+class CachedTicker:
+    """
+    Drop-in replacement for yfinance.Ticker whose history and metadata are read through a MarketDataCache.
+    """
+
+    __slots__ = ("_ticker", "_cache")
+
+    def __init__(self, ticker: "yfinance.Ticker", cache: MarketDataCache) -> None:
+        self._ticker = ticker
+        self._cache = cache
+
+    @property
+    def ticker(self) -> str:
+        return str(self._ticker.ticker)
+
+    @property
+    def info(self) -> dict[str, Any]:
+        return self._cache.metadata(self._ticker, "info")
+
+    @property
+    def fast_info(self) -> Any:
+        return self._cache.metadata(self._ticker, "fast_info")
+
+    def field(self, attribute: str, field: str) -> Any:
+        """
+        Return info[field] or fast_info[field], without keeping the rest of the metadata.
+        """
+        return self._cache.metadata_field(self._ticker, attribute, field)
+
+    def history(self, period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+        return self._cache.history(self._ticker, period, interval)
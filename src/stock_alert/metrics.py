@@ -0,0 +1,168 @@
+import contextlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import Any, ContextManager, Optional
+
+_DISABLED_TIMER = contextlib.nullcontext()
+
+
+class Timing:
+    """
+    Running statistics of the durations of one phase.
+    """
+
+    __slots__ = ("count", "total_s", "max_s", "last_s")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.last_s = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        self.last_s = seconds
+
+    def to_dict(self) -> dict[str, float]:
+        return {"count": self.count, "total_s": self.total_s, "max_s": self.max_s, "last_s": self.last_s}
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    In-process metrics of the spin loop: durations per phase, the latest fetch latency per symbol and counters, e.g.
+    of requests, cache hits and errors.
+
+    Disabled metrics record nothing, every recording method returns right away, so instrumented code runs at almost
+    the same speed as without instrumentation.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters: dict[str, int] = {}
+        self.timings: dict[str, Timing] = {}
+        self.fetch_latencies: dict[str, float] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.timings.setdefault(name, Timing()).add(seconds)
+
+    def observe_fetch(self, symbol: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        self.observe("fetch_symbol", seconds)
+        with self._lock:
+            self.fetch_latencies[symbol] = seconds
+
+    def time(self, name: str) -> ContextManager[None]:
+        """
+        Measure the duration of the with block as phase name.
+        """
+        if not self.enabled:
+            return _DISABLED_TIMER
+        return _Timer(self, name)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+            self.fetch_latencies = {}
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timings": {name: timing.to_dict() for name, timing in self.timings.items()},
+                "fetch_latencies": dict(self.fetch_latencies),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines += [f"# TYPE stock_alert_{name}_total counter", f"stock_alert_{name}_total {value}"]
+
+        lines.append("# TYPE stock_alert_phase_seconds summary")
+        for name, timing in sorted(snapshot["timings"].items()):
+            lines.append(f'stock_alert_phase_seconds_sum{{phase="{name}"}} {timing["total_s"]}')
+            lines.append(f'stock_alert_phase_seconds_count{{phase="{name}"}} {timing["count"]}')
+        lines.append("# TYPE stock_alert_phase_seconds_max gauge")
+        for name, timing in sorted(snapshot["timings"].items()):
+            lines.append(f'stock_alert_phase_seconds_max{{phase="{name}"}} {timing["max_s"]}')
+
+        lines.append("# TYPE stock_alert_fetch_latency_seconds gauge")
+        for symbol, seconds in sorted(snapshot["fetch_latencies"].items()):
+            lines.append(f'stock_alert_fetch_latency_seconds{{symbol="{symbol}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve the metrics on /metrics in the Prometheus format and on /metrics.json from a background thread.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                if self.path == "/metrics":
+                    content, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    content, content_type = metrics.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                body = content.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="stock_alert_metrics", daemon=True).start()
+        return server
+
+
+# the metrics of the process, enable them with METRICS.enabled = True
+METRICS = Metrics()
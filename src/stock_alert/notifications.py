@@ -0,0 +1,122 @@
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from stock_alert.metrics import METRICS
+
+
+class Notification(NamedTuple):
+    subject: str
+    message: str
+
+
+class Digest(NamedTuple):
+    receiver: str
+    subject: str
+    message: str
+
+
+def make_digest(receiver: str, notifications: list[Notification]) -> Digest:
+    """
+    Combine all notifications of one receiver into a single mail.
+    """
+    if len(notifications) == 1:
+        return Digest(receiver, notifications[0].subject, notifications[0].message)
+    subject = f"{len(notifications)} stock alerts"
+    message = "\n\n".join(f"{notification.subject}:\n{notification.message}" for notification in notifications)
+    return Digest(receiver, subject, message)
+
+
+class NotificationQueue:
+    """
+    Collects the alerts of a cycle and sends them as one digest mail per receiver from a background thread, so that
+    sending and retrying never blocks the evaluation of the alerts.
+
+    The Gmail client is built once and reused for all mails. A failed mail is retried up to max_retries times with
+    jittered exponential backoff, rebuilding the client before each retry.
+    """
+
+    def __init__(
+        self,
+        send: Optional[Callable[[Digest], None]] = None,
+        max_retries: int = 5,
+        backoff_s: float = 2,
+    ) -> None:
+        self.send = self.send_gmail if send is None else send
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.pending: dict[str, list[Notification]] = {}
+        self._service: Any = None
+        self._digests: "queue.Queue[Optional[Digest]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    def add(self, receiver: str, subject: str, message: str) -> None:
+        self.pending.setdefault(receiver, []).append(Notification(subject, message))
+
+    def flush(self) -> None:
+        """
+        Hand the notifications collected so far to the background worker, one digest per receiver.
+        """
+        if not self.pending:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="stock_alert_notifications", daemon=True)
+            self._worker.start()
+        for receiver, notifications in self.pending.items():
+            self._digests.put(make_digest(receiver, notifications))
+        self.pending = {}
+
+    def join(self) -> None:
+        """
+        Block until all digests handed to the worker are sent or given up.
+        """
+        self._digests.join()
+
+    def close(self) -> None:
+        self.flush()
+        if self._worker is not None:
+            self._digests.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def send_gmail(self, digest: Digest) -> None:
+        # the Google API client takes long to import, it is only loaded once the first mail is sent
+        from stock_alert import quickstart  # pylint: disable=import-outside-toplevel
+
+        if self._service is None:
+            self._service = quickstart.build_service()
+        quickstart.send_mail(
+            receiver_email=digest.receiver,
+            message_content=digest.message,
+            subject=digest.subject,
+            service=self._service,
+        )
+
+    def _run(self) -> None:
+        while True:
+            digest = self._digests.get()
+            try:
+                if digest is None:
+                    return
+                self._send_with_retries(digest)
+            finally:
+                self._digests.task_done()
+
+    def _send_with_retries(self, digest: Digest) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with METRICS.time("send_mail"):
+                    self.send(digest)
+                return
+            except Exception as e:
+                METRICS.increment("mail_errors")
+                if attempt == self.max_retries:
+                    print(f"Giving up sending the mail '{digest.subject}' to {digest.receiver}: {e}")
+                    return
+                delay = self.backoff_s * 2**attempt * random.uniform(0.5, 1.5)
+                print(f"Error while sending the mail '{digest.subject}', retrying in {delay:.1f} seconds: {e}")
+                # the client may be in a broken state, e.g. after a dropped connection
+                self._service = None
+                time.sleep(delay)
@@ -18,6 +18,7 @@ from __future__ import print_function
 import base64
 import os.path
 from email.message import EmailMessage
+from typing import Any, Optional
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -29,13 +30,33 @@ from googleapiclient.errors import HttpError
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly", "https://www.googleapis.com/auth/gmail.send"]
 
 
-def send_mail(receiver_email: str, message_content: str, subject: str = "", creds=None) -> None:
+def load_credentials() -> Credentials:
+    """
+    Load the stored credentials, they are refreshed automatically by the API client once they expire.
+    """
+    return Credentials.from_authorized_user_file(f"{os.environ.get('HOME')}/.config/token.json", SCOPES)
 
+
+def build_service(creds: Optional[Credentials] = None) -> Any:
+    """
+    Build an authenticated Gmail API client, which can be reused for many mails.
+    """
     if creds is None:
-        creds = Credentials.from_authorized_user_file(f"{os.environ.get('HOME')}/.config/token.json", SCOPES)
+        creds = load_credentials()
+    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+
+
+def send_mail(
+    receiver_email: str,
+    message_content: str,
+    subject: str = "",
+    creds: Optional[Credentials] = None,
+    service: Any = None,
+) -> None:
 
     # Call the Gmail API
-    service = build("gmail", "v1", credentials=creds)
+    if service is None:
+        service = build_service(creds)
 
     # try to send a mail
     message = EmailMessage()
@@ -0,0 +1,143 @@
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+UTC = ZoneInfo("UTC")
+
+
+class TradingSession:
+    """
+    The regular trading hours of an exchange in its local time zone. Holidays have to be given explicitly, there is no
+    built-in holiday calendar.
+    """
+
+    def __init__(
+        self,
+        timezone: str,
+        open_time: time,
+        close_time: time,
+        weekdays: Iterable[int] = range(5),
+        holidays: Iterable[date] = (),
+    ) -> None:
+        self.timezone = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.weekdays = frozenset(weekdays)
+        self.holidays = set(holidays)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() in self.weekdays and day not in self.holidays
+
+    def is_open(self, now: datetime) -> bool:
+        local = now.astimezone(self.timezone)
+        return self.is_trading_day(local.date()) and self.open_time <= local.time() < self.close_time
+
+    def next_open(self, now: datetime) -> datetime:
+        """
+        Return the start of the next session, or now if the session is currently open.
+        """
+        if self.is_open(now):
+            return now
+        local = now.astimezone(self.timezone)
+        day = local.date() if local.time() < self.open_time else local.date() + timedelta(days=1)
+        # a year without a single trading day would be a misconfiguration
+        for _ in range(366):
+            if self.is_trading_day(day):
+                return datetime.combine(day, self.open_time, tzinfo=self.timezone)
+            day += timedelta(days=1)
+        raise ValueError("The trading session has no trading day within a year.")
+
+
+US_SESSION = TradingSession("America/New_York", time(9, 30), time(16))
+XETRA_SESSION = TradingSession("Europe/Berlin", time(9), time(17, 30))
+
+# trading sessions keyed by the exchange codes of yahoo finance (fast_info["exchange"]). Their holidays are not
+# modelled, on a holiday the symbols of an exchange are polled during its regular hours like on any weekday.
+EXCHANGE_SESSIONS: dict[str, TradingSession] = {
+    "NMS": US_SESSION,
+    "NYQ": US_SESSION,
+    "NGM": US_SESSION,
+    "NCM": US_SESSION,
+    "ASE": US_SESSION,
+    "PCX": US_SESSION,
+    "BTS": US_SESSION,
+    "TOR": TradingSession("America/Toronto", time(9, 30), time(16)),
+    "GER": XETRA_SESSION,
+    "FRA": TradingSession("Europe/Berlin", time(8), time(22)),
+    "STU": TradingSession("Europe/Berlin", time(8), time(22)),
+    "LSE": TradingSession("Europe/London", time(8), time(16, 30)),
+    "PAR": TradingSession("Europe/Paris", time(9), time(17, 30)),
+    "AMS": TradingSession("Europe/Amsterdam", time(9), time(17, 30)),
+    "BRU": TradingSession("Europe/Brussels", time(9), time(17, 30)),
+    "MIL": TradingSession("Europe/Rome", time(9), time(17, 30)),
+    "MCE": TradingSession("Europe/Madrid", time(9), time(17, 30)),
+    "EBS": TradingSession("Europe/Zurich", time(9), time(17, 30)),
+    "VIE": TradingSession("Europe/Vienna", time(9), time(17, 30)),
+    "STO": TradingSession("Europe/Stockholm", time(9), time(17, 30)),
+    "CPH": TradingSession("Europe/Copenhagen", time(9), time(17)),
+    "HEL": TradingSession("Europe/Helsinki", time(10), time(18, 30)),
+    "OSL": TradingSession("Europe/Oslo", time(9), time(16, 20)),
+    "JPX": TradingSession("Asia/Tokyo", time(9), time(15)),
+    "HKG": TradingSession("Asia/Hong_Kong", time(9, 30), time(16)),
+    "ASX": TradingSession("Australia/Sydney", time(10), time(16)),
+}
+
+
+class MarketScheduler:
+    """
+    Decides which symbols to poll, based on the trading session of their exchange and a poll interval per exchange.
+
+    Symbols of exchanges without a known session, e.g. crypto currencies, are polled around the clock.
+    """
+
+    def __init__(
+        self,
+        default_interval_s: float = 60,
+        poll_intervals_s: Optional[dict[str, float]] = None,
+        sessions: Optional[dict[str, TradingSession]] = None,
+    ) -> None:
+        self.default_interval_s = default_interval_s
+        self.poll_intervals_s = poll_intervals_s or {}
+        self.sessions = EXCHANGE_SESSIONS if sessions is None else sessions
+        self.last_polls: dict[str, float] = {}
+
+    def poll_interval(self, exchange: str) -> float:
+        return self.poll_intervals_s.get(exchange, self.default_interval_s)
+
+    def is_open(self, exchange: str, now: float) -> bool:
+        session = self.sessions.get(exchange)
+        return session is None or session.is_open(datetime.fromtimestamp(now, UTC))
+
+    def due_exchanges(self, exchanges: Iterable[str], now: float) -> set[str]:
+        """
+        Return the exchanges that are open and were not polled within their poll interval.
+        """
+        return {
+            exchange
+            for exchange in set(exchanges)
+            if self.is_open(exchange, now)
+            and now - self.last_polls.get(exchange, -float("inf")) >= self.poll_interval(exchange)
+        }
+
+    def due_symbols(self, symbol_exchanges: dict[str, str], now: float) -> list[str]:
+        """
+        Return the symbols to poll now and remember their exchanges as polled.
+        """
+        due = self.due_exchanges(symbol_exchanges.values(), now)
+        for exchange in due:
+            self.last_polls[exchange] = now
+        return [symbol for symbol, exchange in symbol_exchanges.items() if exchange in due]
+
+    def seconds_until_next_poll(self, exchanges: Iterable[str], now: float) -> float:
+        """
+        Return the time until any of the exchanges is due next, sleeping through closed sessions.
+        """
+        waits = []
+        for exchange in set(exchanges):
+            next_poll = self.last_polls.get(exchange, -float("inf")) + self.poll_interval(exchange)
+            session = self.sessions.get(exchange)
+            if session is not None:
+                next_open = session.next_open(datetime.fromtimestamp(max(now, next_poll), UTC))
+                next_poll = max(next_poll, next_open.timestamp())
+            waits.append(max(next_poll - now, 0.0))
+        return min(waits, default=self.default_interval_s)
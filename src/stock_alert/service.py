@@ -0,0 +1,155 @@
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+from stock_alert.class_stock_alert import AlertLoop, StockAlert
+from stock_alert.config import EvaluationPlan, compile_plan, load_config, make_alert, make_price_level
+from stock_alert.data_plane import DataPlane
+from stock_alert.market_data import DEFAULT_CHUNK_SIZE, DEFAULT_TIMEOUT_S
+from stock_alert.metrics import METRICS
+
+
+class AlertService(AlertLoop):
+    """
+    Checks the watchlists of many users on one shared data plane. Every cycle fetches the union of the watched symbols
+    once and fans the bars out to the alerts and reminders of each user, so the requests and the cached bars grow with
+    the number of unique symbols and not with the number of watchlists.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = 16,
+        request_timeout_s: float = DEFAULT_TIMEOUT_S,
+        max_concurrent_requests: int = 8,
+    ) -> None:
+        self.chunk_size = chunk_size
+        self.data_plane = DataPlane(max_workers, request_timeout_s, max_concurrent_requests)
+        self.market_data = self.data_plane.market_data
+        self.notifications = self.data_plane.notifications
+        self.users: list[StockAlert] = []
+
+    def add_user(
+        self,
+        path_to_csv: Path,
+        receiver_mail: str = "",
+        remind_interval_h: float = 24,
+        stock_list: Optional[list[str]] = None,
+    ) -> StockAlert:
+        """
+        Add the watchlist of a user, the returned StockAlert is used to configure its alerts.
+        """
+        user = StockAlert(
+            path_to_csv,
+            receiver_mail=receiver_mail,
+            remind_interval_h=remind_interval_h,
+            chunk_size=self.chunk_size,
+            data_plane=self.data_plane,
+            stock_list=stock_list,
+        )
+        self.users.append(user)
+        return user
+
+    def load_users(self, path: Path) -> None:
+        """
+        Add the users of a JSON file holding a list of users like
+        {"stock_list": "stocks.txt", "receiver_mail": "me@example.com", "remind_interval_h": 24,
+        "alert": {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03},
+        "price_levels": {"AAPL": [{"type": "AbsolutHigherThan", "threshold": 200}]}}.
+        Stock lists are relative to the JSON file, everything but the stock list is optional. Price levels are keyed by
+        a stock of the list or its symbol.
+        """
+        with open(path, "r") as file:
+            configs = json.load(file)
+        for config in configs:
+            user = self.add_user(
+                path.parent / config["stock_list"], config.get("receiver_mail", ""), config.get("remind_interval_h", 24)
+            )
+            if "alert" in config:
+                user.configure_same_alert_for_all(make_alert(config["alert"]))
+            for stock, levels in config.get("price_levels", {}).items():
+                for level in levels:
+                    user.add_price_level_alert(user.symbols_by_name.get(stock, stock), make_price_level(level))
+
+    def load_config(self, path: Path) -> EvaluationPlan:
+        """
+        Add the watchlists of a .json, .toml or .yaml config, see compile_plan, and return its evaluation plan.
+        """
+        plan = compile_plan(load_config(path), path.parent)
+        self.load_plan(plan, path)
+        return plan
+
+    def load_plan(self, plan: EvaluationPlan, path: Path) -> None:
+        """
+        Add the watchlists of the plan. Their symbol cache is kept next to path and their state in
+        <path stem>.<watchlist>.state.json.
+        """
+        for watchlist in plan.watchlists:
+            # only the stocks with an alert or a price level are resolved and watched
+            stocks = watchlist.watched_stocks()
+            user = self.add_user(
+                path.with_name(f"{path.stem}.{watchlist.name}{path.suffix}"),
+                watchlist.receiver_mail,
+                watchlist.remind_interval_h,
+                stock_list=stocks,
+            )
+            for stock in stocks:
+                symbol = user.symbols_by_name[stock]
+                if symbol not in user.stock_tickers:
+                    print(f"Skipping the alerts of {stock}, its symbol is unknown")
+                    continue
+                if stock in watchlist.alerts:
+                    user.configure_alert(symbol, plan.alerts[watchlist.alerts[stock]])
+                for level in watchlist.price_levels.get(stock, []):
+                    user.add_price_level_alert(symbol, make_price_level(level))
+
+    def watched_symbols(self) -> list[str]:
+        """
+        Get the union of the symbols any user has an alert or a price level on.
+        """
+        symbols: dict[str, None] = {}
+        for user in self.users:
+            symbols.update(dict.fromkeys(user.symbols_to_fetch(list(user.stock_tickers))))
+        return list(symbols)
+
+    def get_exchanges(self, symbols: list[str]) -> dict[str, str]:
+        exchanges: dict[str, str] = {}
+        for user in self.users:
+            exchanges.update(
+                user.get_exchanges(
+                    [symbol for symbol in symbols if symbol in user.stock_tickers and symbol not in exchanges]
+                )
+            )
+        return exchanges
+
+    def backfill_history(self) -> None:
+        for user in self.users:
+            user.backfill_history()
+
+    def run_cycle(self, symbols: Optional[list[str]] = None) -> bool:
+        """
+        Fetch the watched symbols, or the given ones, once and check the alerts of every user on them. Returns whether
+        any alert was triggered.
+        """
+        cycle_start = time.perf_counter()
+        if symbols is None:
+            symbols = self.watched_symbols()
+        with METRICS.time("fetch"):
+            missing = set(symbols) - set(self.market_data.timezones)
+            for user in self.users:
+                # the time zones are shared by all users, each symbol is looked up by the first user watching it
+                user.get_timezones([symbol for symbol in user.stock_tickers if symbol in missing])
+                missing -= set(user.stock_tickers)
+            histories = self.market_data.fetch_intraday(symbols, chunk_size=self.chunk_size)
+
+        alert_triggered = False
+        due = set(symbols)
+        for user in self.users:
+            user_symbols = [symbol for symbol in user.stock_tickers if symbol in due]
+            alert_triggered |= user.check_alerts(user_symbols, histories)
+
+        # every user gets a single mail with all of their alerts of the cycle
+        self.data_plane.notifications.flush()
+        METRICS.observe("cycle", time.perf_counter() - cycle_start)
+        return alert_triggered
@@ -0,0 +1,241 @@
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from multiprocessing.context import DefaultContext
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, cast
+
+from stock_alert.alerts import AlertResult
+from stock_alert.class_stock_alert import StockAlert
+from stock_alert.config import make_alert, make_price_level
+from stock_alert.gateway import GATEWAY
+from stock_alert.market_data import DEFAULT_CHUNK_SIZE
+from stock_alert.metrics import METRICS
+from stock_alert.symbols import UNKNOWN_SYMBOL
+
+LOGGER = logging.getLogger(__name__)
+
+
+def shard_of(symbol: str, num_shards: int) -> int:
+    """
+    Assign the symbol to one of num_shards shards. Unlike hash(), crc32 is the same in every process and every run.
+    """
+    return zlib.crc32(symbol.encode("utf8")) % num_shards
+
+
+class ShardSpec(NamedTuple):
+    """
+    Everything a worker process needs to set up its shard. It only holds plain data, so that it can be sent to
+    spawned processes.
+    """
+
+    shard: int
+    path_to_csv: Path
+    stock_names: list[str]
+    alert_config: Optional[dict[str, Any]]
+    price_levels: dict[str, list[dict[str, Any]]]
+    chunk_size: int
+    interval: float
+    max_requests_per_s: float
+
+
+class ShardResult(NamedTuple):
+    shard: int
+    alerts: list[AlertResult]
+    crossings: list[AlertResult]
+    duration_s: float
+
+
+def shard_path(path_to_csv: Path, shard: int) -> Path:
+    """
+    The stock list path of a shard, next to the stock list, so that it uses the same symbol cache but a state file
+    of its own.
+    """
+    return path_to_csv.with_name(f"{path_to_csv.stem}.shard{shard}{path_to_csv.suffix}")
+
+
+def run_shard(spec: ShardSpec, results: "multiprocessing.Queue[ShardResult]", stop: Any) -> None:
+    """
+    The loop of a worker process: fetch and evaluate the stocks of its shard every interval seconds and send the
+    triggered alerts to the coordinator, until stop is set. Reminders and notifications are left to the coordinator.
+    """
+    # every process has a gateway of its own, together they stay within the rate limit of the coordinator
+    GATEWAY.set_rate(spec.max_requests_per_s)
+    stock_alert = StockAlert(
+        shard_path(spec.path_to_csv, spec.shard), chunk_size=spec.chunk_size, stock_list=spec.stock_names
+    )
+    if spec.alert_config is not None:
+        stock_alert.configure_same_alert_for_all(make_alert(spec.alert_config))
+    for symbol, levels in spec.price_levels.items():
+        if symbol in stock_alert.stock_tickers:
+            for level in levels:
+                stock_alert.add_price_level_alert(symbol, make_price_level(level))
+    stock_alert.market_data.history_ttl_s = spec.interval
+    symbols = list(stock_alert.stock_tickers)
+
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            histories = stock_alert.fetch_intraday(stock_alert.symbols_to_fetch(symbols))
+            alerts, crossings = stock_alert.evaluate_alerts(symbols, histories)
+            duration_s = time.perf_counter() - start
+            results.put(ShardResult(spec.shard, alerts, crossings, duration_s))
+            stop.wait(max(0.0, spec.interval - duration_s))
+    finally:
+        stock_alert.engine.shutdown()
+        if stock_alert.state is not None:
+            stock_alert.state.checkpoint()
+
+
+class ShardedRunner:
+    """
+    Checks a very large stock list in num_workers processes, so that the evaluation of the alerts is not bound to a
+    single core by the GIL. The stocks are split into shards by a hash of their symbol, every worker process fetches
+    and evaluates its shard in a loop of its own.
+
+    This process is the coordinator: it resolves the stock names once, merges the alerts of all shards per cycle,
+    checks the reminders of every symbol and sends a single mail per cycle. Workers that die are restarted.
+    """
+
+    def __init__(
+        self,
+        path_to_csv: Path,
+        alert_config: Optional[dict[str, Any]],
+        num_workers: Optional[int] = None,
+        receiver_mail: str = "",
+        remind_interval_h: float = 24,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        price_levels: Optional[dict[str, list[dict[str, Any]]]] = None,
+        mp_context: Optional[str] = None,
+    ) -> None:
+        """
+        The alert config, e.g. {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03}, applies to all
+        stocks, the price level configs are given by symbol. mp_context is the multiprocessing start method.
+        """
+        self.path_to_csv = path_to_csv
+        self.alert_config = alert_config
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.price_levels = price_levels or {}
+        # all names are resolved here once, the workers find them in the symbol cache
+        self.coordinator = StockAlert(path_to_csv, receiver_mail, remind_interval_h, chunk_size)
+        # the context of every start method has a Process class, like the default one
+        self.context = cast(DefaultContext, multiprocessing.get_context(mp_context))
+        self.results: "multiprocessing.Queue[ShardResult]" = self.context.Queue()
+        self.stop = self.context.Event()
+        self.workers: dict[int, tuple[ShardSpec, BaseProcess]] = {}
+
+    def shards(self) -> list[list[str]]:
+        """
+        Get the stock names of every shard.
+        """
+        shards: list[list[str]] = [[] for _ in range(self.num_workers)]
+        for name, symbol in self.coordinator.symbols_by_name.items():
+            if symbol != UNKNOWN_SYMBOL:
+                shards[shard_of(symbol, self.num_workers)].append(name)
+        return shards
+
+    def start(self, interval: float) -> None:
+        self.stop.clear()
+        for shard, names in enumerate(self.shards()):
+            if names:
+                price_levels = {
+                    symbol: levels
+                    for symbol, levels in self.price_levels.items()
+                    if shard_of(symbol, self.num_workers) == shard
+                }
+                spec = ShardSpec(
+                    shard,
+                    self.path_to_csv,
+                    names,
+                    self.alert_config,
+                    price_levels,
+                    self.chunk_size,
+                    interval,
+                    GATEWAY.max_rate / self.num_workers,
+                )
+                self.start_worker(spec)
+
+    def start_worker(self, spec: ShardSpec) -> None:
+        process = self.context.Process(
+            target=run_shard, args=(spec, self.results, self.stop), name=f"stock_alert_shard{spec.shard}", daemon=True
+        )
+        process.start()
+        self.workers[spec.shard] = (spec, process)
+
+    def restart_dead_workers(self) -> None:
+        for shard, (spec, process) in list(self.workers.items()):
+            if not process.is_alive() and not self.stop.is_set():
+                LOGGER.warning("Worker of shard %d exited with code %s, restarting it", shard, process.exitcode)
+                METRICS.increment("worker_restarts")
+                self.start_worker(spec)
+
+    def collect_cycle(self, timeout_s: float) -> list[ShardResult]:
+        """
+        Wait until every worker reported a cycle, but at most timeout_s seconds. A worker that is faster than the
+        others may report more than once, all of its results are kept.
+        """
+        results: list[ShardResult] = []
+        reported: set[int] = set()
+        deadline = time.monotonic() + timeout_s
+        while len(reported) < len(self.workers):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                late = sorted(set(self.workers) - reported)
+                LOGGER.warning("Shards %s did not report in time", late)
+                METRICS.increment("late_shards", len(late))
+                break
+            try:
+                result = self.results.get(timeout=min(remaining, 1))
+            except queue.Empty:
+                self.restart_dead_workers()
+                continue
+            results.append(result)
+            reported.add(result.shard)
+        return results
+
+    def run(self, interval: float = 60, cycles: Optional[int] = None, timeout_s: Optional[float] = None) -> None:
+        """
+        Start the workers and report their alerts every cycle, forever or for the given number of cycles. A cycle
+        waits at most timeout_s, by default three intervals, for slow workers.
+        """
+        timeout_s = 3 * max(interval, 10) if timeout_s is None else timeout_s
+        self.start(interval)
+        try:
+            cycle = 0
+            while cycles is None or cycle < cycles:
+                results = self.collect_cycle(timeout_s)
+                alerts = [alert for result in results for alert in result.alerts]
+                crossings = [crossing for result in results for crossing in result.crossings]
+                # the reminders of every symbol live here, so they hold across shards and worker restarts
+                if not self.coordinator.notify(alerts, crossings):
+                    print("nothing to report")
+                self.coordinator.notifications.flush()
+                if results:
+                    METRICS.observe("shard_cycle", max(result.duration_s for result in results))
+                cycle += 1
+        finally:
+            self.close()
+
+    def close(self, timeout_s: float = 30) -> None:
+        self.stop.set()
+        # a worker only exits once the results it put into the queue are read
+        deadline = time.monotonic() + timeout_s
+        while any(process.is_alive() for _, process in self.workers.values()) and time.monotonic() < deadline:
+            try:
+                self.results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for _, process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self.workers = {}
+        self.coordinator.notifications.close()
+        self.coordinator.engine.shutdown()
+        if self.coordinator.state is not None:
+            self.coordinator.state.checkpoint()
@@ -0,0 +1,104 @@
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from stock_alert.util import write_json_atomically
+
+if sys.platform != "win32":
+    import fcntl
+
+REMINDERS = "reminders"
+PRICES = "prices"
+EXCHANGES = "exchanges"
+TIMEZONES = "timezones"
+
+
+class StateStore:
+    """
+    Persistent key value state of a StockAlert, e.g. the time of the last reminder per symbol, so that a restart
+    neither repeats alerts nor looks everything up again.
+
+    Every change is appended as one JSON line to a log next to the checkpoint file. Once the log holds
+    max_log_entries changes, the whole state is written to a new checkpoint and the log is cleared. On start up the
+    checkpoint is loaded and the log is replayed on top of it.
+
+    Only one StateStore at a time may use a path, since both would append to the same log. The log is locked while
+    the store is open, a second store on the same path raises a RuntimeError, in this or any other process. The lock
+    relies on flock, on Windows the log is not locked.
+    """
+
+    def __init__(self, path: Path, max_log_entries: int = 1000) -> None:
+        self.path = path
+        self.log_path = path.with_name(path.name + ".log")
+        self.max_log_entries = max_log_entries
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.log_entries = 0
+        self._lock = threading.Lock()
+        self._log = open(self.log_path, "a")
+        if sys.platform != "win32":
+            try:
+                fcntl.flock(self._log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._log.close()
+                raise RuntimeError(f"The state {self.path} is already used by another StateStore") from None
+        self.load()
+
+    def load(self) -> None:
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as file:
+                    self.entries = json.load(file)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                print(f"Ignoring corrupt state checkpoint {self.path}: {e}")
+        if self.log_path.exists():
+            with open(self.log_path, "r") as file:
+                for line in file:
+                    try:
+                        kind, key, value = json.loads(line)
+                    except ValueError:
+                        # the last line is cut off if the process died while writing it
+                        break
+                    self.entries.setdefault(kind, {})[key] = value
+                    self.log_entries += 1
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        return self.entries.get(kind, {}).get(key)
+
+    def items(self, kind: str) -> dict[str, Any]:
+        return dict(self.entries.get(kind, {}))
+
+    def record(self, kind: str, key: str, value: Any) -> None:
+        """
+        Store the value and append it to the log, unless it is unchanged.
+        """
+        with self._lock:
+            values = self.entries.setdefault(kind, {})
+            if key in values and values[key] == value:
+                return
+            values[key] = value
+            self._log.write(json.dumps([kind, key, value], separators=(",", ":")) + "\n")
+            self._log.flush()
+            self.log_entries += 1
+            if self.log_entries >= self.max_log_entries:
+                self._checkpoint()
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        """
+        Write the state atomically and clear the log. Should the process die in between, replaying the old log over
+        the new checkpoint yields the same state.
+        """
+        write_json_atomically(self.path, self.entries, separators=(",", ":"))
+        self._log.seek(0)
+        self._log.truncate()
+        self.log_entries = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._checkpoint()
+            self._log.close()
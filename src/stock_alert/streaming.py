@@ -0,0 +1,206 @@
+import csv
+import json
+import queue
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple, Optional
+
+import pandas as pd
+
+from stock_alert.market_data import DEFAULT_CHUNK_SIZE, MarketDataCache
+
+if TYPE_CHECKING:
+    import yfinance
+
+
+class Tick(NamedTuple):
+    symbol: str
+    timestamp: pd.Timestamp
+    price: float
+    volume: float = 0.0
+
+
+def to_timestamp(value: Any) -> pd.Timestamp:
+    """
+    Parse epoch seconds or an ISO 8601 string into a time zone aware timestamp, naive times are taken as UTC.
+    """
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        return pd.Timestamp(float(value), unit="s", tz="UTC")
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp
+
+
+def to_tick(row: dict[str, Any]) -> Tick:
+    return Tick(str(row["symbol"]), to_timestamp(row["timestamp"]), float(row["price"]), float(row.get("volume") or 0))
+
+
+class QuoteSource:
+    """
+    A feed of price ticks which StockAlert.stream evaluates the alerts on as they arrive.
+    """
+
+    def ticks(self) -> Iterator[Tick]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ReplaySource(QuoteSource):
+    """
+    Replays ticks from a CSV file with the columns symbol, timestamp, price and optionally volume, or from a file with
+    one JSON object with these keys per line. With a speed of 0 the ticks are replayed as fast as possible, otherwise
+    the gaps between the ticks are kept, divided by speed.
+    """
+
+    def __init__(self, path: Path, speed: float = 0) -> None:
+        self.path = path
+        self.speed = speed
+
+    def read(self) -> Iterator[Tick]:
+        with open(self.path, "r") as file:
+            if self.path.suffix in (".jsonl", ".json"):
+                rows: Iterator[dict[str, Any]] = (json.loads(line) for line in file if line.strip())
+            else:
+                rows = csv.DictReader(file)
+            for row in rows:
+                yield to_tick(row)
+
+    def ticks(self) -> Iterator[Tick]:
+        previous: Optional[pd.Timestamp] = None
+        for tick in self.read():
+            if self.speed > 0 and previous is not None:
+                time.sleep(max((tick.timestamp - previous).total_seconds(), 0) / self.speed)
+            previous = tick.timestamp
+            yield tick
+
+
+class SocketSource(QuoteSource):
+    """
+    Reads ticks as JSON objects, one per line, from a TCP connection, e.g. from a local feed handler. The source ends
+    when the connection is closed by the other side.
+    """
+
+    def __init__(self, host: str, port: int, timeout_s: Optional[float] = None) -> None:
+        self.host = host
+        self.port = port
+        self.timeout_s = timeout_s
+        self._connection: Optional[socket.socket] = None
+
+    def ticks(self) -> Iterator[Tick]:
+        self._connection = socket.create_connection((self.host, self.port), timeout=self.timeout_s)
+        with self._connection.makefile("r") as file:
+            for line in file:
+                if line.strip():
+                    yield to_tick(json.loads(line))
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+
+
+class PollingSource(QuoteSource):
+    """
+    Fallback source which polls the intraday bars of the symbols every interval seconds and emits the latest price of
+    each symbol as a tick.
+    """
+
+    def __init__(
+        self,
+        symbols: list[str],
+        market_data: MarketDataCache,
+        interval: float = 60,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        self.symbols = symbols
+        self.market_data = market_data
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._closed = threading.Event()
+
+    def ticks(self) -> Iterator[Tick]:
+        while not self._closed.is_set():
+            for symbol, history in self.market_data.fetch_intraday(self.symbols, self.chunk_size).items():
+                yield Tick(symbol, history.index[-1], float(history["Close"].iat[-1]))
+            self._closed.wait(self.interval)
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+class FallbackSource(QuoteSource):
+    """
+    Emits the ticks of the primary source and switches to the fallback source once the primary one ends or fails,
+    e.g. when the connection of a push feed drops.
+    """
+
+    def __init__(self, primary: QuoteSource, fallback: QuoteSource) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self._closed = threading.Event()
+
+    def ticks(self) -> Iterator[Tick]:
+        try:
+            yield from self.primary.ticks()
+            reason = "ended"
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            reason = f"failed: {e}"
+        finally:
+            self.primary.close()
+        if self._closed.is_set():
+            return
+        print(f"The quote stream {reason}, falling back to {type(self.fallback).__name__}")
+        yield from self.fallback.ticks()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.primary.close()
+        self.fallback.close()
+
+
+class YahooWebSocketSource(QuoteSource):
+    """
+    Push feed of the yahoo finance streamer via yfinance.WebSocket, which runs in a background thread.
+    """
+
+    def __init__(self, symbols: list[str]) -> None:
+        self.symbols = symbols
+        self._ticks: "queue.Queue[Optional[Tick]]" = queue.Queue()
+        self._websocket: Optional["yfinance.WebSocket"] = None
+        self._day_volumes: dict[str, float] = {}
+
+    def _on_message(self, message: dict[str, Any]) -> None:
+        if "id" not in message or "price" not in message:
+            return
+        symbol = str(message["id"])
+        timestamp = pd.Timestamp(int(message["time"]), unit="ms", tz="UTC")
+        # the streamer sends the cumulative volume of the day, the tick carries the volume traded since the last one
+        day_volume = float(message.get("day_volume", 0))
+        volume = max(day_volume - self._day_volumes.get(symbol, day_volume), 0)
+        self._day_volumes[symbol] = day_volume
+        self._ticks.put(Tick(symbol, timestamp, float(message["price"]), volume))
+
+    def _listen(self) -> None:
+        try:
+            assert self._websocket is not None
+            self._websocket.listen(self._on_message)
+        finally:
+            self._ticks.put(None)
+
+    def ticks(self) -> Iterator[Tick]:
+        import yfinance  # pylint: disable=import-outside-toplevel
+
+        self._websocket = yfinance.WebSocket(verbose=False)
+        self._websocket.subscribe(self.symbols)
+        threading.Thread(target=self._listen, name="stock_alert_websocket", daemon=True).start()
+        while True:
+            tick = self._ticks.get()
+            if tick is None:
+                return
+            yield tick
+
+    def close(self) -> None:
+        if self._websocket is not None:
+            self._websocket.close()
@@ -0,0 +1,95 @@
+import concurrent.futures
+import json
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import tqdm
+
+from stock_alert.metrics import METRICS
+from stock_alert.util import get_stock_ticker, write_json_atomically
+
+UNKNOWN_SYMBOL = "N/A"
+
+
+class SymbolCache:
+    """
+    Persistent cache mapping stock names to their yahoo finance symbols. Every entry expires on its own after
+    max_age_s seconds, names that could not be resolved are cached as well. Since entries are keyed by name, adding or
+    reordering names in the stock list only requires looking up the new names.
+    """
+
+    def __init__(self, path: Path, max_age_s: float = 30 * 24 * 3600) -> None:
+        self.path = path
+        self.max_age_s = max_age_s
+        self.entries: dict[str, dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as file:
+                    self.entries = json.load(file)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                print(f"Ignoring corrupt stock symbol cache {self.path}: {e}")
+
+    def get(self, name: str) -> Optional[str]:
+        """
+        Return the cached symbol of the stock name, or None if it is unknown or expired.
+        """
+        entry = self.entries.get(name)
+        if entry is None or time.time() - entry["resolved_at"] > self.max_age_s:
+            return None
+        return str(entry["symbol"])
+
+    def set(self, name: str, symbol: str) -> None:
+        self.entries[name] = {"symbol": symbol, "resolved_at": time.time()}
+
+    def save(self) -> None:
+        """
+        Write the cache atomically, a crash while writing leaves the previous file untouched.
+        """
+        write_json_atomically(self.path, self.entries, indent=1)
+
+    def import_csv(self, path: Path) -> None:
+        """
+        Take over the entries of a stock_symbol_mapping.csv written by older versions, without overwriting newer ones.
+        """
+        with open(path, "r") as file:
+            for line in file.read().splitlines():
+                name, _, symbol = line.rpartition(",")
+                if name and name not in self.entries:
+                    self.set(name, symbol)
+
+
+def resolve_stock_symbols(
+    stock_list: list[str], cache: Optional[SymbolCache] = None, max_workers: int = 8
+) -> list[str]:
+    """
+    Resolve the stock names to yahoo finance symbols. Names are deduplicated, only names missing in the cache are
+    looked up, with at most max_workers search requests at the same time.
+    """
+    symbols: dict[str, str] = {}
+    missing = []
+    for name in dict.fromkeys(stock_list):
+        symbol = cache.get(name) if cache is not None else None
+        if symbol is None:
+            missing.append(name)
+        else:
+            symbols[name] = symbol
+
+    if missing:
+        METRICS.increment("search_requests", len(missing))
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+                futures = {executor.submit(get_stock_ticker, name): name for name in missing}
+                pbar = tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), colour="green")
+                pbar.set_description("Getting stock symbols".ljust(50))
+                for future in pbar:
+                    name = futures[future]
+                    symbols[name] = future.result() or UNKNOWN_SYMBOL
+                    if cache is not None:
+                        cache.set(name, symbols[name])
+        finally:
+            # keep what was resolved so far, even if a lookup failed
+            if cache is not None:
+                cache.save()
+
+    return [symbols[name] for name in stock_list]
@@ -1,7 +1,17 @@
 import json
-import urllib.request
+import os
+import tempfile
+import urllib.parse
+from pathlib import Path
 from typing import Any
 
+from stock_alert.gateway import GATEWAY
+from stock_alert.http_session import get_session
+
+# can be pointed to a local stand-in server, e.g. for benchmarks
+YAHOO_BASE_URL = os.environ.get("STOCK_ALERT_YAHOO_BASE_URL", "https://query2.finance.yahoo.com")
+SEARCH_TIMEOUT_S = 10
+
 
 def hours_to_seconds(hours: float) -> float:
     """
@@ -10,6 +20,23 @@ def hours_to_seconds(hours: float) -> float:
     return hours * 3600
 
 
+def write_json_atomically(path: Path, data: Any, **kwargs: Any) -> None:
+    """
+    Write the data as JSON to a temporary file next to the path and move it over the path, a crash while writing
+    leaves the previous file untouched. The keyword arguments are passed to json.dump.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, **kwargs)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
 def get_json_stock_info(raw_stock_name: str) -> dict[str, Any]:
     """
     Get the stock information from the yahoo finance.
@@ -17,8 +44,15 @@ def get_json_stock_info(raw_stock_name: str) -> dict[str, Any]:
 
     url_encoded_stock_name = urllib.parse.quote(raw_stock_name)
 
-    response = urllib.request.urlopen(f"https://query2.finance.yahoo.com/v1/finance/search?q={url_encoded_stock_name}")
-    content = response.read()
+    def search() -> bytes:
+        # the pooled session keeps the connection to yahoo finance open between the searches
+        response = get_session().get(
+            f"{YAHOO_BASE_URL}/v1/finance/search?q={url_encoded_stock_name}", timeout=SEARCH_TIMEOUT_S
+        )
+        response.raise_for_status()
+        return bytes(response.content)
+
+    content = GATEWAY.call(search, key=("search", raw_stock_name))
     data = json.loads(content.decode("utf8"))
     return data
 
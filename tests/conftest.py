@@ -0,0 +1,17 @@
+from typing import Callable
+
+import pandas as pd
+import pytest
+
+
+def make_bars(closes: list[float], start: str = "2023-05-02 09:30") -> pd.DataFrame:
+    """
+    Intraday 5 minute bars of a session opening at the first close, the test cases import it directly.
+    """
+    index = pd.date_range(start, periods=len(closes), freq="5min", tz="America/New_York")
+    return pd.DataFrame({"Open": closes[0], "Close": closes}, index=index)
+
+
+@pytest.fixture(name="make_bars")
+def make_bars_fixture() -> Callable[..., pd.DataFrame]:
+    return make_bars
@@ -0,0 +1,67 @@
+import random
+from unittest import TestCase
+
+from stock_alert.alert_index import ThresholdIndex
+from stock_alert.alerts import AbsolutHigherThan, AbsolutLowerThan, AlertRelativeDailyChange
+
+
+class TestThresholdIndex(TestCase):
+    def setUp(self) -> None:
+        self.index = ThresholdIndex()
+        self.higher_100 = AbsolutHigherThan(100)
+        self.higher_110 = AbsolutHigherThan(110)
+        self.lower_90 = AbsolutLowerThan(90)
+        self.lower_80 = AbsolutLowerThan(80)
+        for alert in [self.higher_110, self.lower_80, self.higher_100, self.lower_90]:
+            self.index.add("AAPL", alert)
+
+    def test_first_price_activates_all_met_conditions(self):
+        self.assertEqual(self.index.update("AAPL", 105), [self.higher_100])
+        self.assertEqual(self.index.active("AAPL"), [self.higher_100])
+
+    def test_only_crossed_levels_are_reported(self):
+        self.index.update("AAPL", 95)
+
+        self.assertEqual(self.index.update("AAPL", 99), [])
+        self.assertEqual(self.index.update("AAPL", 115), [self.higher_100, self.higher_110])
+        # falling back below a level and rising again is a new crossing
+        self.assertEqual(self.index.update("AAPL", 105), [])
+        self.assertEqual(self.index.update("AAPL", 111), [self.higher_110])
+        self.assertEqual(self.index.update("AAPL", 85), [self.lower_90])
+        self.assertEqual(self.index.active("AAPL"), [self.lower_90])
+
+    def test_remove(self):
+        self.index.remove("AAPL", self.higher_100)
+        self.index.update("AAPL", 95)
+        self.assertEqual(self.index.update("AAPL", 120), [self.higher_110])
+        self.assertEqual(len(self.index), 3)
+
+        for alert in [self.higher_110, self.lower_80, self.lower_90]:
+            self.index.remove("AAPL", alert)
+        self.assertEqual(self.index.symbols(), [])
+
+    def test_unknown_symbols_and_alert_types(self):
+        self.assertEqual(self.index.update("TSLA", 100), [])
+        with self.assertRaises(TypeError):
+            self.index.add("AAPL", AlertRelativeDailyChange(0.03))
+
+    def test_matches_evaluating_every_alert(self):
+        rng = random.Random(42)
+        index = ThresholdIndex()
+        alerts = [AbsolutHigherThan(rng.uniform(50, 150)) for _ in range(200)]
+        alerts += [AbsolutLowerThan(rng.uniform(50, 150)) for _ in range(200)]
+        for alert in alerts:
+            index.add("AAPL", alert)
+
+        previous_active: set[int] = set()
+        for _ in range(100):
+            price = rng.uniform(40, 160)
+            crossed = index.update("AAPL", price)
+            active = {
+                id(alert)
+                for alert in alerts
+                if (isinstance(alert, AbsolutHigherThan) and price > alert.threshold)
+                or (isinstance(alert, AbsolutLowerThan) and price < alert.threshold)
+            }
+            self.assertEqual({id(alert) for alert in crossed}, active - previous_active)
+            previous_active = active
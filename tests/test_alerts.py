@@ -1,9 +1,24 @@
+import pickle
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, Mock, patch
 
+import numpy as np
 import yfinance
 
-from stock_alert.alerts import AbsolutHigherThan, AbsolutLowerThan, AlertRelativeDailyChange, BaseAlert, NoAlert
+from stock_alert.alerts import (
+    AbsolutHigherThan,
+    AbsolutLowerThan,
+    AlertBollingerBreakout,
+    AlertMovingAverageCrossover,
+    AlertRelativeDailyChange,
+    AlertRelativeStrengthIndex,
+    AlertResult,
+    BaseAlert,
+    NoAlert,
+)
+from tests.conftest import make_bars
 
 
 class TestBaseAlert(unittest.TestCase):
@@ -26,6 +41,7 @@ class TestNoAlert(unittest.TestCase):
     def test_init(self, mock_ticker):
         alert = NoAlert()
         self.assertEqual(alert.info, "")
+        self.assertIsNone(alert.evaluate(MagicMock()))
         mock_ticker.assert_not_called()
 
     @patch("yfinance.Ticker")
@@ -39,6 +55,7 @@ class TestAlertRelativeDailyChange(unittest.TestCase):
     def test_need_alert_below_lower_bound(self):
         # Create a MagicMock object for Ticker
         ticker_mock = MagicMock(spec=yfinance.Ticker)
+        ticker_mock.ticker = "AAPL"
         # Create a mock Ticker object that returns a DataFrame with an opening price of 100 and a closing price of 95
         mock_df = Mock()
         mock_df.iloc = [{"Open": 100, "Close": 95}]
@@ -52,10 +69,17 @@ class TestAlertRelativeDailyChange(unittest.TestCase):
         # Check that need_alert returns True and sets alert.info correctly
         self.assertTrue(alert.need_alert(ticker_mock))
         self.assertEqual(alert.info, "Stock price has decreased by 5.00 % falling from 100.00 to 95.00 USD.")
+        # the result is formatted the same way
+        result = alert.evaluate(ticker_mock)
+        self.assertEqual(result.values, (100.0, 95.0))
+        self.assertEqual(
+            result.message(ticker_mock), "Stock price has decreased by 5.00 % falling from 100.00 to 95.00 USD."
+        )
 
     def test_need_alert_above_upper_bound(self):
         # Create a MagicMock object for Ticker
         ticker_mock = MagicMock(spec=yfinance.Ticker)
+        ticker_mock.ticker = "AAPL"
         # Create a mock Ticker object that returns a DataFrame with an opening price of 100 and a closing price of 105
         mock_df = Mock()
         mock_df.iloc = [{"Open": 100, "Close": 105}]
@@ -69,6 +93,13 @@ class TestAlertRelativeDailyChange(unittest.TestCase):
         # Check that need_alert returns True and sets alert.info correctly
         self.assertTrue(alert.need_alert(ticker_mock))
         self.assertEqual(alert.info, "Stock price has increased by 5.00 % rising from 100.00 to 105.00 USD.")
+        # the result is formatted the same way
+        result = alert.evaluate(ticker_mock)
+        self.assertEqual(
+            result.message(ticker_mock), "Stock price has increased by 5.00 % rising from 100.00 to 105.00 USD."
+        )
+        # without a ticker the message has no currency
+        self.assertEqual(result.message(), "Stock price has increased by 5.00 % rising from 100.00 to 105.00.")
 
     def test_need_alert_within_bounds(self):
         # Create a MagicMock object for Ticker
@@ -91,6 +122,16 @@ class TestAlertRelativeDailyChange(unittest.TestCase):
         ticker_mock.ticker = "TEST"
         self.assertFalse(alert.need_alert(ticker_mock))
 
+    def test_need_alert_nan_close(self):
+        """Test that a missing last close, e.g. of a bar without trades, does not trigger an alert."""
+        ticker_mock = MagicMock(spec=yfinance.Ticker)
+        ticker_mock.ticker = "AAPL"
+        alert = AlertRelativeDailyChange(0.02)
+
+        self.assertIsNone(alert.evaluate(ticker_mock, make_bars([100.0, 101.0, np.nan])))
+        self.assertFalse(alert.need_alert(ticker_mock, make_bars([np.nan, 95.0])))
+        ticker_mock.history.assert_not_called()
+
 
 class TestAbsolutHigherThan(unittest.TestCase):
     def test_need_alert_true(self):
@@ -106,6 +147,7 @@ class TestAbsolutHigherThan(unittest.TestCase):
 
         self.assertTrue(result)
         self.assertEqual(alert.info, f"Stock price is higher than {threshold}")
+        self.assertEqual(alert.evaluate(ticker_mock).message(), f"Stock price is higher than {threshold}")
 
     def test_need_alert_false(self):
         """Test that need_alert returns False when the ticker price is lower than the threshold."""
@@ -119,6 +161,7 @@ class TestAbsolutHigherThan(unittest.TestCase):
 
         self.assertFalse(result)
         self.assertEqual(alert.info, "")
+        self.assertIsNone(alert.evaluate(ticker_mock))
 
 
 class TestAbsolutLowerThan(unittest.TestCase):
@@ -135,6 +178,7 @@ class TestAbsolutLowerThan(unittest.TestCase):
 
         self.assertTrue(result)
         self.assertEqual(alert.info, f"Stock price is lower than {threshold}")
+        self.assertEqual(alert.evaluate(ticker_mock).message(), f"Stock price is lower than {threshold}")
 
     def test_need_alert_false(self):
         """Test that need_alert returns False when the ticker price is lower than the threshold."""
@@ -148,3 +192,220 @@ class TestAbsolutLowerThan(unittest.TestCase):
 
         self.assertFalse(result)
         self.assertEqual(alert.info, "")
+        self.assertIsNone(alert.evaluate(ticker_mock))
+
+
+class TestAlertResult(unittest.TestCase):
+    def test_shared_alert_returns_a_result_per_symbol(self):
+        alert = AbsolutHigherThan(100)
+        closes = {f"S{idx}": 90.0 + idx for idx in range(20)}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(lambda symbol: alert.evaluate(make_ticker(symbol), make_bars([closes[symbol]])), closes)
+            )
+
+        fired = [result for result in results if result is not None]
+        self.assertEqual([result.symbol for result in fired], [f"S{idx}" for idx in range(11, 20)])
+        self.assertEqual([result.values[1] for result in fired], [90.0 + idx for idx in range(11, 20)])
+
+    def test_message_is_formatted_lazily(self):
+        ticker = make_ticker("AAPL")
+        result = AlertRelativeDailyChange(0.02).evaluate(ticker, make_bars([100.0, 95.0]))
+        # the currency is only looked up for the message
+        self.assertNotIn("fast_info", [name for name, *_ in ticker.mock_calls])
+        self.assertEqual(result.alert_type, AlertRelativeDailyChange)
+
+        copy = pickle.loads(pickle.dumps(result))
+        self.assertEqual(copy, result)
+        self.assertEqual(copy.message(), "Stock price has decreased by 5.00 % falling from 100.00 to 95.00.")
+        with self.assertRaises(AttributeError):
+            result.symbol = "TSLA"
+
+    def test_custom_alert_with_need_alert_only(self):
+        class CustomAlert(BaseAlert):
+            def need_alert(self, ticker, history=None) -> bool:
+                return True
+
+        result = CustomAlert().evaluate(make_ticker("AAPL"))
+        self.assertEqual(result.message(), "CustomAlert was triggered")
+        self.assertIsInstance(result, AlertResult)
+
+    def test_custom_alert_keeps_its_info(self):
+        class CustomAlert(BaseAlert):
+            def need_alert(self, ticker: yfinance.Ticker) -> bool:
+                self.info = f"{ticker.ticker} needs attention"
+                return True
+
+        result = CustomAlert().evaluate(make_ticker("AAPL"))
+        self.assertEqual(result.values, ("AAPL needs attention",))
+        self.assertEqual(result.message(), "AAPL needs attention")
+        self.assertEqual(pickle.loads(pickle.dumps(result.values)), ("AAPL needs attention",))
+
+    def test_custom_alert_keeps_the_info_of_each_symbol_across_threads(self):
+        class CustomAlert(BaseAlert):
+            def need_alert(self, ticker: yfinance.Ticker) -> bool:
+                self.info = f"{ticker.ticker} moved"
+                # give the other threads a chance to overwrite the info before it is read
+                time.sleep(0.001)
+                return True
+
+        # the same instance is shared by all symbols, like after configure_same_alert_for_all
+        alert = CustomAlert()
+        symbols = [f"S{idx}" for idx in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda symbol: alert.evaluate(make_ticker(symbol)), symbols))
+
+        self.assertEqual([result.message() for result in results], [f"{symbol} moved" for symbol in symbols])
+
+    def test_custom_alert_without_history_argument(self):
+        class CustomAlert(BaseAlert):
+            def need_alert(self, ticker: yfinance.Ticker) -> bool:
+                return ticker.history(period="1d", interval="5m").iloc[-1]["Close"] > 100
+
+        ticker = make_ticker("AAPL")
+        ticker.history.return_value = make_bars([100.0, 101.0])
+        self.assertFalse(CustomAlert.need_alert_takes_history)
+        self.assertEqual(CustomAlert().evaluate(ticker, make_bars([100.0, 99.0])).symbol, "AAPL")
+        self.assertTrue(AbsolutHigherThan.need_alert_takes_history)
+
+
+class TestPrefetchedHistory(unittest.TestCase):
+    def test_uses_given_history_instead_of_fetching(self):
+        """Test that alerts evaluate a pre-fetched history without calling ticker.history."""
+        ticker_mock = MagicMock()
+        mock_df = Mock()
+        mock_df.iloc = [{"Close": 102}]
+
+        alert = AbsolutHigherThan(100)
+
+        self.assertTrue(alert.need_alert(ticker_mock, mock_df))
+        ticker_mock.history.assert_not_called()
+
+    def test_get_history_falls_back_to_ticker(self):
+        """Test that get_history fetches via the ticker when no history is given."""
+        ticker_mock = MagicMock()
+
+        self.assertIs(BaseAlert.get_history(ticker_mock), ticker_mock.history.return_value)
+        ticker_mock.history.assert_called_once_with(period="1d", interval="5m")
+
+
+class TestNeedAlertBatch(unittest.TestCase):
+    def test_relative_daily_change(self):
+        alerts = [AlertRelativeDailyChange(0.02), AlertRelativeDailyChange(0.02), AlertRelativeDailyChange(0.1)]
+        opening_prices = np.array([100.0, 100.0, 100.0])
+        latest_prices = np.array([95.0, 101.0, 105.0])
+
+        mask = AlertRelativeDailyChange.need_alert_batch(alerts, opening_prices, latest_prices)
+
+        np.testing.assert_array_equal(mask, [True, False, False])
+
+    def test_absolut_thresholds(self):
+        latest_prices = np.array([99.0, 101.0, np.nan])
+        alerts = [AbsolutHigherThan(100), AbsolutHigherThan(100), AbsolutHigherThan(100)]
+        np.testing.assert_array_equal(
+            AbsolutHigherThan.need_alert_batch(alerts, latest_prices, latest_prices), [False, True, False]
+        )
+        alerts = [AbsolutLowerThan(100), AbsolutLowerThan(100), AbsolutLowerThan(100)]
+        np.testing.assert_array_equal(
+            AbsolutLowerThan.need_alert_batch(alerts, latest_prices, latest_prices), [True, False, False]
+        )
+
+    def test_base_alert_is_not_batchable(self):
+        self.assertFalse(BaseAlert.batchable)
+        with self.assertRaises(NotImplementedError):
+            BaseAlert.need_alert_batch([BaseAlert()], np.array([1.0]), np.array([1.0]))
+        self.assertFalse(NoAlert.need_alert_batch([NoAlert()], np.array([1.0]), np.array([1.0])).any())
+
+
+def make_ticker(symbol: str) -> MagicMock:
+    ticker = MagicMock()
+    ticker.ticker = symbol
+    return ticker
+
+
+class TestIndicatorAlerts(unittest.TestCase):
+    def test_crossover_fires_once_per_crossing(self):
+        alert = AlertMovingAverageCrossover(2, 4)
+        ticker = make_ticker("AAPL")
+        # the last bar is still forming and not used
+        closes = [10.0, 10.0, 10.0, 10.0, 9.0, 8.0, 12.0, 14.0, 15.0]
+
+        fired = [alert.need_alert(ticker, make_bars(closes[: idx + 2])) for idx in range(len(closes) - 2)]
+
+        self.assertEqual(fired, [False, False, False, False, False, False, True])
+        result = alert.evaluate(ticker, make_bars(closes[:8]))
+        self.assertEqual(result.message(), "SMA 2 crossed above SMA 4, 10.00 vs. 9.75.")
+        # the same bars again are not pushed twice, the crossing is still the latest signal
+        self.assertTrue(alert.need_alert(ticker, make_bars(closes[:8])))
+        self.assertEqual(alert.last_timestamps[0], make_bars(closes).index[-3])
+        self.assertFalse(alert.need_alert(ticker, make_bars(closes)))
+
+    def test_warm_up_does_not_fire(self):
+        alert = AlertMovingAverageCrossover(2, 4)
+        ticker = make_ticker("AAPL")
+        closes = [10.0, 10.0, 10.0, 10.0, 9.0, 8.0, 12.0, 14.0, 15.0]
+
+        # the bars up to the crossing are past bars, e.g. of the previous session
+        alert.warm_up(["AAPL"], [make_bars(closes[:8])])
+
+        self.assertFalse(alert.need_alert(ticker, make_bars(closes[:8])))
+        self.assertTrue(alert.slow.ready(np.array([0]))[0])
+        self.assertEqual(alert.last_timestamps[0], make_bars(closes).index[-3])
+
+    def test_exponential_crossover(self):
+        alert = AlertMovingAverageCrossover(2, 3, exponential=True)
+        ticker = make_ticker("AAPL")
+        self.assertFalse(alert.need_alert(ticker, make_bars([10.0, 9.0, 8.0, 7.0, 0.0])))
+        result = alert.evaluate(ticker, make_bars([10.0, 9.0, 8.0, 7.0, 12.0, 0.0]))
+        self.assertTrue(result.message().startswith("EMA 2 crossed above EMA 3"))
+
+        with self.assertRaises(ValueError):
+            AlertMovingAverageCrossover(5, 5)
+
+    def test_relative_strength_index(self):
+        alert = AlertRelativeStrengthIndex(period=3, lower=30, upper=70)
+        ticker = make_ticker("AAPL")
+        result = alert.evaluate(ticker, make_bars([10.0, 11.0, 12.0, 13.0, 0.0]))
+        self.assertEqual(result.message(), "RSI 3 rose above 70 to 100.0, the stock is overbought.")
+        # the RSI stays in the overbought zone
+        self.assertFalse(alert.need_alert(ticker, make_bars([10.0, 11.0, 12.0, 13.0, 14.0, 0.0])))
+
+    def test_bollinger_breakout(self):
+        alert = AlertBollingerBreakout(period=4, num_std=2)
+        ticker = make_ticker("AAPL")
+        self.assertFalse(alert.need_alert(ticker, make_bars([10.0, 11.0, 10.0, 11.0, 10.5, 0.0])))
+        result = alert.evaluate(ticker, make_bars([10.0, 11.0, 10.0, 11.0, 10.5, 5.0, 0.0]))
+        self.assertTrue(result.message().startswith("Stock price broke below the lower Bollinger band (4, 2)"))
+
+    def test_bollinger_breakout_skips_missing_closes(self):
+        ticker = make_ticker("AAPL")
+        for closes in ([10.0, 11.0, 10.0, 11.0, 5.0, np.nan, 4.0, 0.0], [10.0, 11.0, 10.0, 11.0, 5.0, 4.0, 0.0]):
+            alert = AlertBollingerBreakout(period=4, num_std=2)
+
+            fired = [alert.need_alert(ticker, make_bars(closes[: idx + 2])) for idx in range(len(closes) - 1)]
+
+            self.assertEqual(sum(fired), 1, closes)
+            self.assertEqual(alert.closes[0], 4.0)
+
+    def test_indicator_alerts_have_an_info(self):
+        self.assertEqual(AlertMovingAverageCrossover(2, 4).info, "")
+
+    def test_update_batch_matches_need_alert(self):
+        shared = AlertMovingAverageCrossover(2, 4)
+        single = AlertMovingAverageCrossover(2, 4)
+        reference = AlertMovingAverageCrossover(2, 4)
+        histories = {
+            "AAPL": make_bars([10.0, 10.0, 10.0, 10.0, 8.0, 12.0, 14.0, 0.0]),
+            "TSLA": make_bars([10.0, 10.0, 10.0, 10.0, 12.0, 0.0]),
+            "AMZN": make_bars([10.0, 10.0, 10.0, 10.0, 8.0, 14.0, 0.0]),
+        }
+        symbols = list(histories)
+
+        need_alert = AlertMovingAverageCrossover.update_batch([shared, shared, single], symbols, histories)
+
+        expected = [reference.need_alert(make_ticker(symbol), histories[symbol]) for symbol in symbols]
+        np.testing.assert_array_equal(need_alert, expected)
+        self.assertEqual(list(shared.rows), ["AAPL", "TSLA"])
+        self.assertTrue(AlertMovingAverageCrossover.stateful)
+        self.assertFalse(AbsolutHigherThan.stateful)
@@ -0,0 +1,151 @@
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.alerts import AlertMovingAverageCrossover, AlertRelativeDailyChange
+from stock_alert.backtest import Replay, apply_reminders, main, opening_prices
+from stock_alert.class_stock_alert import ReminderTable
+from stock_alert.history_store import HistoryStore
+
+
+def make_session_bars(days: list[str], closes: np.ndarray) -> pd.DataFrame:
+    index = pd.DatetimeIndex(
+        [
+            timestamp
+            for day in days
+            for timestamp in pd.date_range(f"{day} 09:30", periods=len(closes) // len(days), freq="5min")
+        ]
+    ).tz_localize("America/New_York")
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1.0}, index=index)
+
+
+def test_apply_reminders_matches_the_reminder_table():
+    timestamps = np.sort(np.random.default_rng(0).integers(0, 10**6, 200)) * 10**9
+    reminders = ReminderTable(["AAPL"], 24)
+    expected = [idx for idx, timestamp in enumerate(timestamps) if reminders.need_reminder("AAPL", timestamp / 10**9)]
+
+    np.testing.assert_array_equal(apply_reminders(timestamps, 24 * 3600 * 10**9), expected)
+    assert len(apply_reminders(timestamps[:0], 10)) == 0
+
+
+def test_opening_prices():
+    np.testing.assert_array_equal(
+        opening_prices(np.array([1.0, 2.0, 3.0, 4.0]), np.array([7, 7, 8, 8])), [1.0, 1.0, 3.0, 3.0]
+    )
+
+
+class TestReplay(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(Path(self.tmp_dir.name))
+        rng = np.random.default_rng(1)
+        self.days = ["2023-05-02", "2023-05-03", "2023-05-04"]
+        self.histories = {}
+        for symbol in ("AAPL", "TSLA"):
+            closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 3 * 40)))
+            self.histories[symbol] = make_session_bars(self.days, closes)
+            self.store.append(symbol, "5m", self.histories[symbol])
+        self.replay = Replay(self.store)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def live_fired(self, alert, symbol: str, forming_bar: bool) -> list[bool]:
+        """
+        Evaluate the alert like the live loop does, once per bar on the bars of the session up to that bar.
+        """
+        history = self.histories[symbol]
+        ticker = MagicMock(ticker=symbol)
+        fired = []
+        for idx in range(len(history)):
+            session = history[history.index.date == history.index[idx].date()]
+            bars = session[session.index <= history.index[idx]]
+            if forming_bar:
+                # indicator alerts leave out the last bar, which is still forming in the live loop
+                bars = pd.concat([bars, bars.iloc[-1:].set_axis([bars.index[-1] + pd.Timedelta("5min")])])
+            fired.append(alert.need_alert(ticker, bars))
+        return fired
+
+    def test_batchable_alert_matches_live_evaluation(self):
+        fired = self.replay.fire_batchable(AlertRelativeDailyChange(0.02))
+
+        for symbol, first, last in zip(self.replay.bars, self.replay.offsets[:-1], self.replay.offsets[1:]):
+            self.assertEqual(list(fired[first:last]), self.live_fired(AlertRelativeDailyChange(0.02), symbol, False))
+        self.assertTrue(fired.any())
+
+    def test_stateful_alert_matches_live_evaluation(self):
+        fired = self.replay.fire_stateful(AlertMovingAverageCrossover(3, 8))
+
+        for symbol, first, last in zip(self.replay.bars, self.replay.offsets[:-1], self.replay.offsets[1:]):
+            # the indicators carry over from one session to the next, like in a live loop running for days
+            self.assertEqual(list(fired[first:last]), self.live_fired(AlertMovingAverageCrossover(3, 8), symbol, True))
+        self.assertTrue(fired.any())
+
+    def test_run_applies_the_reminder_interval(self):
+        config = {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.02}
+        every_bar = self.replay.run(config, remind_interval_h=0)
+        daily = self.replay.run(config, remind_interval_h=24)
+
+        self.assertEqual(every_bar.bars, 240)
+        self.assertEqual(every_bar.sessions, 3)
+        self.assertEqual(list(every_bar.summary["sent"]), list(every_bar.summary["fired"]))
+        self.assertEqual(len(every_bar.alerts), every_bar.summary["fired"].sum())
+        self.assertLess(len(daily.alerts), len(every_bar.alerts))
+        self.assertTrue(daily.alerts["timestamp"].is_monotonic_increasing)
+        for _, alerts in daily.alerts.groupby("symbol"):
+            self.assertTrue((alerts["timestamp"].diff().dropna() > pd.Timedelta("24h")).all())
+
+    def test_run_rejects_alerts_that_can_not_be_replayed(self):
+        with self.assertRaises(ValueError):
+            self.replay.run({"type": "BaseAlert"})
+
+    def test_main_writes_the_alerts(self):
+        path = Path(self.tmp_dir.name) / "alerts.csv"
+        main(
+            [
+                "--history-store",
+                self.tmp_dir.name,
+                "--alert",
+                '{"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.02}',
+                "--alert",
+                '{"type": "AbsolutHigherThan", "threshold": 1000}',
+                "--alerts-csv",
+                str(path),
+            ]
+        )
+        alerts = pd.read_csv(path)
+        self.assertEqual(set(alerts["symbol"]), {"AAPL", "TSLA"})
+        self.assertEqual(alerts["alert"].nunique(), 1)
+
+    def test_main_backfills_the_symbols(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            download = MagicMock(return_value=pd.concat(self.histories, axis=1))
+            output = io.StringIO()
+            with patch("yfinance.download", download), contextlib.redirect_stdout(output):
+                main(
+                    [
+                        "--history-store",
+                        tmp_dir,
+                        "--backfill",
+                        "--symbols",
+                        "AAPL",
+                        "TSLA",
+                        "--alert",
+                        '{"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.02}',
+                    ]
+                )
+
+            self.assertEqual(download.call_args.args[0], ["AAPL", "TSLA"])
+            self.assertEqual(
+                (download.call_args.kwargs["interval"], download.call_args.kwargs["period"]), ("5m", "60d")
+            )
+            self.assertEqual(HistoryStore(Path(tmp_dir)).symbols("5m"), ["AAPL", "TSLA"])
+            self.assertIn("bars=240", output.getvalue())
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                main(["--history-store", tmp_dir, "--backfill", "--alert", "{}"])
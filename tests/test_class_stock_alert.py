@@ -1,8 +1,26 @@
 import tempfile
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 
-from stock_alert.class_stock_alert import StockAlert
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alert.alerts import (
+    AbsolutHigherThan,
+    AbsolutLowerThan,
+    AlertMovingAverageCrossover,
+    BaseAlert,
+)
+from stock_alert.backtest import Replay
+from stock_alert.class_stock_alert import ReminderTable, StockAlert
+from stock_alert.data_plane import DataPlane
+from stock_alert.engine import EvaluationEngine
+from stock_alert.gateway import RequestGateway
+from stock_alert.history_store import HistoryStore
+from stock_alert.market_data import MarketDataCache
+from stock_alert.metrics import Metrics
+from stock_alert.notifications import Digest, NotificationQueue
 
 
 def test_read_stock_list():
@@ -20,3 +38,357 @@ def test_read_stock_list():
 
     # Clean up the temporary file
     temp_path.unlink()
+
+
+class FakeDataPlane(DataPlane):
+    """
+    A data plane whose tickers are mocks that nothing is requested from and that are kept until the test is done.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(max_workers=4, request_timeout_s=5)
+        # failed requests are retried right away
+        self.market_data = MarketDataCache(gateway=RequestGateway(backoff_s=0))
+        self.engine = EvaluationEngine(max_workers=4, timeout_s=5)
+        self.notifications = NotificationQueue(send=MagicMock())
+        self.mock_tickers: dict[str, MagicMock] = {}
+
+    def ticker(self, symbol: str) -> MagicMock:
+        if symbol not in self.mock_tickers:
+            self.mock_tickers[symbol] = MagicMock(ticker=symbol, fast_info={"timezone": "America/New_York"})
+        return self.mock_tickers[symbol]
+
+
+def make_stock_alert(symbols: list[str]) -> StockAlert:
+    """
+    Create a StockAlert for the given symbols without resolving anything via the web and without a state file.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir, patch(
+        "stock_alert.class_stock_alert.resolve_stock_symbols", side_effect=lambda names, cache: names
+    ):
+        stock_alert = StockAlert(
+            Path(tmp_dir) / "stocks.txt", chunk_size=2, data_plane=FakeDataPlane(), stock_list=symbols
+        )
+        assert stock_alert.state is not None
+        stock_alert.state.close()
+        stock_alert.state = None
+    return stock_alert
+
+
+def test_run_cycle_uses_batched_histories(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA", "AMZN"])
+    stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+    stock_alert.configure_alert("TSLA", AbsolutHigherThan(100))
+    histories = {"AAPL": make_bars([99.0, 101.0]), "TSLA": make_bars([90.0])}
+
+    with patch("stock_alert.market_data.fetch_history_batch", return_value=histories) as mock_fetch:
+        assert stock_alert.run_cycle()
+        # the second cycle within the spin interval is served from the cache
+        assert not stock_alert.run_cycle()
+
+    # only symbols with an alert are fetched, all in one batch call
+    mock_fetch.assert_called_once_with(
+        ["AAPL", "TSLA"], "1d", "5m", 2, 10, start=None, gateway=stock_alert.market_data.gateway
+    )
+    for ticker in stock_alert.stock_tickers.values():
+        ticker.history.assert_not_called()
+
+
+def test_run_cycle_reports_failing_symbols_and_continues(capsys, make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_same_alert_for_all(AbsolutLowerThan(100))
+    # no batched data for TSLA, its fallback fetch fails
+    stock_alert.stock_tickers["TSLA"].history.side_effect = ConnectionError("timed out")
+    histories = {"AAPL": make_bars([99.0])}
+
+    with patch("stock_alert.market_data.fetch_history_batch", return_value=histories):
+        assert stock_alert.run_cycle()
+
+    output = capsys.readouterr().out
+    assert "Error while checking the alert for TSLA" in output
+    assert "Stock price is lower than 100" in output
+
+
+class CustomAlert(BaseAlert):
+    def need_alert(self, ticker, history=None) -> bool:
+        return True
+
+
+def test_select_candidates(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA", "AMZN", "MSFT"])
+    stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+    stock_alert.configure_alert("TSLA", AbsolutHigherThan(100))
+    stock_alert.configure_alert("AMZN", AbsolutHigherThan(100))
+    stock_alert.configure_alert("MSFT", CustomAlert())
+    histories = {"AAPL": make_bars([99.0, 101.0]), "TSLA": make_bars([90.0])}
+
+    # AAPL is above its threshold, AMZN has no prices and MSFT can not be evaluated in batch
+    assert stock_alert.select_candidates(["AAPL", "TSLA", "AMZN", "MSFT"], histories) == ["AAPL", "AMZN", "MSFT"]
+
+
+class HigherThanOrFalling(AbsolutHigherThan):
+    def evaluate(self, ticker, history=None):
+        result = super().evaluate(ticker, history)
+        if result is None and history["Close"].iat[-1] < history["Open"].iat[0]:
+            return self.result(ticker, (self.threshold, float(history["Close"].iat[-1])))
+        return result
+
+
+def test_select_candidates_of_subclassed_alerts(make_bars):
+    stock_alert = make_stock_alert(["AAPL"])
+    stock_alert.configure_alert("AAPL", HigherThanOrFalling(100))
+    histories = {"AAPL": make_bars([99.0, 98.0])}
+
+    # the subclass fires below the threshold, so the batch rule of AbsolutHigherThan must not filter it
+    assert not HigherThanOrFalling.batchable and AbsolutHigherThan.batchable
+    assert stock_alert.select_candidates(["AAPL"], histories) == ["AAPL"]
+    alerts, _ = stock_alert.evaluate_alerts(["AAPL"], histories)
+    assert [result.values for result in alerts] == [(100, 98.0)]
+
+    class LoggedCrossover(AlertMovingAverageCrossover):
+        def evaluate(self, ticker, history=None):
+            return super().evaluate(ticker, history)
+
+    assert not LoggedCrossover.stateful and AlertMovingAverageCrossover.stateful
+
+
+def test_get_exchanges_looks_up_each_symbol_once():
+    stock_alert = make_stock_alert(["AAPL", "SAP.DE"])
+    stock_alert.stock_tickers["AAPL"].fast_info = {"exchange": "NMS"}
+    stock_alert.stock_tickers["SAP.DE"].fast_info = {}
+
+    assert stock_alert.get_exchanges(["AAPL", "SAP.DE"]) == {"AAPL": "NMS", "SAP.DE": ""}
+    stock_alert.stock_tickers["AAPL"].fast_info = {"exchange": "changed"}
+    assert stock_alert.get_exchanges(["AAPL"]) == {"AAPL": "NMS"}
+
+
+def test_get_exchanges_retries_failed_lookups():
+    stock_alert = make_stock_alert(["AAPL"])
+    fast_info = MagicMock()
+    fast_info.__getitem__.side_effect = [ValueError("no response"), "NMS"]
+    stock_alert.stock_tickers["AAPL"].fast_info = fast_info
+
+    # a failed lookup is treated as always open for this cycle only
+    assert stock_alert.get_exchanges(["AAPL"]) == {"AAPL": ""}
+    assert "AAPL" not in stock_alert.exchanges
+    assert stock_alert.get_exchanges(["AAPL"]) == {"AAPL": "NMS"}
+    assert stock_alert.exchanges["AAPL"] == "NMS"
+
+
+def test_get_timezones_are_shared_with_the_market_data():
+    stock_alert = make_stock_alert(["7203.T", "AAPL"])
+    stock_alert.stock_tickers["7203.T"].fast_info = {"timezone": "Asia/Tokyo"}
+    stock_alert.stock_tickers["AAPL"].fast_info = {}
+
+    assert stock_alert.get_timezones(["7203.T", "AAPL"]) == {"7203.T": "Asia/Tokyo", "AAPL": ""}
+    assert stock_alert.market_data.timezones == {"7203.T": "Asia/Tokyo", "AAPL": ""}
+
+
+def test_run_cycle_only_checks_given_symbols():
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_same_alert_for_all(AbsolutHigherThan(100))
+
+    with patch("stock_alert.market_data.fetch_history_batch", return_value={}) as mock_fetch:
+        assert not stock_alert.run_cycle([])
+        mock_fetch.assert_not_called()
+
+
+def test_run_cycle_sends_one_digest_per_cycle(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.receiver_mail = "me@example.com"
+    stock_alert.configure_same_alert_for_all(AbsolutHigherThan(100))
+    for ticker in stock_alert.stock_tickers.values():
+        ticker.info = {}
+    histories = {"AAPL": make_bars([101.0]), "TSLA": make_bars([102.0])}
+
+    with patch("stock_alert.market_data.fetch_history_batch", return_value=histories):
+        assert stock_alert.run_cycle()
+    stock_alert.notifications.join()
+
+    stock_alert.notifications.send.assert_called_once_with(
+        Digest(
+            "me@example.com",
+            "2 stock alerts",
+            "AAPL:\nStock price is higher than 100\n\nTSLA:\nStock price is higher than 100",
+        )
+    )
+
+
+def test_run_cycle_records_metrics(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_same_alert_for_all(AbsolutHigherThan(100))
+    histories = {"AAPL": make_bars([99.0]), "TSLA": make_bars([90.0])}
+
+    with patch("stock_alert.class_stock_alert.METRICS", Metrics(enabled=True)) as metrics, patch(
+        "stock_alert.market_data.fetch_history_batch", return_value=histories
+    ):
+        stock_alert.run_cycle()
+
+    timings = metrics.snapshot()["timings"]
+    assert {"cycle", "fetch", "vectorized", "evaluate"} <= set(timings)
+
+
+def test_run_cycle_reports_crossed_price_levels_once(capsys, make_bars):
+    stock_alert = make_stock_alert(["AAPL"])
+    stock_alert.stock_tickers["AAPL"].info = {"longName": "Apple Inc."}
+    stock_alert.add_price_level_alert("AAPL", AbsolutHigherThan(100))
+    stock_alert.add_price_level_alert("AAPL", AbsolutHigherThan(110))
+    stock_alert.market_data.history_ttl_s = 0
+
+    prices = [{"AAPL": make_bars([95.0])}, {"AAPL": make_bars([105.0])}, {"AAPL": make_bars([106.0])}]
+    with patch("stock_alert.market_data.fetch_history_batch", side_effect=prices):
+        assert not stock_alert.run_cycle()
+        assert stock_alert.run_cycle()
+        assert not stock_alert.run_cycle()
+
+    output = capsys.readouterr().out
+    assert output.count("Stock price is higher than 100") == 1
+    assert "Stock price is higher than 110" not in output
+
+
+def test_missing_price_does_not_hide_a_crossing(make_bars):
+    stock_alert = make_stock_alert(["AAPL"])
+    stock_alert.add_price_level_alert("AAPL", AbsolutHigherThan(200))
+
+    fired = [
+        stock_alert.check_price_levels(["AAPL"], {"AAPL": make_bars([price])}) for price in [100.0, float("nan"), 250.0]
+    ]
+
+    assert [len(crossings) for crossings in fired] == [0, 0, 1]
+
+
+def test_watched_symbols_include_the_symbols_with_price_levels():
+    stock_alert = make_stock_alert(["AAPL", "TSLA", "AMZN"])
+    stock_alert.configure_alert("AMZN", AbsolutHigherThan(100))
+    stock_alert.add_price_level_alert("TSLA", AbsolutHigherThan(200))
+
+    assert stock_alert.watched_symbols() == ["TSLA", "AMZN"]
+
+
+def test_add_price_level_alert_rejects_unknown_symbols():
+    stock_alert = make_stock_alert(["AAPL"])
+    with pytest.raises(ValueError):
+        stock_alert.add_price_level_alert("TSLA", AbsolutHigherThan(100))
+    assert len(stock_alert.price_levels) == 0
+
+
+def test_restart_restores_reminders_and_price_levels(capsys, make_bars):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "stocks.txt"
+        path.write_text("AAPL\nTSLA\n")
+        histories = {"AAPL": make_bars([101.0]), "TSLA": make_bars([201.0])}
+
+        def run() -> bool:
+            with patch(
+                "stock_alert.class_stock_alert.resolve_stock_symbols", side_effect=lambda names, cache: names
+            ), patch("stock_alert.market_data.fetch_history_batch", return_value=histories), patch.object(
+                StockAlert, "get_stock_name", side_effect=lambda symbol, ticker: symbol
+            ), patch.object(
+                StockAlert, "get_timezones", return_value={}
+            ):
+                stock_alert = StockAlert(path)
+                stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+                stock_alert.add_price_level_alert("TSLA", AbsolutHigherThan(200))
+                try:
+                    return stock_alert.run_cycle()
+                finally:
+                    # the process ends, which releases the state for the next one
+                    stock_alert.state.close()
+
+        assert run()
+        assert "Alert for AAPL" in capsys.readouterr().out
+        # the reminder is still pending and the price level was crossed before the restart
+        assert not run()
+        assert (Path(tmp_dir) / "stocks.state.json.log").exists()
+
+
+def test_reminder_table():
+    reminders = ReminderTable(["AAPL", "TSLA", "AAPL"], 1, {"TSLA": 1000.0, "AMZN": 1000.0})
+
+    assert len(reminders) == 2 and "AMZN" not in reminders
+    assert reminders.last_reminder("AAPL") is None
+    assert reminders.need_reminder("AAPL", now=1500.0)
+    assert not reminders.need_reminder("AAPL", now=1600.0)
+    assert reminders.last_reminder("AAPL") == 1500.0
+    # restored reminders are due one interval after they were sent
+    assert not reminders.need_reminder("TSLA", now=4000.0)
+    assert reminders.need_reminder("TSLA", now=4601.0)
+
+
+def test_backfill_history_runs_once_per_day():
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+    stock_alert.history_store = MagicMock()
+
+    stock_alert.backfill_history()
+    stock_alert.backfill_history()
+
+    assert stock_alert.history_store.backfill.call_args_list == [
+        call(["AAPL"], "1d", "1y", chunk_size=2, timeout_s=10),
+        call(["AAPL"], "5m", "60d", chunk_size=2, timeout_s=10),
+    ]
+
+
+def make_download(symbols: list[str], interval: str, **_) -> pd.DataFrame:
+    """
+    Build a frame shaped like the result of yfinance.download(..., group_by="ticker").
+    """
+    index = pd.date_range(
+        "2023-05-02 09:30", periods=3, freq="D" if interval == "1d" else "5min", tz="America/New_York"
+    )
+    return pd.concat(
+        {symbol: pd.DataFrame({"Open": 1.0, "Close": [1.0, 2.0, 3.0]}, index=index) for symbol in symbols}, axis=1
+    )
+
+
+def test_backfill_history_stores_daily_and_intraday_bars():
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stock_alert.history_store = HistoryStore(Path(tmp_dir))
+        with patch("yfinance.download", side_effect=make_download) as mock_download:
+            stock_alert.backfill_history()
+
+        assert [(call.kwargs["interval"], call.kwargs["period"]) for call in mock_download.call_args_list] == [
+            ("1d", "1y"),
+            ("5m", "60d"),
+        ]
+        assert stock_alert.history_store.symbols("5m") == ["AAPL"]
+        # the intraday bars can be replayed
+        report = Replay(stock_alert.history_store).run({"type": "AbsolutHigherThan", "threshold": 2.5})
+        assert report.bars == 3
+        assert list(report.alerts["close"]) == [3.0]
+
+
+def test_backfill_history_warms_up_the_indicators(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    alert = AlertMovingAverageCrossover(2, 4)
+    stock_alert.configure_same_alert_for_all(alert)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stock_alert.history_store = HistoryStore(Path(tmp_dir))
+        # the bars of the previous session are stored already, nothing new is downloaded
+        stock_alert.history_store.append("AAPL", "5m", make_bars([10.0, 10.0, 10.0, 10.0, 9.0, 8.0, 12.0, 14.0]))
+        with patch("yfinance.download", return_value=pd.DataFrame()):
+            stock_alert.backfill_history()
+
+    # the crossing in the stored bars is no alert, but the averages are ready for the first live bar
+    rows = np.array([alert.rows["AAPL"], alert.rows["TSLA"]])
+    assert list(alert.slow.ready(rows)) == [True, False]
+    assert not alert.fired[rows].any()
+
+
+def test_select_candidates_feeds_stateful_alerts_in_batch(make_bars):
+    stock_alert = make_stock_alert(["AAPL", "TSLA"])
+    stock_alert.configure_same_alert_for_all(AlertMovingAverageCrossover(2, 4))
+    histories = {
+        "AAPL": make_bars([10.0, 10.0, 10.0, 10.0, 8.0, 14.0, 0.0]),
+        "TSLA": make_bars([10.0, 10.0, 10.0, 10.0, 11.0, 12.0, 0.0]),
+    }
+
+    with patch.object(
+        AlertMovingAverageCrossover, "update_batch", wraps=AlertMovingAverageCrossover.update_batch
+    ) as batch:
+        assert stock_alert.select_candidates(["AAPL", "TSLA"], histories) == ["AAPL"]
+    batch.assert_called_once()
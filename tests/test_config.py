@@ -0,0 +1,162 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from stock_alert.alerts import AlertRelativeDailyChange, AlertRelativeStrengthIndex
+from stock_alert.config import alert_key, compile_plan, load_config
+
+CONFIG = {
+    "defaults": {"receiver_mail": "me@example.com", "remind_interval_h": 12},
+    "watchlists": [
+        {
+            "name": "tech",
+            "stock_list": "tech.txt",
+            "alert": {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.03},
+            "stocks": [
+                {"name": "Apple", "alert": {"type": "AlertRelativeStrengthIndex", "period": 14}},
+                {"name": "Tesla", "price_levels": [{"type": "AbsolutHigherThan", "threshold": 300}]},
+            ],
+        },
+        {
+            "name": "energy",
+            "receiver_mail": "energy@example.com",
+            "remind_interval_h": 1,
+            "stocks": [
+                "Shell",
+                {"name": "BP", "alert": {"rel_change_in_percent": 0.03, "type": "AlertRelativeDailyChange"}},
+            ],
+        },
+    ],
+}
+
+TOML_CONFIG = """
+[defaults]
+remind_interval_h = 12
+
+[[watchlists]]
+name = "tech"
+alert = { type = "AbsolutHigherThan", threshold = 100 }
+stocks = ["Apple"]
+"""
+
+YAML_CONFIG = """
+watchlists:
+  - name: tech
+    alert: {type: AbsolutHigherThan, threshold: 100}
+    stocks: [Apple]
+"""
+
+
+def test_alert_key_ignores_the_order_of_the_arguments():
+    assert alert_key({"type": "AbsolutHigherThan", "threshold": 1}) == alert_key(
+        {"threshold": 1, "type": "AbsolutHigherThan"}
+    )
+
+
+class TestCompilePlan(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        (self.path / "tech.txt").write_text("Apple\nMicrosoft\n\n")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_watchlists_inherit_the_defaults(self):
+        plan = compile_plan(CONFIG, self.path)
+
+        tech, energy = plan.watchlists
+        self.assertEqual(tech.name, "tech")
+        self.assertEqual(tech.receiver_mail, "me@example.com")
+        self.assertEqual(tech.remind_interval_h, 12)
+        self.assertEqual(tech.stocks, ["Apple", "Microsoft", "Tesla"])
+        self.assertEqual(energy.receiver_mail, "energy@example.com")
+        self.assertEqual(energy.remind_interval_h, 1)
+
+    def test_identical_alerts_are_shared(self):
+        plan = compile_plan(CONFIG, self.path)
+
+        # the daily change alert of Microsoft, Tesla and BP is the same one, Apple overrides it with an RSI alert
+        self.assertEqual(len(plan.alerts), 2)
+        tech, energy = plan.watchlists
+        self.assertEqual(tech.alerts["Microsoft"], energy.alerts["BP"])
+        self.assertIsInstance(plan.alerts[tech.alerts["Microsoft"]], AlertRelativeDailyChange)
+        self.assertIsInstance(plan.alerts[tech.alerts["Apple"]], AlertRelativeStrengthIndex)
+        self.assertEqual(tech.alerts["Tesla"], energy.alerts["BP"])
+
+    def test_only_stocks_with_alerts_need_data(self):
+        plan = compile_plan(CONFIG, self.path)
+
+        # Shell has neither an alert nor a price level
+        self.assertEqual(
+            [watchlist.watched_stocks() for watchlist in plan.watchlists], [["Apple", "Microsoft", "Tesla"], ["BP"]]
+        )
+        self.assertEqual(plan.watchlists[0].price_levels, {"Tesla": [{"type": "AbsolutHigherThan", "threshold": 300}]})
+
+    def test_stocks_with_their_own_receiver_get_a_watchlist(self):
+        plan = compile_plan(
+            {
+                "defaults": {"receiver_mail": "me@example.com", "alert": {"type": "AbsolutHigherThan", "threshold": 1}},
+                "watchlists": [
+                    {
+                        "name": "tech",
+                        "stocks": [
+                            "Apple",
+                            {"name": "Tesla", "remind_interval_h": 1},
+                            {"name": "Nvidia", "receiver_mail": "you@example.com", "remind_interval_h": 1},
+                        ],
+                    }
+                ],
+            }
+        )
+
+        self.assertEqual(
+            [(w.name, w.receiver_mail, w.remind_interval_h, w.stocks) for w in plan.watchlists],
+            [
+                ("tech", "me@example.com", 24, ["Apple"]),
+                ("tech.me@example.com.1h", "me@example.com", 1, ["Tesla"]),
+                ("tech.you@example.com.1h", "you@example.com", 1, ["Nvidia"]),
+            ],
+        )
+        self.assertEqual(len(plan.alerts), 1)
+
+    def test_invalid_configs(self):
+        with self.assertRaises(ValueError):
+            compile_plan({"watchlist": []})
+        with self.assertRaises(ValueError):
+            compile_plan({"defaults": {"remind_interval": 1}})
+        with self.assertRaises(ValueError):
+            compile_plan({"watchlists": [{"name": "a", "receiver": "me@example.com"}]})
+        with self.assertRaises(ValueError):
+            compile_plan({"watchlists": [{"stocks": [{"name": "Apple", "remind_interval": 1}]}]})
+        for alert_type in ("BaseAlert", "IndicatorAlert"):
+            with self.assertRaises(ValueError):
+                compile_plan({"watchlists": [{"stocks": [{"name": "Apple", "alert": {"type": alert_type}}]}]})
+        with self.assertRaises(ValueError):
+            compile_plan({"watchlists": [{"name": "a"}, {"name": "a"}]})
+        with self.assertRaises(ValueError):
+            compile_plan({"watchlists": [{"stocks": [{"name": "Apple", "alert": {"type": "Unknown"}}]}]})
+        with self.assertRaises(ValueError):
+            compile_plan(
+                {
+                    "watchlists": [
+                        {"stocks": [{"name": "Apple", "price_levels": [{"type": "NoAlert"}]}]},
+                    ]
+                }
+            )
+
+    def test_load_config(self):
+        (self.path / "alerts.json").write_text(json.dumps(CONFIG))
+        (self.path / "alerts.toml").write_text(TOML_CONFIG)
+        (self.path / "alerts.yaml").write_text(YAML_CONFIG)
+
+        self.assertEqual(load_config(self.path / "alerts.json"), CONFIG)
+        for suffix in (".toml", ".yaml"):
+            plan = compile_plan(load_config(self.path / f"alerts{suffix}"))
+            self.assertEqual(len(plan.alerts), 1)
+            self.assertEqual([list(watchlist.alerts) for watchlist in plan.watchlists], [["Apple"]])
+        self.assertEqual(compile_plan(load_config(self.path / "alerts.toml")).watchlists[0].remind_interval_h, 12)
+
+        with self.assertRaises(ValueError):
+            load_config(self.path / "tech.txt")
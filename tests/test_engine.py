@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from stock_alert.engine import EvaluationEngine
+
+
+def test_map_runs_tasks_concurrently():
+    engine = EvaluationEngine(max_workers=4, timeout_s=5)
+    barrier = threading.Barrier(4, timeout=2)
+
+    # the barrier is only passed if all four tasks run at the same time
+    results, errors = engine.map(lambda key: (barrier.wait(), key.lower())[1], ["A", "B", "C", "D"])
+
+    assert results == {"A": "a", "B": "b", "C": "c", "D": "d"}
+    assert errors == {}
+    engine.shutdown()
+
+
+def test_map_collects_errors_and_timeouts():
+    engine = EvaluationEngine(max_workers=2, timeout_s=0.2)
+
+    def task(key: str) -> str:
+        if key == "ERR":
+            raise ValueError("bad symbol")
+        if key == "SLOW":
+            time.sleep(1)
+        return key
+
+    results, errors = engine.map(task, ["OK", "ERR", "SLOW"])
+
+    assert results == {"OK": "OK"}
+    assert isinstance(errors["ERR"], ValueError)
+    assert isinstance(errors["SLOW"], TimeoutError)
+    engine.shutdown()
+
+
+def test_map_times_out_each_key_on_its_own():
+    engine = EvaluationEngine(max_workers=2, timeout_s=0.3)
+
+    def task(key: str) -> str:
+        time.sleep(1.5 if key == "SLOW" else 0.1)
+        return key
+
+    # the fast keys take longer than the deadline of the engine in total, but each of them is within its own timeout
+    keys = ["SLOW"] + [f"K{idx}" for idx in range(8)]
+    results, errors = engine.map(task, keys, timeout_per_key_s=0.5)
+
+    assert sorted(results) == keys[1:]
+    assert list(errors) == ["SLOW"]
+    assert isinstance(errors["SLOW"], TimeoutError)
+    engine.shutdown()
+
+
+def test_map_times_out_queued_keys_if_all_workers_are_stuck():
+    engine = EvaluationEngine(max_workers=1, timeout_s=5)
+
+    start = time.monotonic()
+    results, errors = engine.map(lambda key: time.sleep(2), ["SLOW", "QUEUED"], timeout_per_key_s=0.3)
+
+    assert results == {}
+    assert sorted(errors) == ["QUEUED", "SLOW"]
+    assert time.monotonic() - start < 1.5
+    engine.shutdown()
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        EvaluationEngine(max_workers=0)
@@ -0,0 +1,185 @@
+import logging
+import threading
+import urllib.error
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from stock_alert.gateway import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitedError,
+    RateLimitLog,
+    RequestGateway,
+    TokenBucket,
+    is_rate_limited,
+    is_retriable,
+)
+from stock_alert.market_data import fetch_history_batch
+
+
+def http_error(code: int) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError("http://yahoo", code, "error", {}, None)  # type: ignore[arg-type]
+
+
+class YFRateLimitError(Exception):
+    pass
+
+
+def test_error_classification():
+    assert is_rate_limited(http_error(429))
+    assert is_rate_limited(YFRateLimitError())
+    assert is_rate_limited(RateLimitedError())
+    assert not is_rate_limited(http_error(500))
+
+    assert is_retriable(http_error(429))
+    assert is_retriable(http_error(503))
+    assert is_retriable(ConnectionError("reset"))
+    assert is_retriable(TimeoutError())
+    assert not is_retriable(http_error(404))
+    assert not is_retriable(KeyError("close"))
+
+
+def test_token_bucket_waits_for_tokens():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+
+    # the third token is added after 0.1 seconds
+    assert 0.05 < bucket.acquire() < 0.5
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=10)
+    with patch("stock_alert.gateway.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    # after the timeout a single trial request is let through
+    with patch("stock_alert.gateway.time.monotonic", return_value=111.0):
+        assert breaker.state == "half-open"
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+    with patch("stock_alert.gateway.time.monotonic", return_value=122.0):
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow()
+
+
+class TestRequestGateway(TestCase):
+    def setUp(self) -> None:
+        self.gateway = RequestGateway(max_rate=1000, burst=1000, max_retries=2, backoff_s=0, failure_threshold=3)
+
+    def test_retries_retriable_errors(self):
+        request = MagicMock(side_effect=[ConnectionError("reset"), http_error(503), "quotes"])
+        self.assertEqual(self.gateway.call(request, "AAPL", timeout=1), "quotes")
+        self.assertEqual(request.call_count, 3)
+        request.assert_called_with("AAPL", timeout=1)
+
+    def test_does_not_retry_client_errors(self):
+        request = MagicMock(side_effect=http_error(404))
+        with self.assertRaises(urllib.error.HTTPError):
+            self.gateway.call(request)
+        request.assert_called_once()
+
+    def test_rate_limits_halve_the_rate(self):
+        request = MagicMock(side_effect=[http_error(429), http_error(429), "quotes"])
+        self.assertEqual(self.gateway.call(request), "quotes")
+        # two halvings, then the success raises it by increase / rate
+        self.assertAlmostEqual(self.gateway.rate, 250 + 1 / 250)
+
+        for _ in range(10):
+            self.gateway.call(MagicMock())
+        self.assertGreater(self.gateway.rate, 250.04)
+
+        self.gateway.bucket.rate = self.gateway.max_rate
+        self.gateway.speed_up()
+        self.assertEqual(self.gateway.rate, self.gateway.max_rate)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        request = MagicMock(side_effect=ConnectionError("reset"))
+        with self.assertRaises(ConnectionError):
+            self.gateway.call(request)
+        # the third failure opened the circuit, no more requests are sent
+        self.assertEqual(request.call_count, 3)
+        with self.assertRaises(CircuitOpenError):
+            self.gateway.call(request)
+        self.assertEqual(request.call_count, 3)
+
+    def test_deduplicates_requests_in_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def request() -> str:
+            started.set()
+            release.wait(5)
+            return "quotes"
+
+        mock_request = MagicMock(side_effect=request)
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.gateway.call(mock_request, key="AAPL")))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(self.gateway.call(mock_request, key="AAPL")))
+        follower.start()
+        # the follower blocks on the leader's request
+        follower.join(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(results, ["quotes", "quotes"])
+        mock_request.assert_called_once()
+        # once it is done, the request is sent again
+        self.gateway.call(mock_request, key="AAPL")
+        self.assertEqual(mock_request.call_count, 2)
+
+
+def test_rate_limit_log_only_sees_the_current_thread():
+    logger = logging.getLogger("yfinance")
+    with RateLimitLog() as log:
+        thread = threading.Thread(target=lambda: logger.error("['AAPL']: YFRateLimitError('Too Many Requests.')"))
+        thread.start()
+        thread.join()
+        assert not log.rate_limited
+        logger.error("['AAPL']: YFRateLimitError('Too Many Requests.')")
+    assert log.rate_limited
+    assert log not in logger.handlers
+
+
+def test_rate_limited_downloads_are_retried():
+    frame = pd.DataFrame(
+        {("A", "Open"): [1.0], ("A", "Close"): [2.0]}, index=pd.DatetimeIndex(["2023-05-02 09:30"], tz="UTC")
+    )
+
+    def download(chunk, **_):
+        if download.calls == 0:
+            logging.getLogger("yfinance").error("['A']: YFRateLimitError('Too Many Requests. Rate limited.')")
+        download.calls += 1
+        return frame
+
+    download.calls = 0
+    gateway = RequestGateway(max_rate=1000, burst=1000, backoff_s=0)
+    with patch("yfinance.download", side_effect=download):
+        histories = fetch_history_batch(["A"], gateway=gateway)
+
+    assert download.calls == 2
+    assert list(histories) == ["A"]
+    assert gateway.rate < 1000
+
+
+def test_failing_downloads_are_left_out(capsys):
+    gateway = RequestGateway(max_rate=1000, burst=1000, max_retries=0)
+    gateway.breaker.opened_at = float("inf")
+    with patch("yfinance.download") as mock_download:
+        assert fetch_history_batch(["A", "B"], gateway=gateway) == {}
+    mock_download.assert_not_called()
+    assert "Error while downloading 2 symbols" in capsys.readouterr().out
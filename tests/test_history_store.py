@@ -0,0 +1,98 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from stock_alert.history_store import HistoryStore
+
+
+def make_daily_bars(start: str, closes: list[float]) -> pd.DataFrame:
+    index = pd.date_range(start, periods=len(closes), freq="D", tz="America/New_York")
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 100.0}, index=index)
+
+
+class TestHistoryStore(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(Path(self.tmp_dir.name))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_read_of_an_unknown_symbol_is_empty(self):
+        self.assertEqual(len(self.store.read("AAPL")), 0)
+        self.assertIsNone(self.store.last_timestamp("AAPL"))
+        self.assertEqual(self.store.symbols("1d"), [])
+
+    def test_append_only_adds_new_bars_and_replaces_the_last_one(self):
+        self.assertEqual(self.store.append("AAPL", "1d", make_daily_bars("2023-05-01", [1.0, 2.0, 3.0])), 3)
+        # the last stored bar was still forming, the older ones are already stored
+        self.assertEqual(self.store.append("AAPL", "1d", make_daily_bars("2023-05-02", [2.0, 3.5, 4.0])), 1)
+
+        bars = self.store.read("AAPL")
+        np.testing.assert_array_equal(bars.close, [1.0, 2.0, 3.5, 4.0])
+        self.assertEqual(self.store.last_timestamp("AAPL"), pd.Timestamp("2023-05-04", tz="America/New_York"))
+        self.assertEqual(self.store.symbols("1d"), ["AAPL"])
+
+    def test_slices_are_views_of_the_files(self):
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-01", [1.0, 2.0, 3.0, 4.0]))
+
+        bars = self.store.read("AAPL")
+        window = bars.between(pd.Timestamp("2023-05-02", tz="America/New_York"), pd.Timestamp("2023-05-04", tz="UTC"))
+        np.testing.assert_array_equal(window.close, [2.0, 3.0])
+        self.assertIsInstance(bars.close, np.memmap)
+        self.assertTrue(np.shares_memory(window.close, bars.close))
+        # the memory maps are reused until the next append
+        self.assertIs(self.store.read("AAPL"), bars)
+
+        frame = window.to_frame()
+        self.assertEqual(list(frame.columns), ["Open", "High", "Low", "Close", "Volume"])
+        self.assertEqual(frame.index[0], pd.Timestamp("2023-05-02", tz="America/New_York"))
+
+    def test_interrupted_append_is_cut_off(self):
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-01", [1.0, 2.0]))
+        # an append that died after writing the close prices but before the timestamps
+        with open(self.store.directory("AAPL", "1d") / "close", "ab") as file:
+            file.write(np.array([9.0]).tobytes())
+
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-03", [3.0]))
+
+        np.testing.assert_array_equal(self.store.read("AAPL").close, [1.0, 2.0, 3.0])
+
+    def test_partially_written_timestamp_is_cut_off(self):
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-01", [1.0, 2.0]))
+        directory = self.store.directory("AAPL", "1d")
+        # an append that died after writing all prices and half of the timestamp
+        for column in ("open", "high", "low", "close", "volume"):
+            with open(directory / column, "ab") as file:
+                file.write(np.array([9.0]).tobytes())
+        with open(directory / "timestamp", "ab") as file:
+            file.write(np.array([7], dtype="<i8").tobytes()[:4])
+
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-03", [3.0]))
+
+        bars = self.store.read("AAPL")
+        np.testing.assert_array_equal(bars.close, [1.0, 2.0, 3.0])
+        self.assertEqual(bars.to_frame().index[-1], pd.Timestamp("2023-05-03", tz="America/New_York"))
+        self.assertEqual({(directory / column).stat().st_size for column in ("timestamp", "close")}, {3 * 8})
+
+    def test_backfill_fetches_since_the_last_bar(self):
+        self.store.append("AAPL", "1d", make_daily_bars("2023-05-01", [1.0, 2.0]))
+        responses = [
+            {"AAPL": make_daily_bars("2023-05-02", [2.5, 3.0])},
+            {"TSLA": make_daily_bars("2023-05-01", [5.0, 6.0, 7.0])},
+        ]
+
+        with patch("stock_alert.history_store.fetch_history_batch", side_effect=responses) as mock_fetch:
+            self.assertEqual(self.store.backfill(["AAPL", "TSLA"], chunk_size=10), 4)
+
+        self.assertEqual(mock_fetch.call_args_list[0].args[0], ["AAPL"])
+        self.assertEqual(
+            mock_fetch.call_args_list[0].kwargs["start"], pd.Timestamp("2023-05-02", tz="America/New_York")
+        )
+        self.assertIsNone(mock_fetch.call_args_list[1].kwargs["start"])
+        np.testing.assert_array_equal(self.store.read("AAPL").close, [1.0, 2.5, 3.0])
+        np.testing.assert_array_equal(self.store.read("TSLA").close, [5.0, 6.0, 7.0])
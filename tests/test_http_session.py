@@ -0,0 +1,25 @@
+import sys
+from unittest.mock import patch
+
+from stock_alert import http_session
+from stock_alert.http_session import get_session, new_session
+
+
+def test_get_session_is_shared():
+    with patch.object(http_session, "_session", None), patch(
+        "stock_alert.http_session.new_session", side_effect=object
+    ) as mock_new_session:
+        session = get_session()
+        assert get_session() is session
+    mock_new_session.assert_called_once()
+
+
+def test_requests_fallback_pools_connections():
+    # without curl_cffi, requests is used
+    with patch.dict(sys.modules, {"curl_cffi": None}):
+        session = new_session(pool_size=4)
+
+    adapter = session.get_adapter("https://query2.finance.yahoo.com")
+    assert adapter._pool_maxsize == 4
+    assert "gzip" in session.headers["Accept-Encoding"]
+    assert session.headers["Connection"] == "keep-alive"
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alert.indicators import ExponentialAverage, RelativeStrength, RollingWindow, grow
+
+PRICES = np.array([44.3, 44.1, 44.2, 43.6, 44.3, 44.8, 45.1, 45.4, 45.8, 46.1, 45.9, 46.2, 45.6, 46.3, 46.3, 46.0])
+
+
+def push_all(indicator, series: np.ndarray) -> None:
+    # two independent series, the second one pushed in reverse order
+    rows = np.array([0, 1])
+    for first, second in zip(series, series[::-1]):
+        indicator.push(rows, np.array([first, second]))
+
+
+def test_grow():
+    np.testing.assert_array_equal(grow(np.array([1.0, 2.0]), 4, np.nan), [1.0, 2.0, np.nan, np.nan])
+    np.testing.assert_array_equal(grow(np.zeros((1, 3)), 2).shape, (2, 3))
+
+
+def test_rolling_window_matches_pandas():
+    window = RollingWindow(5, rows=2)
+    push_all(window, PRICES)
+
+    for row, series in enumerate([PRICES, PRICES[::-1]]):
+        rolling = pd.Series(series).rolling(5)
+        assert window.mean(np.array([row]))[0] == pytest.approx(rolling.mean().iat[-1])
+        assert window.std(np.array([row]))[0] == pytest.approx(rolling.std(ddof=0).iat[-1])
+    assert window.ready(np.array([0, 1])).all()
+
+    with pytest.raises(ValueError):
+        RollingWindow(0)
+
+
+def test_rolling_window_is_not_ready_before_it_is_full():
+    window = RollingWindow(3, rows=1)
+    window.push(np.array([0]), np.array([1.0]))
+    assert not window.ready(np.array([0]))[0]
+
+
+def test_exponential_average_matches_pandas():
+    average = ExponentialAverage.from_span(4, rows=2)
+    push_all(average, PRICES)
+
+    expected = pd.Series(PRICES).ewm(span=4, adjust=False).mean().iat[-1]
+    assert average.mean(np.array([0]))[0] == pytest.approx(expected)
+    assert average.ready(np.array([0, 1])).all()
+
+
+def test_relative_strength_matches_wilder():
+    rsi = RelativeStrength(14, rows=2)
+    push_all(rsi, PRICES)
+
+    changes = pd.Series(PRICES).diff().dropna()
+    gains = changes.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean().iat[-1]
+    losses = (-changes).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean().iat[-1]
+    assert rsi.value(np.array([0]))[0] == pytest.approx(100 - 100 / (1 + gains / losses))
+    assert rsi.ready(np.array([0]))[0]
+
+
+def test_relative_strength_without_losses():
+    rsi = RelativeStrength(2, rows=1)
+    for price in [1.0, 2.0, 3.0]:
+        rsi.push(np.array([0]), np.array([price]))
+    assert rsi.value(np.array([0]))[0] == 100
+
+
+@pytest.mark.parametrize(
+    "make_indicator",
+    [
+        lambda: RollingWindow(5, rows=2),
+        lambda: ExponentialAverage.from_span(4, rows=2),
+        lambda: RelativeStrength(5, rows=2),
+    ],
+)
+def test_nan_values_are_skipped(make_indicator):
+    indicator = make_indicator()
+    with_gaps = make_indicator()
+    push_all(indicator, PRICES)
+    rows = np.array([0, 1])
+    for first, second in zip(PRICES, PRICES[::-1]):
+        # a missing value of one row neither changes it nor holds back the other one
+        with_gaps.push(rows, np.array([first, np.nan]))
+        with_gaps.push(rows, np.array([np.nan, second]))
+        with_gaps.push(rows, np.array([np.nan, np.nan]))
+
+    for name in ("mean", "std", "value"):
+        if hasattr(indicator, name):
+            np.testing.assert_allclose(getattr(with_gaps, name)(rows), getattr(indicator, name)(rows))
+    np.testing.assert_array_equal(with_gaps.ready(rows), indicator.ready(rows))
@@ -1,4 +1,8 @@
 import argparse
+import contextlib
+import io
+import subprocess
+import sys
 import tempfile
 import unittest
 from pathlib import Path
@@ -34,6 +38,56 @@ class TestParseArgs(unittest.TestCase):
             result = parse_args(args)
             self.assertIsInstance(result, argparse.Namespace)
             self.assertEqual(result.path_stock_list, file_path.as_posix())
+            self.assertFalse(result.market_hours)
+
+            result = parse_args(args + ["--market-hours"])
+            self.assertTrue(result.market_hours)
+
+    def test_users_file(self) -> None:
+        """
+        Tests that a users file can be given instead of a single stock list.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / "users.json"
+            file_path.touch()
+            result = parse_args(["--users", file_path.as_posix()])
+            self.assertEqual(result.users, file_path.as_posix())
+            self.assertIsNone(result.path_stock_list)
+
+        with self.assertRaises(FileNotFoundError):
+            parse_args(["--users", "non-existent-file.json"])
+
+    def test_config_file(self) -> None:
+        """
+        Tests that an alert config can be given instead of a single stock list.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / "alerts.yaml"
+            file_path.touch()
+            result = parse_args(["--config", file_path.as_posix()])
+            self.assertEqual(result.config, file_path.as_posix())
+
+        with self.assertRaises(FileNotFoundError):
+            parse_args(["--config", "non-existent-file.yaml"])
+
+    def test_workers_reject_the_options_they_do_not_support(self) -> None:
+        """
+        Tests that the options the worker processes would ignore can not be combined with `--workers`.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / "stocks.txt"
+            file_path.touch()
+            args = ["--path-stock-list", file_path.as_posix(), "--workers", "2"]
+            self.assertEqual(parse_args(args).workers, 2)
+
+            for option in (
+                ["--users", file_path.as_posix()],
+                ["--market-hours"],
+                ["--stream"],
+                ["--history-store", tmp_dir],
+            ):
+                with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                    parse_args(args + option)
 
     def test_invalid_file_path(self) -> None:
         """
@@ -50,3 +104,12 @@ class TestParseArgs(unittest.TestCase):
         args = ["--path-stock-list", "non-existent-file.txt", "--invalid-option", "invalid-value"]
         with self.assertRaises(argparse.ArgumentError):
             parse_args(args)
+
+
+def test_heavy_dependencies_are_imported_lazily():
+    """
+    Tests that importing the CLI neither loads yfinance nor the Google API client.
+    """
+    script = "import sys, stock_alert.main; print(sorted({'yfinance', 'googleapiclient'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True, text=True).stdout
+    assert output.strip() == "[]"
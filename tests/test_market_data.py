@@ -0,0 +1,255 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alert.gateway import RequestGateway
+from stock_alert.market_data import (
+    IntradayBuffer,
+    MarketDataCache,
+    PriceMatrix,
+    chunk_symbols,
+    fetch_history_batch,
+    group_by_day,
+    slice_history,
+)
+from tests.conftest import make_bars
+
+
+def make_download_frame(symbols: list[str]) -> pd.DataFrame:
+    """
+    Build a frame shaped like the result of yfinance.download(..., group_by="ticker").
+    """
+    index = pd.date_range("2023-05-02 09:30", periods=3, freq="5min")
+    columns = pd.MultiIndex.from_product([symbols, ["Open", "Close"]])
+    data = np.arange(len(index) * len(columns), dtype=float).reshape(len(index), len(columns))
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def test_chunk_symbols():
+    assert chunk_symbols(["A", "B", "C", "D", "E"], 2) == [["A", "B"], ["C", "D"], ["E"]]
+    assert chunk_symbols([], 2) == []
+
+    with pytest.raises(ValueError):
+        chunk_symbols(["A"], 0)
+
+
+def test_slice_history():
+    df = make_download_frame(["AAPL", "MSFT"])
+    # MSFT has no data at all
+    df.loc[:, "MSFT"] = np.nan
+
+    histories = slice_history(df, ["AAPL", "MSFT", "TSLA"])
+
+    assert list(histories) == ["AAPL"]
+    assert list(histories["AAPL"].columns) == ["Open", "Close"]
+    assert histories["AAPL"].iloc[0]["Open"] == 0.0
+    assert slice_history(pd.DataFrame(), ["AAPL"]) == {}
+
+
+def test_fetch_history_batch_one_download_per_chunk():
+    with patch("yfinance.download", side_effect=lambda chunk, **_: make_download_frame(chunk)) as mock_download:
+        histories = fetch_history_batch(["A", "B", "C"], chunk_size=2)
+
+    assert mock_download.call_count == 2
+    assert mock_download.call_args_list[0].args[0] == ["A", "B"]
+    assert mock_download.call_args_list[1].args[0] == ["C"]
+    assert sorted(histories) == ["A", "B", "C"]
+
+
+class TestMarketDataCache(TestCase):
+    def test_history_is_fetched_once_within_ttl(self):
+        cache = MarketDataCache(history_ttl_s=60)
+        ticker = MagicMock(ticker="AAPL")
+
+        with patch("stock_alert.market_data.time.time", return_value=1000.0):
+            first = cache.wrap(ticker).history(period="1d", interval="5m")
+            second = cache.wrap(ticker).history(period="1d", interval="5m")
+        self.assertIs(first, second)
+        ticker.history.assert_called_once_with(period="1d", interval="5m", timeout=10)
+
+        # a different interval is a different cache entry
+        with patch("stock_alert.market_data.time.time", return_value=1000.0):
+            cache.wrap(ticker).history(period="1d", interval="1m")
+        self.assertEqual(ticker.history.call_count, 2)
+
+        # the entry expires after the ttl
+        with patch("stock_alert.market_data.time.time", return_value=1060.0):
+            cache.wrap(ticker).history(period="1d", interval="5m")
+        self.assertEqual(ticker.history.call_count, 3)
+
+    def test_metadata_is_cached_for_the_day(self):
+        cache = MarketDataCache()
+        ticker = MagicMock(ticker="AAPL")
+        info_mock = PropertyMock(return_value={"longName": "Apple Inc."})
+        type(ticker).info = info_mock
+
+        noon = datetime(2023, 5, 2, 12).timestamp()
+        with patch("stock_alert.market_data.time.time", return_value=noon):
+            self.assertEqual(cache.wrap(ticker).info["longName"], "Apple Inc.")
+            self.assertEqual(cache.wrap(ticker).info["longName"], "Apple Inc.")
+        self.assertEqual(info_mock.call_count, 1)
+
+        with patch("stock_alert.market_data.time.time", return_value=noon + 24 * 3600):
+            cache.wrap(ticker).info
+        self.assertEqual(info_mock.call_count, 2)
+
+    def test_metadata_field_keeps_only_the_field(self):
+        cache = MarketDataCache()
+        ticker = MagicMock(ticker="AAPL")
+        info_mock = PropertyMock(return_value={"longName": "Apple Inc.", "sector": "Technology"})
+        type(ticker).info = info_mock
+
+        self.assertEqual(cache.wrap(ticker).field("info", "longName"), "Apple Inc.")
+        self.assertEqual(cache.wrap(ticker).field("info", "longName"), "Apple Inc.")
+        self.assertEqual(info_mock.call_count, 1)
+        self.assertEqual(cache.metadata_field(ticker, "info", "sector"), "Technology")
+        with self.assertRaises(KeyError):
+            cache.wrap(ticker).field("info", "website")
+        self.assertEqual(info_mock.call_count, 3)
+        with self.assertRaises(KeyError):
+            cache.wrap(ticker).field("info", "website")
+        self.assertEqual(info_mock.call_count, 3)
+
+    def test_fast_info_fields_are_read_inside_the_gateway(self):
+        cache = MarketDataCache(gateway=RequestGateway())
+        events = []
+        request = cache.gateway.call
+
+        def call(*args, **kwargs):
+            events.append("enter")
+            try:
+                return request(*args, **kwargs)
+            finally:
+                events.append("exit")
+
+        class FastInfo:
+            # like yfinance, the request is only sent once a field is read
+            def __getitem__(self, field):
+                events.append(field)
+                return {"currency": "USD"}[field]
+
+        ticker = MagicMock(ticker="AAPL", fast_info=FastInfo())
+        with patch.object(cache.gateway, "call", side_effect=call):
+            self.assertEqual(cache.wrap(ticker).fast_info["currency"], "USD")
+            self.assertEqual(cache.wrap(ticker).field("fast_info", "currency"), "USD")
+            self.assertIsNone(cache.wrap(ticker).fast_info.get("exchange"))
+
+        self.assertEqual(events, ["enter", "currency", "exit", "enter", "exchange", "exit"])
+
+    def test_fetch_history_batch_only_downloads_missing_symbols(self):
+        cache = MarketDataCache()
+        cache.store_history("A", "1d", "5m", make_download_frame(["A"])["A"])
+
+        with patch("yfinance.download", side_effect=lambda chunk, **_: make_download_frame(chunk)) as mock_download:
+            histories = cache.fetch_history_batch(["A", "B"])
+
+        self.assertEqual(mock_download.call_args.args[0], ["B"])
+        self.assertEqual(sorted(histories), ["A", "B"])
+
+
+class TestIntradayBuffer(TestCase):
+    def test_extend_replaces_the_forming_bar_and_appends_new_ones(self):
+        buffer = IntradayBuffer()
+        buffer.extend(make_bars([1.0, 2.0, 3.0]))
+        buffer.extend(make_bars([3.5, 4.0], "2023-05-02 09:40"))
+
+        self.assertEqual(list(buffer.bars["Close"]), [1.0, 2.0, 3.5, 4.0])
+        self.assertEqual(buffer.last_timestamp, pd.Timestamp("2023-05-02 09:45", tz="America/New_York"))
+
+    def test_extend_rolls_over_to_a_new_session(self):
+        buffer = IntradayBuffer()
+        buffer.extend(make_bars([1.0, 2.0], "2023-05-02 15:50"))
+        # the fetch since the last bar returns the end of yesterday's session and the opening of today's
+        buffer.extend(pd.concat([make_bars([2.5], "2023-05-02 15:55"), make_bars([5.0], "2023-05-03 09:30")]))
+
+        self.assertEqual(list(buffer.bars["Close"]), [5.0])
+
+    def test_add_tick_aggregates_ticks_into_bars(self):
+        buffer = IntradayBuffer()
+        buffer.extend(make_bars([1.0, 2.0]))
+        # 13:37 UTC is 09:37 in New York, within the forming 09:35 bar
+        buffer.add_tick(pd.Timestamp("2023-05-02 13:37", tz="UTC"), 2.5, 10)
+        buffer.add_tick(pd.Timestamp("2023-05-02 13:41", tz="UTC"), 1.5, 5)
+        buffer.add_tick(pd.Timestamp("2023-05-02 13:42", tz="UTC"), 1.8, 5)
+        # a late tick of a finished bar is dropped
+        buffer.add_tick(pd.Timestamp("2023-05-02 13:38", tz="UTC"), 9.0, 5)
+
+        self.assertEqual(list(buffer.bars["Close"]), [1.0, 2.5, 1.8])
+        self.assertEqual(buffer.bars["Open"].iat[-1], 1.5)
+        self.assertEqual(buffer.bars["Low"].iat[-1], 1.5)
+        self.assertEqual(buffer.bars["Volume"].iat[-1], 10)
+        self.assertEqual(buffer.last_timestamp, pd.Timestamp("2023-05-02 09:40", tz="America/New_York"))
+
+    def test_add_tick_starts_a_new_session(self):
+        buffer = IntradayBuffer()
+        buffer.extend(make_bars([1.0, 2.0], "2023-05-02 15:50"))
+        buffer.add_tick(pd.Timestamp("2023-05-03 13:31", tz="UTC"), 5.0)
+
+        self.assertEqual(list(buffer.bars["Close"]), [5.0])
+        self.assertEqual(buffer.last_timestamp, pd.Timestamp("2023-05-03 09:30", tz="America/New_York"))
+
+
+class TestFetchIntraday(TestCase):
+    def test_bars_are_converted_to_the_time_zone_of_their_exchange(self):
+        cache = MarketDataCache(history_ttl_s=0)
+        cache.timezones["7203.T"] = "Asia/Tokyo"
+        # a download of mostly US stocks is in New York time, where the Tokyo session crosses midnight
+        bars = make_bars([1.0, 2.0, 3.0, 4.0], "2023-05-01 23:50")
+        with patch("stock_alert.market_data.fetch_history_batch", return_value={"7203.T": bars, "AAPL": bars}):
+            histories = cache.fetch_intraday(["7203.T", "AAPL"])
+
+        self.assertEqual(list(histories["7203.T"]["Close"]), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(str(histories["7203.T"].index.tz), "Asia/Tokyo")
+        # without a known time zone the bars before midnight are taken for the previous session
+        self.assertEqual(list(histories["AAPL"]["Close"]), [3.0, 4.0])
+
+        tick_bars = cache.add_tick("7203.T", pd.Timestamp("2023-05-02 04:15", tz="UTC"), 5.0)
+        self.assertEqual(list(tick_bars["Close"]), [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    def test_seeds_once_then_fetches_since_last_bar(self):
+        cache = MarketDataCache(history_ttl_s=0)
+        responses = [
+            {"A": make_bars([1.0, 2.0]), "B": make_bars([7.0])},
+            {"A": make_bars([1.0, 2.5, 3.0]), "B": make_bars([7.5, 8.0])},
+        ]
+        with patch("stock_alert.market_data.fetch_history_batch", side_effect=responses) as mock_fetch:
+            cache.fetch_intraday(["A", "B"])
+            histories = cache.fetch_intraday(["A", "B"])
+
+        self.assertIsNone(mock_fetch.call_args_list[0].kwargs["start"])
+        # A and B have different last bars of the same day, so they share a download from the earlier one
+        self.assertEqual(mock_fetch.call_count, 2)
+        self.assertEqual(mock_fetch.call_args_list[1].args[0], ["A", "B"])
+        self.assertEqual(
+            mock_fetch.call_args_list[1].kwargs["start"], pd.Timestamp("2023-05-02 09:30", tz="America/New_York")
+        )
+        self.assertEqual(list(histories["A"]["Close"]), [1.0, 2.5, 3.0])
+        self.assertEqual(list(histories["B"]["Close"]), [7.5, 8.0])
+
+
+def test_group_by_day():
+    last_timestamps = {
+        "A": pd.Timestamp("2023-05-02 15:55", tz="America/New_York"),
+        "B": None,
+        "C": pd.Timestamp("2023-05-02 09:30", tz="Europe/Berlin"),
+        "D": pd.Timestamp("2023-05-01 15:55", tz="America/New_York"),
+    }
+
+    assert group_by_day(last_timestamps) == {
+        last_timestamps["C"]: ["A", "C"],
+        None: ["B"],
+        last_timestamps["D"]: ["D"],
+    }
+
+
+def test_price_matrix_from_histories():
+    histories = {"A": pd.DataFrame({"Open": [10.0, 11.0], "Close": [10.5, 12.0]})}
+
+    prices = PriceMatrix.from_histories(["A", "B"], histories)
+
+    np.testing.assert_array_equal(prices.opening_prices, [10.0, np.nan])
+    np.testing.assert_array_equal(prices.latest_prices, [12.0, np.nan])
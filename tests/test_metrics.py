@@ -0,0 +1,62 @@
+import json
+import urllib.request
+from unittest import TestCase
+from unittest.mock import patch
+
+from stock_alert.metrics import Metrics
+
+
+class TestMetrics(TestCase):
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics()
+        metrics.increment("requests")
+        metrics.observe_fetch("AAPL", 0.1)
+        with metrics.time("fetch"):
+            pass
+
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "timings": {}, "fetch_latencies": {}})
+
+    def test_records_counters_timings_and_fetch_latencies(self):
+        metrics = Metrics(enabled=True)
+        metrics.increment("requests")
+        metrics.increment("requests", 2)
+        metrics.observe_fetch("AAPL", 0.25)
+        with patch("stock_alert.metrics.time.perf_counter", side_effect=[1.0, 1.5]):
+            with metrics.time("fetch"):
+                pass
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"], {"requests": 3})
+        self.assertEqual(snapshot["timings"]["fetch"], {"count": 1, "total_s": 0.5, "max_s": 0.5, "last_s": 0.5})
+        self.assertEqual(snapshot["timings"]["fetch_symbol"]["count"], 1)
+        self.assertEqual(snapshot["fetch_latencies"], {"AAPL": 0.25})
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["counters"], {})
+
+    def test_prometheus_format(self):
+        metrics = Metrics(enabled=True)
+        metrics.increment("cache_hits", 4)
+        metrics.observe("cycle", 2.0)
+        metrics.observe_fetch("AAPL", 0.5)
+
+        text = metrics.to_prometheus()
+
+        self.assertIn("stock_alert_cache_hits_total 4\n", text)
+        self.assertIn('stock_alert_phase_seconds_sum{phase="cycle"} 2.0\n', text)
+        self.assertIn('stock_alert_phase_seconds_count{phase="cycle"} 1\n', text)
+        self.assertIn('stock_alert_fetch_latency_seconds{symbol="AAPL"} 0.5\n', text)
+
+    def test_serve(self):
+        metrics = Metrics(enabled=True)
+        metrics.increment("requests")
+        server = metrics.serve(0)
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{base_url}/metrics.json") as response:
+                self.assertEqual(json.loads(response.read())["counters"], {"requests": 1})
+            with urllib.request.urlopen(f"{base_url}/metrics") as response:
+                self.assertIn(b"stock_alert_requests_total 1", response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
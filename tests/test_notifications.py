@@ -0,0 +1,63 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from stock_alert.notifications import Digest, Notification, NotificationQueue, make_digest
+
+
+def test_make_digest():
+    assert make_digest("me", [Notification("Apple", "up")]) == Digest("me", "Apple", "up")
+    assert make_digest("me", [Notification("Apple", "up"), Notification("Tesla", "down")]) == Digest(
+        "me", "2 stock alerts", "Apple:\nup\n\nTesla:\ndown"
+    )
+
+
+class TestNotificationQueue(TestCase):
+    def test_one_digest_per_receiver_and_flush(self):
+        send = MagicMock()
+        notifications = NotificationQueue(send=send)
+        notifications.add("me", "Apple", "up")
+        notifications.add("you", "Tesla", "down")
+        notifications.add("me", "Amazon", "down")
+        send.assert_not_called()
+
+        notifications.flush()
+        notifications.close()
+
+        self.assertEqual(send.call_args_list[0].args[0], Digest("me", "2 stock alerts", "Apple:\nup\n\nAmazon:\ndown"))
+        self.assertEqual(send.call_args_list[1].args[0], Digest("you", "Tesla", "down"))
+
+    def test_retries_with_backoff(self):
+        send = MagicMock(side_effect=[ConnectionError("reset"), ConnectionError("reset"), None])
+        notifications = NotificationQueue(send=send, max_retries=3, backoff_s=1)
+        notifications.add("me", "Apple", "up")
+
+        with patch("stock_alert.notifications.time.sleep") as mock_sleep:
+            notifications.close()
+
+        self.assertEqual(send.call_count, 3)
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        self.assertTrue(0.5 <= delays[0] <= 1.5)
+        self.assertTrue(1 <= delays[1] <= 3)
+
+    def test_gives_up_after_max_retries(self):
+        send = MagicMock(side_effect=ConnectionError("reset"))
+        notifications = NotificationQueue(send=send, max_retries=2, backoff_s=0)
+        notifications.add("me", "Apple", "up")
+
+        notifications.close()
+
+        self.assertEqual(send.call_count, 3)
+
+    def test_gmail_client_is_built_once(self):
+        notifications = NotificationQueue()
+        with patch("stock_alert.quickstart.build_service") as mock_build_service, patch(
+            "stock_alert.quickstart.send_mail"
+        ) as mock_send_mail:
+            notifications.add("me", "Apple", "up")
+            notifications.flush()
+            notifications.add("me", "Tesla", "down")
+            notifications.close()
+
+        mock_build_service.assert_called_once_with()
+        self.assertEqual(mock_send_mail.call_count, 2)
+        self.assertIs(mock_send_mail.call_args.kwargs["service"], mock_build_service.return_value)
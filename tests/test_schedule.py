@@ -0,0 +1,59 @@
+from datetime import date, datetime, time
+from unittest import TestCase
+
+from stock_alert.schedule import UTC, MarketScheduler, TradingSession
+
+
+def timestamp(*args: int) -> float:
+    return datetime(*args, tzinfo=UTC).timestamp()
+
+
+class TestTradingSession(TestCase):
+    def setUp(self) -> None:
+        self.session = TradingSession("America/New_York", time(9, 30), time(16), holidays=[date(2023, 7, 4)])
+
+    def test_is_open(self):
+        # 2023-05-02 is a tuesday, New York is UTC-4
+        self.assertTrue(self.session.is_open(datetime(2023, 5, 2, 13, 30, tzinfo=UTC)))
+        self.assertFalse(self.session.is_open(datetime(2023, 5, 2, 13, 29, tzinfo=UTC)))
+        self.assertFalse(self.session.is_open(datetime(2023, 5, 2, 20, 0, tzinfo=UTC)))
+        # saturday and a holiday
+        self.assertFalse(self.session.is_open(datetime(2023, 5, 6, 15, 0, tzinfo=UTC)))
+        self.assertFalse(self.session.is_open(datetime(2023, 7, 4, 15, 0, tzinfo=UTC)))
+
+    def test_next_open_skips_weekend(self):
+        friday_evening = datetime(2023, 5, 5, 22, 0, tzinfo=UTC)
+        self.assertEqual(self.session.next_open(friday_evening), datetime(2023, 5, 8, 13, 30, tzinfo=UTC))
+
+    def test_next_open_while_open(self):
+        now = datetime(2023, 5, 2, 15, 0, tzinfo=UTC)
+        self.assertEqual(self.session.next_open(now), now)
+
+
+class TestMarketScheduler(TestCase):
+    def test_due_symbols_only_polls_open_exchanges(self):
+        scheduler = MarketScheduler(default_interval_s=60)
+        symbol_exchanges = {"AAPL": "NMS", "SAP.DE": "GER", "BTC-USD": "CCC"}
+
+        # 10:00 in Berlin, New York is still closed
+        self.assertEqual(scheduler.due_symbols(symbol_exchanges, timestamp(2023, 5, 2, 8)), ["SAP.DE", "BTC-USD"])
+        # within the poll interval nothing is due
+        self.assertEqual(scheduler.due_symbols(symbol_exchanges, timestamp(2023, 5, 2, 8, 0, 30)), [])
+
+    def test_poll_interval_per_exchange(self):
+        scheduler = MarketScheduler(default_interval_s=60, poll_intervals_s={"GER": 300})
+        symbol_exchanges = {"AAPL": "NMS", "SAP.DE": "GER"}
+
+        now = timestamp(2023, 5, 2, 14)
+        self.assertEqual(scheduler.due_symbols(symbol_exchanges, now), ["AAPL", "SAP.DE"])
+        self.assertEqual(scheduler.due_symbols(symbol_exchanges, now + 60), ["AAPL"])
+        self.assertEqual(scheduler.seconds_until_next_poll(symbol_exchanges.values(), now + 60), 60)
+
+    def test_sleeps_until_next_session(self):
+        scheduler = MarketScheduler(default_interval_s=60)
+        symbol_exchanges = {"AAPL": "NMS", "SAP.DE": "GER"}
+
+        # saturday noon UTC, the next session to open is Xetra on monday at 9:00 in Berlin, which is 7:00 UTC
+        now = timestamp(2023, 5, 6, 12)
+        self.assertEqual(scheduler.due_symbols(symbol_exchanges, now), [])
+        self.assertEqual(scheduler.seconds_until_next_poll(symbol_exchanges.values(), now), 43 * 3600)
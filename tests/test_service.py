@@ -0,0 +1,178 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from stock_alert.alerts import AbsolutHigherThan, AlertRelativeDailyChange
+from stock_alert.class_stock_alert import StockAlert
+from stock_alert.notifications import Digest
+from stock_alert.service import AlertService, make_alert
+from tests.conftest import make_bars
+
+
+def test_make_alert():
+    alert = make_alert({"type": "AbsolutHigherThan", "threshold": 100})
+    assert isinstance(alert, AbsolutHigherThan)
+    assert alert.threshold == 100
+
+    with pytest.raises(ValueError):
+        make_alert({"type": "ReminderHandler"})
+
+
+class TestAlertService(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        (self.path / "alice.txt").write_text("AAPL\nTSLA\n")
+        (self.path / "bob.txt").write_text("TSLA\nAMZN\n")
+        # the stock names are the symbols, so nothing has to be looked up
+        self.patch_resolve = patch(
+            "stock_alert.class_stock_alert.resolve_stock_symbols", side_effect=lambda names, cache: names
+        )
+        self.patch_resolve.start()
+        # nothing is looked up on the web, the time zones are left as downloaded
+        self.patch_timezones = patch.object(StockAlert, "get_timezones", return_value={})
+        self.patch_timezones.start()
+        self.service = AlertService(chunk_size=10)
+        self.service.data_plane.notifications.send = MagicMock()
+
+    def tearDown(self) -> None:
+        self.patch_resolve.stop()
+        self.patch_timezones.stop()
+        self.tmp_dir.cleanup()
+
+    def test_users_share_the_tickers(self):
+        alice = self.service.add_user(self.path / "alice.txt", "alice@example.com")
+        bob = self.service.add_user(self.path / "bob.txt", "bob@example.com")
+
+        # no ticker is created before it is used
+        self.assertEqual(len(self.service.data_plane.tickers), 0)
+        self.assertEqual(list(alice.stock_tickers), ["AAPL", "TSLA"])
+        ticker = alice.stock_tickers["TSLA"]
+        self.assertIs(ticker, bob.stock_tickers["TSLA"])
+        self.assertIs(alice.market_data, bob.market_data)
+        self.assertEqual(list(self.service.data_plane.tickers), ["TSLA"])
+        # the ticker is not kept once nobody uses it anymore
+        del ticker
+        self.assertEqual(len(self.service.data_plane.tickers), 0)
+        with self.assertRaises(KeyError):
+            alice.stock_tickers["AMZN"]
+
+    def test_run_cycle_fetches_every_symbol_once(self):
+        alice = self.service.add_user(self.path / "alice.txt", "alice@example.com")
+        bob = self.service.add_user(self.path / "bob.txt", "bob@example.com")
+        alice.configure_same_alert_for_all(AbsolutHigherThan(100))
+        bob.configure_alert("TSLA", AbsolutHigherThan(200))
+        histories = {"AAPL": make_bars([101.0]), "TSLA": make_bars([150.0])}
+
+        with patch("stock_alert.market_data.fetch_history_batch", return_value=histories) as mock_fetch, patch(
+            "stock_alert.class_stock_alert.StockAlert.get_stock_name", side_effect=lambda symbol, ticker: symbol
+        ):
+            self.assertTrue(self.service.run_cycle())
+
+        # AMZN has no alert, TSLA is watched by both users but only fetched once
+        mock_fetch.assert_called_once_with(
+            ["AAPL", "TSLA"], "1d", "5m", 10, 10, start=None, gateway=self.service.data_plane.market_data.gateway
+        )
+        self.service.data_plane.notifications.join()
+        self.service.data_plane.notifications.send.assert_called_once_with(
+            Digest(
+                "alice@example.com",
+                "2 stock alerts",
+                "AAPL:\nStock price is higher than 100\n\nTSLA:\nStock price is higher than 100",
+            )
+        )
+
+    def test_load_users(self):
+        users = [
+            {
+                "stock_list": "alice.txt",
+                "receiver_mail": "alice@example.com",
+                "alert": {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.05},
+            },
+            {"stock_list": "bob.txt", "price_levels": {"AMZN": [{"type": "AbsolutHigherThan", "threshold": 120}]}},
+        ]
+        (self.path / "users.json").write_text(json.dumps(users))
+
+        self.service.load_users(self.path / "users.json")
+
+        alice, bob = self.service.users
+        self.assertEqual(alice.receiver_mail, "alice@example.com")
+        self.assertIsInstance(alice.alerts["TSLA"], AlertRelativeDailyChange)
+        self.assertEqual(bob.receiver_mail, "")
+        self.assertEqual(len(bob.price_levels), 1)
+        self.assertEqual(self.service.watched_symbols(), ["AAPL", "TSLA", "AMZN"])
+
+    def test_users_sharing_a_stock_list_have_a_state_each(self):
+        users = [
+            {"stock_list": "alice.txt", "receiver_mail": "alice@example.com"},
+            {"stock_list": "alice.txt", "receiver_mail": "carol@example.com"},
+        ]
+        (self.path / "users.json").write_text(json.dumps(users))
+
+        self.service.load_users(self.path / "users.json")
+
+        alice, carol = self.service.users
+        self.assertNotEqual(alice.state.path, carol.state.path)
+        self.assertEqual(alice.state.path.name, "alice.alice@example.com.state.json")
+
+    def test_load_users_rejects_price_levels_outside_the_stock_list(self):
+        users = [{"stock_list": "bob.txt", "price_levels": {"AAPL": [{"type": "AbsolutHigherThan", "threshold": 1}]}}]
+        (self.path / "users.json").write_text(json.dumps(users))
+
+        with self.assertRaises(ValueError):
+            self.service.load_users(self.path / "users.json")
+
+    def test_spin_runs_the_cycles_of_all_users(self):
+        alice = self.service.add_user(self.path / "alice.txt", "alice@example.com")
+        alice.backfill_history = MagicMock()
+        self.service.run_cycle = MagicMock(side_effect=[False, KeyboardInterrupt])
+
+        self.service.notifications.close = MagicMock()
+        with patch.object(AlertService, "wait") as wait, self.assertRaises(KeyboardInterrupt):
+            self.service.spin(interval=30)
+
+        wait.assert_called_once_with(30)
+        # the queued mails are sent before the loop is left
+        self.service.notifications.close.assert_called_once_with()
+        self.assertEqual(alice.backfill_history.call_count, 2)
+        self.assertEqual(self.service.data_plane.market_data.history_ttl_s, 30)
+
+    def test_load_config(self):
+        config = {
+            "defaults": {"alert": {"type": "AbsolutHigherThan", "threshold": 100}},
+            "watchlists": [
+                {"name": "alice", "receiver_mail": "alice@example.com", "stocks": ["AAPL", "TSLA"]},
+                {
+                    "name": "bob",
+                    "remind_interval_h": 1,
+                    "stocks": [
+                        {"name": "TSLA", "alert": {"type": "AlertRelativeDailyChange", "rel_change_in_percent": 0.05}},
+                        {
+                            "name": "AMZN",
+                            "alert": None,
+                            "price_levels": [{"type": "AbsolutLowerThan", "threshold": 90}],
+                        },
+                        {"name": "MSFT", "alert": None},
+                    ],
+                },
+            ],
+        }
+        (self.path / "alerts.json").write_text(json.dumps(config))
+
+        plan = self.service.load_config(self.path / "alerts.json")
+
+        alice, bob = self.service.users
+        self.assertEqual(alice.receiver_mail, "alice@example.com")
+        # identical alerts are one instance, so they are evaluated in one batch
+        self.assertIs(alice.alerts["AAPL"], alice.alerts["TSLA"])
+        self.assertIs(alice.alerts["AAPL"], plan.alerts[plan.watchlists[0].alerts["AAPL"]])
+        self.assertIsInstance(bob.alerts["TSLA"], AlertRelativeDailyChange)
+        self.assertEqual(bob.remind_interval_h, 1)
+        self.assertEqual(list(bob.price_levels.levels), ["AMZN"])
+        # MSFT has nothing to check, so it is not even resolved
+        self.assertNotIn("MSFT", bob.stock_tickers)
+        self.assertEqual(self.service.watched_symbols(), ["AAPL", "TSLA", "AMZN"])
@@ -0,0 +1,118 @@
+import tempfile
+from collections import Counter
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from stock_alert.alerts import AbsolutHigherThan, AbsolutLowerThan, AlertResult
+from stock_alert.class_stock_alert import StockAlert
+from stock_alert.metrics import Metrics
+from stock_alert.notifications import Digest
+from stock_alert.sharding import ShardedRunner, ShardResult, shard_of
+from tests.conftest import make_bars
+
+
+def test_shard_of_is_stable_and_balanced():
+    assert shard_of("AAPL", 4) == shard_of("AAPL", 4)
+    assert 0 <= shard_of("AAPL", 4) < 4
+
+    counts = Counter(shard_of(f"S{idx:05d}", 4) for idx in range(10000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 2200
+
+
+class TestShardedRunner(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "stocks.txt"
+        self.path.write_text("AAPL\nTSLA\nAMZN\nMSFT\n")
+        # the stock names are the symbols, so nothing has to be looked up
+        self.patches = [
+            patch("stock_alert.class_stock_alert.resolve_stock_symbols", side_effect=lambda names, cache: names),
+            patch.object(StockAlert, "get_stock_name", side_effect=lambda symbol, ticker: symbol),
+            patch.object(StockAlert, "get_timezones", return_value={}),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self) -> None:
+        for patcher in self.patches:
+            patcher.stop()
+        self.tmp_dir.cleanup()
+
+    def make_runner(self, **kwargs) -> ShardedRunner:
+        runner = ShardedRunner(
+            self.path,
+            {"type": "AbsolutHigherThan", "threshold": 100},
+            num_workers=2,
+            receiver_mail="me@example.com",
+            mp_context="fork",
+            **kwargs,
+        )
+        runner.coordinator.notifications.send = MagicMock()
+        return runner
+
+    def test_shards_split_the_symbols(self):
+        runner = self.make_runner()
+        shards = runner.shards()
+
+        self.assertEqual(sorted(name for shard in shards for name in shard), ["AAPL", "AMZN", "MSFT", "TSLA"])
+        for shard, names in enumerate(shards):
+            self.assertTrue(all(shard_of(name, 2) == shard for name in names))
+        runner.close()
+
+    def test_reminders_are_deduplicated_across_cycles(self):
+        runner = self.make_runner()
+        with patch.object(runner, "start"):
+            # the workers are done, only their results are left in the queue
+            worker = MagicMock(**{"is_alive.return_value": False})
+            runner.workers = {0: (MagicMock(), worker), 1: (MagicMock(), worker)}
+            alert = AlertResult("AAPL", AbsolutHigherThan, (100, 101.0), 0.0)
+            crossing = AlertResult("TSLA", AbsolutLowerThan, (90, 89.0), 0.0)
+            for _ in range(2):
+                runner.results.put(ShardResult(0, [alert], [], 0.1))
+                runner.results.put(ShardResult(1, [], [crossing], 0.1))
+            runner.run(interval=0, cycles=2, timeout_s=5)
+
+        runner.coordinator.notifications.send.assert_any_call(
+            Digest(
+                "me@example.com",
+                "2 stock alerts",
+                "AAPL:\nStock price is higher than 100\n\nTSLA:\nStock price is lower than 90",
+            )
+        )
+        # the alert of AAPL is not repeated before its reminder is due, the price level crossing is
+        runner.coordinator.notifications.send.assert_called_with(
+            Digest("me@example.com", "TSLA", "Stock price is lower than 90")
+        )
+
+    def test_workers_report_their_alerts(self):
+        histories = {"AAPL": make_bars([101.0]), "TSLA": make_bars([99.0]), "MSFT": make_bars([150.0])}
+        runner = self.make_runner()
+        with patch("stock_alert.market_data.fetch_history_batch", return_value=histories):
+            runner.run(interval=0.1, cycles=1, timeout_s=30)
+
+        runner.coordinator.notifications.send.assert_called_once()
+        digest = runner.coordinator.notifications.send.call_args.args[0]
+        self.assertEqual(digest.subject, "2 stock alerts")
+        self.assertIn("AAPL:\nStock price is higher than 100", digest.message)
+        self.assertIn("MSFT:\nStock price is higher than 100", digest.message)
+        self.assertEqual(runner.workers, {})
+
+    def test_collect_cycle_restarts_dead_workers_and_logs_late_shards(self):
+        runner = self.make_runner()
+        dead = MagicMock(**{"is_alive.return_value": False, "exitcode": 1})
+        spec = MagicMock()
+        runner.workers = {0: (spec, dead)}
+        metrics = Metrics()
+        metrics.enabled = True
+        with patch("stock_alert.sharding.METRICS", metrics), patch.object(runner, "start_worker") as start_worker:
+            with self.assertLogs("stock_alert.sharding", "WARNING") as logs:
+                self.assertEqual(runner.collect_cycle(timeout_s=1.5), [])
+
+        start_worker.assert_called_with(spec)
+        self.assertIn("Worker of shard 0 exited with code 1, restarting it", logs.output[0])
+        self.assertIn("Shards [0] did not report in time", logs.output[-1])
+        self.assertEqual(metrics.snapshot()["counters"]["late_shards"], 1)
+        runner.workers = {}
+        runner.close()
@@ -0,0 +1,65 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from stock_alert.state import PRICES, REMINDERS, StateStore
+
+
+class TestStateStore(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "stocks.state.json"
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_changes_survive_a_restart_without_checkpoint(self):
+        store = StateStore(self.path)
+        store.record(REMINDERS, "AAPL", 1683034200.0)
+        store.record(PRICES, "AAPL", 101.5)
+        store.record(PRICES, "AAPL", 102.0)
+        # the store is not closed, as after a crash, which releases the lock of the log
+        store._log.close()
+
+        restored = StateStore(self.path)
+        self.assertEqual(restored.get(REMINDERS, "AAPL"), 1683034200.0)
+        self.assertEqual(restored.get(PRICES, "AAPL"), 102.0)
+        self.assertIsNone(restored.get(PRICES, "TSLA"))
+        self.assertFalse(self.path.exists())
+
+    def test_unchanged_values_are_not_logged(self):
+        store = StateStore(self.path)
+        store.record(PRICES, "AAPL", 101.5)
+        store.record(PRICES, "AAPL", 101.5)
+
+        self.assertEqual(store.log_entries, 1)
+
+    def test_log_is_compacted_into_a_checkpoint(self):
+        store = StateStore(self.path, max_log_entries=3)
+        for price in [1.0, 2.0, 3.0, 4.0]:
+            store.record(PRICES, "AAPL", price)
+
+        self.assertTrue(self.path.exists())
+        self.assertEqual(len(store.log_path.read_text().splitlines()), 1)
+        store._log.close()
+        self.assertEqual(StateStore(self.path).get(PRICES, "AAPL"), 4.0)
+
+    def test_cut_off_log_line_is_ignored(self):
+        store = StateStore(self.path)
+        store.record(PRICES, "AAPL", 1.0)
+        store.close()
+        store.log_path.write_text('["prices","AAPL",2.0]\n["prices","TS')
+
+        restored = StateStore(self.path)
+        self.assertEqual(restored.get(PRICES, "AAPL"), 2.0)
+        self.assertEqual(restored.items(PRICES), {"AAPL": 2.0})
+
+    def test_second_store_on_the_same_path_is_rejected(self):
+        store = StateStore(self.path)
+        with self.assertRaises(RuntimeError):
+            StateStore(self.path)
+
+        store.record(PRICES, "AAPL", 1.0)
+        store.close()
+        # the path is free again once the store is closed
+        self.assertEqual(StateStore(self.path).get(PRICES, "AAPL"), 1.0)
@@ -0,0 +1,185 @@
+import contextlib
+import io
+import json
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from stock_alert.alerts import AbsolutHigherThan, AlertRelativeDailyChange
+from stock_alert.streaming import (
+    FallbackSource,
+    PollingSource,
+    ReplaySource,
+    SocketSource,
+    Tick,
+    YahooWebSocketSource,
+    to_timestamp,
+)
+from tests.conftest import make_bars
+from tests.test_class_stock_alert import make_stock_alert
+
+
+def write_ticks(directory: str, name: str, content: str) -> Path:
+    path = Path(directory) / name
+    path.write_text(content)
+    return path
+
+
+def test_to_timestamp():
+    assert to_timestamp(1683034200) == pd.Timestamp("2023-05-02 13:30", tz="UTC")
+    assert to_timestamp("1683034200.0") == pd.Timestamp("2023-05-02 13:30", tz="UTC")
+    assert to_timestamp("2023-05-02 13:30") == pd.Timestamp("2023-05-02 13:30", tz="UTC")
+    assert to_timestamp("2023-05-02T09:30-04:00") == pd.Timestamp("2023-05-02 13:30", tz="UTC")
+
+
+class TestReplaySource(TestCase):
+    def test_reads_csv(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_ticks(
+                tmp_dir,
+                "ticks.csv",
+                "symbol,timestamp,price,volume\nAAPL,2023-05-02 13:30,99.5,10\nTSLA,2023-05-02 13:31,180,\n",
+            )
+            ticks = list(ReplaySource(path).ticks())
+
+        self.assertEqual(
+            ticks,
+            [
+                Tick("AAPL", pd.Timestamp("2023-05-02 13:30", tz="UTC"), 99.5, 10.0),
+                Tick("TSLA", pd.Timestamp("2023-05-02 13:31", tz="UTC"), 180.0, 0.0),
+            ],
+        )
+
+    def test_reads_jsonl(self):
+        lines = [
+            {"symbol": "AAPL", "timestamp": 1683034200, "price": 99.5},
+            {"symbol": "AAPL", "timestamp": 1683034260, "price": 100},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_ticks(tmp_dir, "ticks.jsonl", "\n".join(json.dumps(line) for line in lines) + "\n")
+            ticks = list(ReplaySource(path).ticks())
+
+        self.assertEqual([tick.price for tick in ticks], [99.5, 100.0])
+
+    def test_keeps_the_gaps_between_ticks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_ticks(
+                tmp_dir, "ticks.csv", "symbol,timestamp,price\nAAPL,2023-05-02 13:30,1\nAAPL,2023-05-02 13:31,2\n"
+            )
+            with patch("stock_alert.streaming.time.sleep") as mock_sleep:
+                list(ReplaySource(path, speed=60).ticks())
+
+        mock_sleep.assert_called_once_with(1.0)
+
+
+def test_socket_source_reads_json_lines():
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+
+    def feed() -> None:
+        connection, _ = server.accept()
+        with connection:
+            connection.sendall(b'{"symbol": "AAPL", "timestamp": 1683034200, "price": 99.5}\n\n')
+            connection.sendall(b'{"symbol": "AAPL", "timestamp": 1683034260, "price": 101}\n')
+
+    thread = threading.Thread(target=feed)
+    thread.start()
+    source = SocketSource("127.0.0.1", port, timeout_s=5)
+    ticks = list(source.ticks())
+    source.close()
+    thread.join()
+    server.close()
+
+    assert [tick.price for tick in ticks] == [99.5, 101.0]
+
+
+def test_polling_source_emits_the_latest_prices():
+    market_data = MagicMock()
+    market_data.fetch_intraday.return_value = {"AAPL": make_bars([99.0, 101.0])}
+    source = PollingSource(["AAPL"], market_data, interval=0)
+
+    ticks = source.ticks()
+    tick = next(ticks)
+    source.close()
+
+    assert tick == Tick("AAPL", pd.Timestamp("2023-05-02 09:35", tz="America/New_York"), 101.0)
+    assert list(ticks) == []
+
+
+def test_fallback_source_switches_to_polling_when_the_stream_ends_or_fails():
+    timestamp = pd.Timestamp("2023-05-02 13:30", tz="UTC")
+
+    def failing_ticks():
+        yield Tick("AAPL", timestamp, 100.0)
+        raise ConnectionError("websocket dropped")
+
+    for primary_ticks in (iter([Tick("AAPL", timestamp, 100.0)]), failing_ticks()):
+        primary = MagicMock(**{"ticks.return_value": primary_ticks})
+        fallback = MagicMock(**{"ticks.return_value": iter([Tick("AAPL", timestamp, 101.0)])})
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            prices = [tick.price for tick in FallbackSource(primary, fallback).ticks()]
+
+        assert prices == [100.0, 101.0]
+        primary.close.assert_called_once()
+        assert "falling back to" in output.getvalue()
+
+
+def test_fallback_source_does_not_fall_back_once_closed():
+    source = FallbackSource(MagicMock(**{"ticks.return_value": iter([])}), MagicMock())
+    source.close()
+
+    assert not list(source.ticks())
+    source.fallback.ticks.assert_not_called()
+
+
+def test_yahoo_websocket_source_converts_messages():
+    source = YahooWebSocketSource(["AAPL"])
+    source._on_message({"id": "AAPL", "price": 99.5, "time": "1683034200000", "day_volume": "1000"})
+    source._on_message({"id": "AAPL", "price": 100.0, "time": "1683034201000", "day_volume": "1500"})
+    source._on_message({"heartbeat": True})
+
+    assert source._ticks.get_nowait() == Tick("AAPL", pd.Timestamp("2023-05-02 13:30", tz="UTC"), 99.5, 0.0)
+    assert source._ticks.get_nowait() == Tick("AAPL", pd.Timestamp("2023-05-02 13:30:01", tz="UTC"), 100.0, 500.0)
+    assert source._ticks.empty()
+
+
+class TestStream(TestCase):
+    def test_alerts_are_checked_on_every_tick(self):
+        stock_alert = make_stock_alert(["AAPL", "TSLA"])
+        stock_alert.receiver_mail = "me@example.com"
+        stock_alert.configure_alert("AAPL", AlertRelativeDailyChange(0.05))
+        stock_alert.add_price_level_alert("TSLA", AbsolutHigherThan(200))
+        seed = {"AAPL": make_bars([100.0]), "TSLA": make_bars([190.0])}
+        ticks = (
+            "symbol,timestamp,price\n"
+            "AAPL,2023-05-02 13:36,102\n"
+            "TSLA,2023-05-02 13:37,201\n"
+            "UNKNOWN,2023-05-02 13:37,1\n"
+            "AAPL,2023-05-02 13:38,106\n"
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = ReplaySource(write_ticks(tmp_dir, "ticks.csv", ticks))
+            with patch("stock_alert.market_data.fetch_history_batch", return_value=seed) as mock_fetch:
+                stock_alert.stream(source)
+
+        # the bars are seeded once, afterwards every tick is processed without a request
+        mock_fetch.assert_called_once()
+        self.assertEqual(list(stock_alert.market_data.intraday["AAPL"].bars["Close"]), [100.0, 106.0])
+        stock_alert.notifications.join()
+        # the TSLA crossing and the AAPL alert are sent as soon as their tick arrived
+        self.assertEqual(stock_alert.notifications.send.call_count, 2)
+
+    def test_on_tick_applies_the_reminder_interval(self):
+        stock_alert = make_stock_alert(["AAPL"])
+        stock_alert.configure_alert("AAPL", AbsolutHigherThan(100))
+        timestamp = pd.Timestamp("2023-05-02 13:30", tz="UTC")
+
+        self.assertFalse(stock_alert.on_tick(Tick("AAPL", timestamp, 99.0)))
+        self.assertTrue(stock_alert.on_tick(Tick("AAPL", timestamp, 101.0)))
+        self.assertFalse(stock_alert.on_tick(Tick("AAPL", timestamp, 102.0)))
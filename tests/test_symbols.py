@@ -0,0 +1,100 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from stock_alert.symbols import UNKNOWN_SYMBOL, SymbolCache, resolve_stock_symbols
+
+
+class TestSymbolCache(TestCase):
+    def test_entries_survive_a_reload(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.json"
+            cache = SymbolCache(path)
+            cache.set("Apple", "AAPL")
+            cache.save()
+
+            self.assertEqual(SymbolCache(path).get("Apple"), "AAPL")
+            self.assertIsNone(SymbolCache(path).get("Tesla"))
+
+    def test_entries_expire(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = SymbolCache(Path(tmp_dir) / "cache.json", max_age_s=60)
+            with patch("stock_alert.symbols.time.time", return_value=1000.0):
+                cache.set("Apple", "AAPL")
+            with patch("stock_alert.symbols.time.time", return_value=1030.0):
+                self.assertEqual(cache.get("Apple"), "AAPL")
+            with patch("stock_alert.symbols.time.time", return_value=1061.0):
+                self.assertIsNone(cache.get("Apple"))
+
+
+class TestResolveStockSymbols(TestCase):
+    def test_resolves_each_unique_name_once(self):
+        lookup = {"Apple": "AAPL", "Tesla": "TSLA", "Unknown": ""}
+        with patch("stock_alert.symbols.get_stock_ticker", side_effect=lookup.get) as mock_get_stock_ticker:
+            symbols = resolve_stock_symbols(["Apple", "Tesla", "Apple", "Unknown"])
+
+        self.assertEqual(symbols, ["AAPL", "TSLA", "AAPL", UNKNOWN_SYMBOL])
+        self.assertEqual(mock_get_stock_ticker.call_count, 3)
+
+    def test_only_missing_names_are_looked_up(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.json"
+            cache = SymbolCache(path)
+            cache.set("Apple", "AAPL")
+
+            with patch("stock_alert.symbols.get_stock_ticker", return_value="TSLA") as mock_get_stock_ticker:
+                symbols = resolve_stock_symbols(["Tesla", "Apple"], cache)
+
+            self.assertEqual(symbols, ["TSLA", "AAPL"])
+            mock_get_stock_ticker.assert_called_once_with("Tesla")
+            self.assertEqual(SymbolCache(path).get("Tesla"), "TSLA")
+
+    def test_reordering_the_stock_list_needs_no_lookups(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = SymbolCache(Path(tmp_dir) / "cache.json")
+            with patch("stock_alert.symbols.get_stock_ticker", side_effect=str.upper):
+                resolve_stock_symbols(["apple", "tesla"], cache)
+
+            with patch("stock_alert.symbols.get_stock_ticker", side_effect=str.upper) as mock_get_stock_ticker:
+                symbols = resolve_stock_symbols(["amazon", "tesla", "apple"], SymbolCache(cache.path))
+
+            self.assertEqual(symbols, ["AMAZON", "TESLA", "APPLE"])
+            mock_get_stock_ticker.assert_called_once_with("amazon")
+
+
+class TestSymbolCachePersistence(TestCase):
+    def test_failed_save_keeps_the_previous_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.json"
+            cache = SymbolCache(path)
+            cache.set("Apple", "AAPL")
+            cache.save()
+
+            cache.set("Tesla", "TSLA")
+            with patch("stock_alert.symbols.json.dump", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    cache.save()
+
+            self.assertEqual(list(SymbolCache(path).entries), ["Apple"])
+            self.assertEqual([p.name for p in Path(tmp_dir).iterdir()], ["cache.json"])
+
+    def test_corrupt_file_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cache.json"
+            path.write_text('{"Apple": {"symbol": "AA')
+
+            self.assertEqual(SymbolCache(path).entries, {})
+
+    def test_import_csv(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = Path(tmp_dir) / "stock_symbol_mapping.csv"
+            csv_path.write_text("Apple,AAPL\nBerkshire Hathaway, Inc.,BRK-B\nTesla,TSLA\n")
+            cache = SymbolCache(Path(tmp_dir) / "cache.json")
+            cache.set("Tesla", "TSLA.DE")
+
+            cache.import_csv(csv_path)
+
+            self.assertEqual(cache.get("Apple"), "AAPL")
+            self.assertEqual(cache.get("Berkshire Hathaway, Inc."), "BRK-B")
+            self.assertEqual(cache.get("Tesla"), "TSLA.DE")
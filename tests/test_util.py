@@ -1,8 +1,12 @@
 import json
+import tempfile
+from pathlib import Path
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
-from stock_alert.util import get_json_stock_info, get_stock_ticker, hours_to_seconds
+import pytest
+
+from stock_alert.util import get_json_stock_info, get_stock_ticker, hours_to_seconds, write_json_atomically
 
 
 def test_hours_to_seconds():
@@ -19,21 +23,35 @@ def test_hours_to_seconds():
     assert hours_to_seconds(-1) == -3600
 
 
+def test_write_json_atomically():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "data.json"
+        write_json_atomically(path, {"AAPL": 1})
+        write_json_atomically(path, {"AAPL": 2}, indent=1)
+
+        assert json.loads(path.read_text()) == {"AAPL": 2}
+        # the data is not written if it can not be serialized, the previous file is kept and nothing is left behind
+        with pytest.raises(TypeError):
+            write_json_atomically(path, {"AAPL": object()})
+        assert json.loads(path.read_text()) == {"AAPL": 2}
+        assert list(Path(tmp_dir).iterdir()) == [path]
+
+
 def test_get_json_stock_info():
     # Example raw stock name to test
     raw_stock_name = "AAPL"
 
-    # Example JSON response to return when `urllib.request.urlopen` is called
+    # Example JSON response to return when the pooled session is asked
     expected_json_response = {"quotes": [{"symbol": "AAPL", "name": "Apple Inc.", "exchange": "NMS", "type": "Equity"}]}
 
-    # Create a mock for `urllib.request.urlopen` using `MagicMock`
-    mock_urlopen = MagicMock()()
+    # Create a mock for the session using `MagicMock`
+    mock_session = MagicMock()
 
-    # Set the `read` method of the mock to return the expected JSON response
-    mock_urlopen.return_value.read.return_value = json.dumps(expected_json_response).encode("utf8")
+    # Set the content of the response of the mock to the expected JSON response
+    mock_session.get.return_value.content = json.dumps(expected_json_response).encode("utf8")
 
-    # Patch `urllib.request.urlopen` with the mock
-    with patch("urllib.request.urlopen", mock_urlopen):
+    # Patch the shared session with the mock
+    with patch("stock_alert.util.get_session", return_value=mock_session):
         # Call the function with the example stock name
         result = get_json_stock_info(raw_stock_name)
 
@@ -41,6 +59,19 @@ def test_get_json_stock_info():
         assert result == expected_json_response
 
 
+def test_get_json_stock_info_uses_configured_base_url():
+    mock_session = MagicMock()
+    mock_session.get.return_value.content = b'{"quotes": []}'
+
+    with patch("stock_alert.util.get_session", return_value=mock_session), patch(
+        "stock_alert.util.YAHOO_BASE_URL", "http://127.0.0.1:8080"
+    ):
+        get_json_stock_info("Apple Inc")
+
+    mock_session.get.assert_called_once_with("http://127.0.0.1:8080/v1/finance/search?q=Apple%20Inc", timeout=10)
+    mock_session.get.return_value.raise_for_status.assert_called_once()
+
+
 class TestGetStockTicker(TestCase):
     def test_get_stock_ticker_returns_ticker_when_successful(self):
         """